@@ -0,0 +1,193 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+# Benchmark of LsrTree on synthetic folder trees, run from the repository root with
+#     python benchmarks/lsrbench.py --sizes 1000 10000
+
+
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import platform
+import tempfile
+from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsrhash import get_digests, get_fingerprint
+from mtbp3cd.util.lsrextract import select_extractors, run_extractors
+from lsrfixtures import get_fixtures
+
+default_mix = {"xpt": 0.25, "csv": 0.25, "pdf": 0.1, "xlsx": 0.05, "sas7bdat": 0.05, "txt": 0.3}
+outfmt_cases = ["list", "json", "string", "tree", "dataframe"]
+
+
+def make_synthetic_tree(root, n_files, depth=3, fanout=8, mix=None, seed=0):
+    """
+    Create a synthetic folder tree with small valid files of several types.
+
+    The tree has fanout sub-folders per folder down to depth levels, and the files are spread evenly over
+    the deepest folders. File types are drawn from mix; csv and txt files end with a unique line.
+
+    Args:
+        root (str): The folder to create the tree in. It is created if it does not exist.
+        n_files (int): The number of files.
+        depth (int): The number of folder levels below root. Defaults to 3.
+        fanout (int): The number of sub-folders per folder. Defaults to 8.
+        mix (dict): The share of each file type, e.g. {'xpt': 0.5, 'pdf': 0.5}. Defaults to default_mix.
+        seed (int): The random seed for the file types. Defaults to 0.
+
+    Returns:
+        dict: {file_type: number of files}.
+    """
+    if n_files < 0 or depth < 0 or fanout < 1:
+        raise ValueError("n_files and depth must be non-negative and fanout must be positive.")
+    mix = mix or default_mix
+    unknown = [t for t in mix if t not in default_mix]
+    if unknown:
+        raise ValueError(f"Unknown file types in mix: {unknown}")
+    fixtures = get_fixtures()
+    types = list(mix)
+    rng = random.Random(seed)
+    drawn = rng.choices(types, weights=[mix[t] for t in types], k=n_files)
+    leaves = [""]
+    for level in range(depth):
+        leaves = [os.path.join(leaf, f"d{level}_{i}") for leaf in leaves for i in range(fanout)]
+        if len(leaves) >= max(1, n_files):
+            break
+    for leaf in leaves:
+        os.makedirs(os.path.join(root, leaf), exist_ok=True)
+    counts = dict.fromkeys(types, 0)
+    for i, file_type in enumerate(drawn):
+        counts[file_type] += 1
+        data = fixtures[file_type]
+        if file_type in ["csv", "txt"]:
+            data += b"%d\n" % i
+        with open(os.path.join(root, leaves[i % len(leaves)], f"f{i:07d}.{file_type}"), "wb") as f:
+            f.write(data)
+    return counts
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def run_benchmark(root, cases=None, repeat=1):
+    """
+    Time LsrTree on a folder, one case at a time.
+
+    The cases are 'scan' (the walk only), 'outfmt:<name>' for each output format of list_files(),
+    'scan:walk_workers' (the walk with walk_workers=8), and
+    'column:<name>' for each metadata column: 'md5', 'fingerprint', and one case per registered extractor.
+    Each case runs on a new LsrTree, so nothing is reused between cases. The best of repeat runs is reported.
+
+    Args:
+        root (str): The folder to scan.
+        cases (list): The cases to run. Defaults to None (all cases).
+        repeat (int): The number of runs per case. Defaults to 1.
+
+    Returns:
+        list: One dict per case with the keys 'case', 'seconds', 'files' (the files handled by the case)
+        and 'files_per_second'.
+    """
+    files = [
+        (os.path.join(node["dirpath"], name), name.split(".")[-1], st.st_size if st is not None else None)
+        for node in LsrTree(root).scan() for name, st in node["files"]
+    ]
+    extractors = select_extractors()
+    all_cases = ["scan"] + [f"outfmt:{fmt}" for fmt in outfmt_cases] + ["scan:walk_workers", "column:md5", "column:fingerprint"]
+    all_cases += [f"column:{name}" for name in sorted({e["name"] for items in extractors.values() for e in items})]
+    cases = all_cases if cases is None else list(cases)
+    unknown = [c for c in cases if c not in all_cases]
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases: {unknown}")
+
+    def run_case(case):
+        # Returns the function to time and the number of files it handles
+        if case == "scan":
+            return lambda: LsrTree(root).scan(), len(files)
+        if case == "scan:walk_workers":
+            return lambda: LsrTree(root, walk_workers=8).scan(), len(files)
+        if case.startswith("outfmt:"):
+            return lambda: LsrTree(root, outfmt=case[7:]).list_files(), len(files)
+        if case == "column:md5":
+            return lambda: [get_digests(p, "md5") for p, _, _ in files], len(files)
+        if case == "column:fingerprint":
+            return lambda: [get_fingerprint(p) for p, _, _ in files], len(files)
+        selected = select_extractors([case[7:]])
+        typed_files = [x for x in files if x[1].lower() in selected]
+        return lambda: [run_extractors(p, t, n, selected) for p, t, n in typed_files], len(typed_files)
+
+    results = []
+    for case in cases:
+        func, n_files = run_case(case)
+        seconds = min(_timed(func)[0] for _ in range(max(1, int(repeat))))
+        results.append({
+            "case": case, "seconds": round(seconds, 6), "files": n_files,
+            "files_per_second": round(n_files / seconds, 1) if seconds > 0 else None,
+        })
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark LsrTree on synthetic folder trees.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="Numbers of files, e.g. 1000 10000 100000 1000000.")
+    parser.add_argument("--depth", type=int, default=3, help="Folder levels below the root.")
+    parser.add_argument("--fanout", type=int, default=8, help="Sub-folders per folder.")
+    parser.add_argument("--mix", default=None, help="File type shares, e.g. 'xpt=0.5,pdf=0.2,txt=0.3'.")
+    parser.add_argument("--cases", nargs="+", default=None, help="Cases to run, e.g. scan outfmt:tree column:md5.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the best is reported.")
+    parser.add_argument("--workdir", default=None, help="Folder for the trees. Defaults to a temporary folder.")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated trees.")
+    parser.add_argument("--output", default=None, help="Write the JSON results to this file instead of stdout.")
+    args = parser.parse_args(argv)
+
+    mix = None
+    if args.mix:
+        mix = {k: float(v) for k, v in (item.split("=") for item in args.mix.split(","))}
+    workdir = args.workdir or tempfile.mkdtemp(prefix="lsrbench_")
+    report = {
+        "python": sys.version.split()[0], "platform": platform.platform(),
+        "mtbp3cd_version": getattr(__import__("mtbp3cd"), "__version__", "unknown"),
+        "depth": args.depth, "fanout": args.fanout, "mix": mix or default_mix, "results": [],
+    }
+    try:
+        for n_files in args.sizes:
+            root = os.path.join(workdir, f"tree_{n_files}")
+            if not os.path.isdir(root):
+                start = time.perf_counter()
+                make_synthetic_tree(root, n_files, depth=args.depth, fanout=args.fanout, mix=mix)
+                print(f"Created {n_files} files in {time.perf_counter() - start:.1f} s: {root}", file=sys.stderr)
+            for result in run_benchmark(root, cases=args.cases, repeat=args.repeat):
+                report["results"].append(dict(n_files=n_files, **result))
+                print(f"{n_files:>8} {result['case']:<22} {result['seconds']:>10.3f} s", file=sys.stderr)
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
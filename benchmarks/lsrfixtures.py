@@ -0,0 +1,107 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+# Small valid files shared by the benchmark (lsrbench.py) and the tests
+
+
+import io
+import struct
+import openpyxl
+import pypdf
+
+
+def xpt_fixture(n_columns=4, n_rows=20):
+    """
+    Return a SAS XPORT (v5) file with n_columns numeric columns and n_rows rows.
+    """
+    def rec(s):
+        return s.ljust(80)
+    out = rec(b"HEADER RECORD*******LIBRARY HEADER RECORD!!!!!!!000000000000000000000000000000")
+    out += rec(b"SAS     SAS     SASLIB  9.4     X64_7PRO                        01JAN25:00:00:00")
+    out += rec(b"01JAN25:00:00:00")
+    out += rec(b"HEADER RECORD*******MEMBER  HEADER RECORD!!!!!!!000000000000000001600000000140")
+    out += rec(b"HEADER RECORD*******DSCRPTR HEADER RECORD!!!!!!!000000000000000000000000000000")
+    out += rec(b"SAS     BENCH   SASDATA 9.4     X64_7PRO                        01JAN25:00:00:00")
+    out += rec(b"01JAN25:00:00:00")
+    out += rec(b"HEADER RECORD*******NAMESTR HEADER RECORD!!!!!!!000000" + b"%04d" % n_columns + b"0" * 20)
+    namestr = b"".join(
+        struct.pack(">hhhh8s40s8shhh2s8shhl52s", 1, 0, 8, i + 1, b"V%d" % i, b"", b"", 0, 0, 0, b"", b"", 0, 0, 8 * i, b"")
+        for i in range(n_columns)
+    )
+    out += namestr.ljust(len(namestr) + (-len(namestr)) % 80, b" ")
+    out += rec(b"HEADER RECORD*******OBS     HEADER RECORD!!!!!!!000000000000000000000000000000")
+    data = b"\x00" * (8 * n_columns * n_rows)
+    return out + data.ljust(len(data) + (-len(data)) % 80, b" ")
+
+
+def sas7bdat_fixture(n_columns=4, n_rows=20):
+    """
+    Return the header and first page of a SAS7BDAT file, with the column and row counts in its subheaders.
+    """
+    head = bytearray(1024)
+    head[:32] = b"\x00" * 12 + b"\xc2\xea\x81\x60\xb3\x14\x11\xcf\xbd\x92\x08\x00\x09\xc7\x31\x8c\x18\x1f\x10\x11"
+    head[32:33] = b"3"
+    head[35:36] = b"3"
+    head[37:38] = b"\x01"
+    head[200:212] = struct.pack("<III", 1024, 4096, 1)
+    page = bytearray(4096)
+    page[36:38] = struct.pack("<H", 2)
+    page[40:58] = struct.pack("<QQBB", 1000, 480, 0, 0)
+    page[64:82] = struct.pack("<QQBB", 2000, 24, 0, 0)
+    page[1000:1008] = b"\xF7\xF7\xF7\xF7\x00\x00\x00\x00"
+    page[1048:1056] = struct.pack("<Q", n_rows)
+    page[2000:2008] = b"\xF6\xF6\xF6\xF6\x00\x00\x00\x00"
+    page[2008:2016] = struct.pack("<Q", n_columns)
+    return bytes(head) + bytes(page)
+
+
+def pdf_fixture(n_pages=2):
+    """
+    Return a PDF file of n_pages blank pages.
+    """
+    writer = pypdf.PdfWriter()
+    for _ in range(n_pages):
+        writer.add_blank_page(width=72, height=72)
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+def xlsx_fixture(n_columns=4, n_rows=20):
+    """
+    Return an xlsx file with one sheet of n_columns columns and n_rows rows, without a header row.
+    """
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for i in range(n_rows):
+        ws.append([i * n_columns + j for j in range(n_columns)])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def get_fixtures():
+    """
+    Return small valid files of each type, as {file_type: bytes}.
+    """
+    return {
+        "xpt": xpt_fixture(),
+        "csv": b"".join(b"%d,%d,%d,%d\n" % (i, i + 1, i + 2, i + 3) for i in range(21)),
+        "pdf": pdf_fixture(),
+        "xlsx": xlsx_fixture(),
+        "sas7bdat": sas7bdat_fixture(),
+        "txt": b"mtbp3cd benchmark file\n" * 4,
+    }
@@ -14,10 +14,12 @@
 #  along with this program. If not, see <https://www.gnu.org/license/>
 
 import os
+import re
 import pandas as pd
-import hashlib
 from datetime import datetime
 from PyQt6.QtCore import Qt
+from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsrhash import get_digests, normalize_algorithm, checksum_extensions
 
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, 
@@ -37,7 +39,7 @@ class TabChecksum(QWidget):
         # Label and ComboBox for checksum type
         tab_label1 = QLabel("Checksum Type:")
         self.checksum_type = QComboBox()
-        self.checksum_type.addItems(["SHA-512", "SHA-256", "MD5"])
+        self.checksum_type.addItems(["SHA-512", "SHA-256", "MD5", "All"])
 
         layout_tab_input1 = QHBoxLayout()
         layout_tab_input1.setAlignment(Qt.AlignmentFlag.AlignTop)
@@ -80,52 +82,55 @@ class TabChecksum(QWidget):
             self.tab_tabs_text_1.setPlainText("No valid output folder.")
             return
 
-        algo = self.checksum_type.currentText()
-        hash_func = {
-            "SHA-512": hashlib.sha512,
-            "SHA-256": hashlib.sha256,
-            "MD5": hashlib.md5
-        }.get(algo)
+        # All selected digests are computed from one read of each file
+        algos = self.selected_algorithms()
+        results = {algo: [] for algo in algos}
+
+        # The output folder is excluded during the walk when it is inside the input folder
+        exclude = []
+        rel_output = os.path.relpath(os.path.abspath(output_folder), os.path.abspath(folder_path))
+        if rel_output == ".":
+            self.tab_tabs_text_1.setPlainText("The output folder is the input folder.")
+            return
+        if rel_output != ".." and not rel_output.startswith(".." + os.sep):
+            exclude.append(re.compile("^" + re.escape(rel_output.replace(os.sep, "/")) + "$"))
 
-        results = []
-        
         try:
-            for root, _, files in os.walk(folder_path):
-                if os.path.abspath(root).startswith(os.path.abspath(output_folder)):
-                    continue
-                for fname in files:
-                    fpath = os.path.join(root, fname)
+            lsr = LsrTree(folder_path, exclude=exclude)
+            for node in lsr.scan():
+                for fname, _ in node["files"]:
+                    fpath = os.path.join(node["dirpath"], fname)
                     try:
-                        with open(fpath, "rb") as f:
-                            hasher = hash_func()
-                            while True:
-                                data = f.read(8192)
-                                if not data:
-                                    break
-                                hasher.update(data)
-                            checksum = hasher.hexdigest()
+                        checksums = get_digests(fpath, algos)
                         rel_path = os.path.relpath(fpath, folder_path)
-                        results.append(f"{checksum}  {rel_path}")
+                        for algo in algos:
+                            results[algo].append(f"{checksums[algo]}  {rel_path}")
                     except Exception as fe:
-                        results.append(f"Error reading {fname}: {str(fe)}")
-
-            ext = {
-                "SHA-512": ".sha512",
-                "SHA-256": ".sha256",
-                "MD5": ".md5"
-            }[algo]
-            out_file = os.path.join(output_folder, f"checksums{ext}")
-            if os.path.exists(out_file):
-                dt_str = getattr(_p.tab_folder, "tab_folder_meta_json", {}).get("scan_time", datetime.now().strftime("%Y%m%dT%H%M%S"))
-                dt_str = dt_str.replace(":", "").replace("-", "").replace(" ", "T")
-                out_file = os.path.join(output_folder, f"checksums_{dt_str}{ext}")
-            with open(out_file, "w") as outf:
-                outf.write("\n".join(results))
-
-            self.tab_tabs_text_1.setPlainText(f"Checksums saved to:\n{out_file}")
+                        for algo in algos:
+                            results[algo].append(f"Error reading {fname}: {str(fe)}")
+
+            out_files = []
+            for algo in algos:
+                ext = checksum_extensions[algo]
+                out_file = os.path.join(output_folder, f"checksums{ext}")
+                if os.path.exists(out_file):
+                    dt_str = getattr(_p.tab_folder, "tab_folder_meta_json", {}).get("scan_time", datetime.now().strftime("%Y%m%dT%H%M%S"))
+                    dt_str = dt_str.replace(":", "").replace("-", "").replace(" ", "T")
+                    out_file = os.path.join(output_folder, f"checksums_{dt_str}{ext}")
+                with open(out_file, "w") as outf:
+                    outf.write("\n".join(results[algo]))
+                out_files.append(out_file)
+
+            self.tab_tabs_text_1.setPlainText("Checksums saved to:\n" + "\n".join(out_files))
         except Exception as e:
             self.tab_tabs_text_1.setPlainText(f"Error: {str(e)}")
 
+    def selected_algorithms(self):
+        algo = self.checksum_type.currentText()
+        if algo == "All":
+            return ["sha512", "sha256", "md5"]
+        return [normalize_algorithm(algo)]
+
     def tab_button_2_f(self):
         file_dialog = QFileDialog(self)
         file_dialog.setFileMode(QFileDialog.FileMode.ExistingFile)
@@ -160,11 +165,14 @@ class TabChecksum(QWidget):
             return
 
         algo = self.checksum_type.currentText()
-        hash_func = {
-            "SHA-512": hashlib.sha512,
-            "SHA-256": hashlib.sha256,
-            "MD5": hashlib.md5
-        }[algo]
+        if algo == "All":
+            # Use the digest named by the checksum file extension, e.g. checksums.sha256
+            ext = os.path.splitext(self.selected_checksum_file)[1].lower()
+            algo = {v: k for k, v in checksum_extensions.items()}.get(ext)
+            if algo is None:
+                self.tab_tabs_text_1.setPlainText("Select a checksum type to check a file without a .sha512, .sha256 or .md5 extension.")
+                return
+        algo = normalize_algorithm(algo)
 
         # Read checksums from file
         checksums = {}
@@ -189,14 +197,7 @@ class TabChecksum(QWidget):
                 results.append(f"Missing: {rel_path}")
                 continue
             try:
-                with open(abs_path, "rb") as f:
-                    hasher = hash_func()
-                    while True:
-                        data = f.read(8192)
-                        if not data:
-                            break
-                        hasher.update(data)
-                    actual_checksum = hasher.hexdigest()
+                actual_checksum = get_digests(abs_path, algo)[algo]
                 if actual_checksum.lower() == expected_checksum.lower():
                     results.append(f"OK: {rel_path}")
                 else:
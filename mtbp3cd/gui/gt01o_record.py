@@ -17,6 +17,7 @@
 import os
 import pandas as pd
 from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsrdiff import LsrDiff
 import mtbp3cd.gui
 from datetime import datetime
 from PyQt6.QtCore import Qt, QRegularExpression
@@ -36,6 +37,7 @@ class TabRecord(QWidget):
     def __init__(self, _p):
         super().__init__()
         self._p = _p
+        self.merged = pd.DataFrame()
 
         self.tab_button_1 = QPushButton("Select Record[R] Folder")
         self.tab_button_1.clicked.connect(self.tab_button_1_f)
@@ -131,78 +133,39 @@ class TabRecord(QWidget):
                 if os.path.exists(table_path):
                     try:
                         df = pd.read_csv(table_path)
-                        if "md5" in df.columns:
-                            df = df.drop(columns=["md5"])
+                        display_df = df.drop(columns=["md5"]) if "md5" in df.columns else df
                         mtbp3cd.gui.util_show_message(self.message_list, f"Loaded table: {table_path}", status="s")
                         self.tab_tabs_table_2.clear()
-                        self.tab_tabs_table_2.setRowCount(len(df))
-                        self.tab_tabs_table_2.setColumnCount(len(df.columns))
-                        self.tab_tabs_table_2.setHorizontalHeaderLabels(df.columns.astype(str).tolist())
-                        for row in range(len(df)):
-                            for col in range(len(df.columns)-1):
-                                value = str(df.iat[row, col])
+                        self.tab_tabs_table_2.setRowCount(len(display_df))
+                        self.tab_tabs_table_2.setColumnCount(len(display_df.columns))
+                        self.tab_tabs_table_2.setHorizontalHeaderLabels(display_df.columns.astype(str).tolist())
+                        for row in range(len(display_df)):
+                            for col in range(len(display_df.columns)-1):
+                                value = str(display_df.iat[row, col])
                                 self.tab_tabs_table_2.setItem(row, col, QTableWidgetItem(value))
                         self.tab_tabs_table_2.resizeColumnsToContents()
 
                         # Compare df (record) and self._p.tab_folder.folder_file_df (input)
                         if not self.input_table_df.empty:
-                            common_cols = [col for col in df.columns if col in self.input_table_df.columns]
+                            common_cols = [col for col in df.columns if col in self.input_table_df.columns and col not in LsrDiff.id_columns]
                             if not common_cols:
                                 mtbp3cd.gui.util_show_message(self.message_list, "No common columns to compare.", status="f")
                             else:
-                                # Merge on common columns (assume first column is a key if exists)
-                                if "size_in_bytes" in df.columns:
-                                    df["size_in_bytes"] = pd.to_numeric(df["size_in_bytes"], errors="coerce").astype("Int64")
-                                if "size_in_bytes" in self.input_table_df.columns:
-                                    self.input_table_df["size_in_bytes"] = pd.to_numeric(self.input_table_df["size_in_bytes"], errors="coerce").astype("Int64")
-                                if "N_page" in df.columns:
-                                    df["N_page"] = pd.to_numeric(df["N_page"], errors="coerce").astype("Int64")
-                                if "N_page" in self.input_table_df.columns:
-                                    self.input_table_df["N_page"] = pd.to_numeric(self.input_table_df["N_page"], errors="coerce").astype("Int64")
-                                if "N_column" in df.columns:
-                                    df["N_column"] = pd.to_numeric(df["N_column"], errors="coerce").astype("Int64")
-                                if "N_column" in self.input_table_df.columns:
-                                    self.input_table_df["N_column"] = pd.to_numeric(self.input_table_df["N_column"], errors="coerce").astype("Int64")
-                                if "N_row" in df.columns:
-                                    df["N_row"] = pd.to_numeric(df["N_row"], errors="coerce").astype("Int64")
-                                if "N_row" in self.input_table_df.columns:
-                                    self.input_table_df["N_row"] = pd.to_numeric(self.input_table_df["N_row"], errors="coerce").astype("Int64")
-                                self.merged = pd.merge(
-                                    self.input_table_df, df, 
-                                    on=common_cols,
-                                    how="outer", 
-                                    suffixes=("_I", "_R"), 
-                                    indicator=True
-                                )
-
-                                if "md5" in self.merged.columns:
-                                    self.merged = self.merged.drop(columns=["md5"])
-                                if "_merged" in self.merged.columns:
-                                    both_count = (self.merged["_merge"] == "both").sum()
-                                    left_only_count = (self.merged["_merge"] == "left_only").sum()
-                                    right_only_count = (self.merged["_merge"] == "right_only").sum()
-                                    total_count = both_count + left_only_count + right_only_count
-                                    mtbp3cd.gui.util_show_message(
-                                        self.message_list,
-                                        f"Diff summary: both={both_count}, input_only={left_only_count}, record_only={right_only_count}, total={total_count}",
-                                        status="info"
-                                    )
-                                    self.merged["_merge"] = self.merged["_merge"].replace({
-                                        "left_only": "input",
-                                        "right_only": "record"
-                                    })
-                                    self.merged = self.merged[self.merged["_merge"] != "both"]
-                                # Prepare diff table: show all columns from both, plus indicator
+                                # Files are joined on relative path; size and md5 identify moved files
+                                diff = LsrDiff(compare_columns=common_cols, suffixes=("_R", "_I"))
+                                self.merged = diff.compare(df, self.input_table_df)
+                                summary = ", ".join(f"{k}={v}" for k, v in diff.summary.items())
+                                mtbp3cd.gui.util_show_message(self.message_list, f"Diff summary: {summary}, total={sum(diff.summary.values())}", status="info")
+                                # Prepare diff table: one row per changed file, with record and input values
                                 self.tab_tabs_table_3.clear()
-                                if not both_count == total_count:
-                                    self.tab_tabs_table_3.setRowCount(len(self.merged))
-                                    self.tab_tabs_table_3.setColumnCount(len(self.merged.columns))
-                                    self.tab_tabs_table_3.setHorizontalHeaderLabels(self.merged.columns.astype(str).tolist())
-                                    for row in range(len(self.merged)):
-                                        for col in range(len(self.merged.columns)):
-                                            value = str(self.merged.iat[row, col])
-                                            self.tab_tabs_table_3.setItem(row, col, QTableWidgetItem(value))
-                                    self.tab_tabs_table_3.resizeColumnsToContents()
+                                self.tab_tabs_table_3.setRowCount(len(self.merged))
+                                self.tab_tabs_table_3.setColumnCount(len(self.merged.columns))
+                                self.tab_tabs_table_3.setHorizontalHeaderLabels(self.merged.columns.astype(str).tolist())
+                                for row in range(len(self.merged)):
+                                    for col in range(len(self.merged.columns)):
+                                        value = str(self.merged.iat[row, col])
+                                        self.tab_tabs_table_3.setItem(row, col, QTableWidgetItem(value))
+                                self.tab_tabs_table_3.resizeColumnsToContents()
                         else:
                             mtbp3cd.gui.util_show_message(self.message_list, "Input folder_file_df not found or invalid.", status="f")
                     except Exception as e:
@@ -229,7 +192,7 @@ class TabRecord(QWidget):
                                     self.tab_tabs_table_1.setItem(row, 3, QTableWidgetItem("Y"))
                                     if meta_data[key] != self.input_meta_json[key]:
                                         self.tab_tabs_table_1.setItem(row, 4, QTableWidgetItem("Y"))
-                                        self.tab_tabs_table_1.setItem(row, 5, QTableWidgetItem(self.input_meta_json[key]))
+                                        self.tab_tabs_table_1.setItem(row, 5, QTableWidgetItem(str(self.input_meta_json[key])))
                                     else:
                                         self.tab_tabs_table_1.setItem(row, 4, QTableWidgetItem("N"))
                                         self.tab_tabs_table_1.setItem(row, 5, QTableWidgetItem(""))
@@ -248,7 +211,7 @@ class TabRecord(QWidget):
                                     self.tab_tabs_table_1.setItem(row, 2, QTableWidgetItem("N"))
                                     self.tab_tabs_table_1.setItem(row, 3, QTableWidgetItem("Y"))
                                     self.tab_tabs_table_1.setItem(row, 4, QTableWidgetItem("NA"))
-                                    self.tab_tabs_table_1.setItem(row, 5, QTableWidgetItem(self.input_meta_json[key]))
+                                    self.tab_tabs_table_1.setItem(row, 5, QTableWidgetItem(str(self.input_meta_json[key])))
                         else:
                             self.tab_tabs_table_1.setRowCount(1)
                             self.tab_tabs_table_1.setColumnCount(1)
@@ -17,7 +17,8 @@ import os
 import pandas as pd
 from PyQt6.QtCore import Qt
 from datetime import datetime
-from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsr import LsrTree, to_legacy_dataframe
+from mtbp3cd.util.lsrsnap import LsrSnapshots
 import mtbp3cd.gui
 import json
 
@@ -138,27 +139,36 @@ class TabFolder(QWidget):
                 self.tab_meta_table.setItem(row, 0, key_item)
                 self.tab_meta_table.setItem(row, 1, value_item)
             self.tab_meta_table.resizeColumnsToContents()
-            lsr1 = LsrTree(folder, outfmt="tree", with_counts=True)
-            self.tab_folder_tree_str = lsr1.list_files() 
+            output_folder = getattr(self._p.tab_starting, "gt01_output_folder_path", None)
+            cache_path = None
+            if output_folder and os.path.isdir(output_folder):
+                cache_path = os.path.join(output_folder, "log_folder_cache.sqlite")
+            lsr1 = LsrTree(folder, outfmt="tree", with_counts=True, cache_path=cache_path)
+            self.tab_folder_tree_str = lsr1.list_files()
             self.tab_button_2.setEnabled(bool(len(self.tab_folder_tree_str)>0))
             self.tab_tree_str.clear()
             width = len(str(len(self.tab_folder_tree_str)))
             self.tab_tree_str.addItems([f"{str(idx+1).zfill(width)}: {str(item)}" for idx, item in enumerate(self.tab_folder_tree_str)])
-            lsr2 = LsrTree(folder, outfmt="dataframe")
-            self.folder_file_list = lsr2.list_files_list()
-            self.folder_file_df = lsr2.list_files_dataframe()
+            self.folder_file_list = lsr1.list_files_list()
+            self.folder_file_df = lsr1.list_files_dataframe(typed=True)
+            scan_stats = lsr1.get_scan_stats()
+            self.tab_folder_meta_json["scan_stats"] = scan_stats
+            mtbp3cd.gui.util_show_message(self.message_list, f"Scan: {scan_stats['files']} files in {scan_stats['wall_seconds']:.2f} s ({scan_stats['files_per_second']} files/s)", status="info")
+            if lsr1.cache_stats:
+                mtbp3cd.gui.util_show_message(self.message_list, f"Cache: hits={lsr1.cache_stats['hits']}, misses={lsr1.cache_stats['misses']}, removed={lsr1.cache_stats['removed']}", status="info")
             self.tab_list_str.clear()
             self.tab_list_str.addItems([f"{str(idx+1).zfill(width)}: {str(item)}" for idx, item in enumerate(self.folder_file_list)])
 
             # Display DataFrame in the QTableWidget
+            display_df = to_legacy_dataframe(self.folder_file_df)
             self.tab_table_qttable.clear()
-            self.tab_table_qttable.setRowCount(self.folder_file_df.shape[0])
-            self.tab_table_qttable.setColumnCount(self.folder_file_df.shape[1])
-            self.tab_table_qttable.setHorizontalHeaderLabels([str(col) for col in self.folder_file_df.columns])
+            self.tab_table_qttable.setRowCount(display_df.shape[0])
+            self.tab_table_qttable.setColumnCount(display_df.shape[1])
+            self.tab_table_qttable.setHorizontalHeaderLabels([str(col) for col in display_df.columns])
 
-            for row in range(self.folder_file_df.shape[0]):
-                for col in range(self.folder_file_df.shape[1]-1):
-                    value = str(self.folder_file_df.iat[row, col])
+            for row in range(display_df.shape[0]):
+                for col in range(display_df.shape[1]-1):
+                    value = str(display_df.iat[row, col])
                     item = QTableWidgetItem(value)
                     self.tab_table_qttable.setItem(row, col, item)
             self.tab_table_qttable.resizeColumnsToContents()
@@ -208,11 +218,23 @@ class TabFolder(QWidget):
 
         file_path = os.path.join(file_path_base, "log_folder_table.csv")
         try:
-            self.folder_file_df.to_csv(file_path, index=False)
+            to_legacy_dataframe(self.folder_file_df).to_csv(file_path, index=False)
             mtbp3cd.gui.util_show_message(self.message_list, f"CSV exported: {file_path}", status="s")
         except Exception as e:
             mtbp3cd.gui.util_show_message(self.message_list, f"Failed to export CSV: {e}", status="f")
 
+        file_path = os.path.join(file_path_base, "log_folder_snapshots.sqlite")
+        try:
+            store = LsrSnapshots(file_path)
+            try:
+                scan_id = store.add_scan(self.folder_file_df, label=self.tab_folder_meta_json.get("scan_time"), root=self.gt01_input_folder_path)
+                n_changed = store.scans()["n_changed"].iloc[-1]
+            finally:
+                store.close()
+            mtbp3cd.gui.util_show_message(self.message_list, f"Snapshot {scan_id} added ({n_changed} changed files): {file_path}", status="s")
+        except Exception as e:
+            mtbp3cd.gui.util_show_message(self.message_list, f"Failed to add snapshot: {e}", status="f")
+
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
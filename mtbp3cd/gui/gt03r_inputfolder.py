@@ -167,6 +167,7 @@ class TabInput(QWidget):
             self.tab_sd_tree_str.addItems([f"{str(idx+1).rjust(width, ' ')}: {str(item)}" for idx, item in enumerate(self.tab_sd_tree_str0)])
             lsr2 = LsrTree(folder, outfmt="dataframe")
             self.tab_sd_df = lsr2.list_files_dataframe()
+            self.tab_sd_meta_json["scan_stats"] = lsr2.get_scan_stats()
             self.tabs.setCurrentWidget(self.tabs_sd)
 
     def tab_button_2_f(self):
@@ -192,6 +193,7 @@ class TabInput(QWidget):
             self.tab_ad_tree_str.addItems([f"{str(idx+1).rjust(width, ' ')}: {str(item)}" for idx, item in enumerate(self.tab_ad_tree_str0)])
             lsr2 = LsrTree(folder, outfmt="dataframe")
             self.tab_ad_df = lsr2.list_files_dataframe()
+            self.tab_ad_meta_json["scan_stats"] = lsr2.get_scan_stats()
 
             self.tabs.setCurrentWidget(self.tabs_ad)
 
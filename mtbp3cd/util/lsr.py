@@ -15,16 +15,255 @@
 #  along with this program. If not, see <https://www.gnu.org/license/>
 
 
+import io
 import os
+import gzip
 import json
 import pandas as pd
 import time
+from datetime import datetime
 import numpy as np
-import pypdf 
-import hashlib
+import heapq
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from mtbp3cd.util.lsrcache import LsrCache, LsrListings
+from mtbp3cd.util.lsrfilter import LsrFilter
+from mtbp3cd.util.lsrdup import LsrDuplicates
+from mtbp3cd.util.lsrhash import get_digests, get_fingerprint, normalize_algorithm
+from mtbp3cd.util.lsrextract import select_extractors, run_extractors, add_extractor_stats, detect_file_type
+from mtbp3cd.util.lsrarchive import is_archive, archive_nodes, open_member, close_archives
+
+def extract_file_meta(file_path, file_type, digests=(), sample_size=None, extractors=None, sniff=True):
+    """
+    Collect the md5 and the page, column and row counts of one file, with the extractor records and the hashing work.
+
+    This is a module-level function so that it can be sent to a process pool.
+    The md5 and any extra digests are computed from a single read of the file.
+
+    Args:
+        file_path (str or tuple): The path to the file, or the (archive path, member name, size, offset, crc32)
+            source of an archive member from archive_nodes(); the member is then streamed from the archive to the
+            digests and extractors, without extracting it.
+        file_type (str): The file extension used to pick the extractors, e.g. 'xlsx', 'sas7bdat', 'xpt', 'csv' or 'pdf'.
+        digests (tuple): Extra digest names computed with the md5, e.g. ('sha256', 'sha512'). Defaults to ().
+        sample_size (int): If set, a quick fingerprint with samples of this size is added, and the md5 and digests
+            are only computed for files no larger than three samples. Defaults to None (full digests, no fingerprint).
+        extractors (dict): The extractors to run, from select_extractors(). Defaults to None (all registered extractors).
+        sniff (bool): Whether to pick the extractors by the type detected from the first bytes of the file instead of
+            the extension, so misnamed files are parsed by the right extractor or not at all. See detect_file_type().
+            Defaults to True.
+
+    Returns:
+        tuple: (meta, records, hash_seconds, bytes_read), where meta is (num_pages, num_columns, num_rows, md5, *digests),
+        followed by the fingerprint if sample_size is set, with None for counts that do not apply to the file type;
+        records is the list of (extractor name, status, seconds) from run_extractors(), and bytes_read counts the bytes hashed.
+    """
+    if isinstance(file_path, tuple):
+        try:
+            with open_member(*file_path[:4]) as f:
+                return _extract_meta(f, file_path[2], file_type, digests, sample_size, extractors, sniff)
+        except Exception:
+            # A damaged or encrypted archive member
+            empty = (None,) * (4 + len(digests) + (sample_size is not None))
+            return empty, [], 0.0, 0
+    try:
+        size = os.path.getsize(file_path)
+    except OSError:
+        size = None
+    return _extract_meta(file_path, size, file_type, digests, sample_size, extractors, sniff)
+
+
+def _extract_meta(file_path, size, file_type, digests, sample_size, extractors, sniff):
+    fingerprint = ()
+    file_digests = {}
+    bytes_read = 0
+    start = time.perf_counter()
+    if sample_size is not None:
+        try:
+            fingerprint = (get_fingerprint(file_path, sample_size),)
+            bytes_read += min(size or 0, 3 * sample_size)
+        except Exception:
+            fingerprint = (None,)
+    try:
+        if sample_size is None or (size is not None and size <= 3 * sample_size):
+            file_digests = get_digests(file_path, ["md5"] + list(digests))
+            bytes_read += size
+    except Exception:
+        pass
+    hash_seconds = time.perf_counter() - start
+    if extractors is None:
+        extractors = select_extractors()
+    if sniff:
+        file_type = detect_file_type(file_path, file_type)
+    values, records = run_extractors(file_path, file_type, size, extractors)
+    meta = (values["N_page"], values["N_column"], values["N_row"], file_digests.get("md5"))
+    return meta + tuple(file_digests.get(algo) for algo in digests) + fingerprint, records, hash_seconds, bytes_read
+
+
+typed_dtypes = {
+    "path": "category", "level": "int64", "type": "category", "file": object, "size_in_bytes": "Int64",
+    "modified": "datetime64[ns]", "created": "datetime64[ns]", "file_type": "category",
+    "N_page": "Int64", "N_column": "Int64", "N_row": "Int64", "md5": object, "hash_mode": "category",
+    "duplicate_group": "Int64",
+}
+legacy_count_columns = ["size_in_bytes", "N_page", "N_column", "N_row", "duplicate_group"]
+legacy_time_columns = ["modified", "created"]
+legacy_time_format = "%a %b %d %H:%M:%S %Y"
+
+
+def inventory_rel_path(path, file):
+    """
+    Return the path of a file relative to the scanned folder from the 'path' and 'file' columns of an inventory.
+
+    Args:
+        path (str): The 'path' value, e.g. '.' or '/folder1'.
+        file (str): The 'file' value.
+
+    Returns:
+        str: The relative path with '/' as separator, e.g. 'folder1/file2.txt'.
+    """
+    path = "" if path is None or pd.isna(path) or path == "." else str(path).replace("\\", "/").strip("/")
+    if not file:
+        return path
+    return f"{path}/{file}" if path else str(file)
+
+
+def iter_inventory_chunks(inventory, chunk_size=10000):
+    """
+    Iterate over an inventory as DataFrame chunks.
+
+    Args:
+        inventory: A DataFrame, an iterable of DataFrame chunks, or an iterable of entry dicts such as LsrTree.iter_entries().
+        chunk_size (int): The number of entry dicts per chunk. Defaults to 10000.
+
+    Yields:
+        pd.DataFrame: The chunks, in order.
+    """
+    if isinstance(inventory, pd.DataFrame):
+        yield inventory
+        return
+    batch = []
+    for item in inventory:
+        if isinstance(item, pd.DataFrame):
+            if batch:
+                yield pd.DataFrame(batch)
+                batch = []
+            yield item
+        else:
+            batch.append(item)
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame(batch)
+                batch = []
+    if batch:
+        yield pd.DataFrame(batch)
+
+
+def _legacy_to_int64(values):
+    if values.dtype != object:
+        return pd.to_numeric(values, errors="coerce").astype("Int64")
+    # Count columns repeat few values, so each distinct string is parsed once
+    codes, uniques = pd.factorize(values)
+    if len(uniques) == 0:
+        return pd.Series(pd.NA, index=values.index, dtype="Int64")
+    uniques = pd.Series(uniques, dtype=object)
+    uniques = pd.to_numeric(uniques.mask(uniques == "None"), errors="coerce").astype("Int64")
+    result = uniques.take(codes.clip(min=0)).set_axis(values.index)
+    return result.mask(codes < 0)
+
+
+def to_typed_dataframe(df):
+    """
+    Convert an inventory DataFrame from the legacy string schema to the typed schema.
+
+    Counts stored as strings (including 'None') become nullable Int64, time.ctime strings become
+    datetime64, and 'path', 'type' and 'file_type' become categorical. Columns that are already typed
+    are kept, so the function can be applied to either schema, e.g. to a log_folder_table.csv read back with pd.read_csv.
+
+    Args:
+        df (pd.DataFrame): The inventory DataFrame.
+
+    Returns:
+        pd.DataFrame: A typed copy of the DataFrame.
+    """
+    df = df.copy()
+    if "level" in df.columns:
+        df["level"] = pd.to_numeric(df["level"], errors="coerce").astype("Int64" if df["level"].isna().any() else "int64")
+    for col in legacy_count_columns:
+        if col in df.columns:
+            df[col] = _legacy_to_int64(df[col])
+    for col in legacy_time_columns:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], format=legacy_time_format, errors="coerce")
+    for col in ["path", "type", "file_type"]:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def to_legacy_dataframe(df):
+    """
+    Convert an inventory DataFrame from the typed schema to the legacy string schema of list_files_dataframe().
+
+    For file rows, counts become strings ('None' if missing) and timestamps become time.ctime strings.
+    Folder rows hold None in these columns.
+
+    Args:
+        df (pd.DataFrame): The typed inventory DataFrame.
+
+    Returns:
+        pd.DataFrame: A copy of the DataFrame in the legacy schema.
+    """
+    df = df.copy()
+    is_file = (df["type"] == "file").to_numpy() if "type" in df.columns else None
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+    for col in legacy_count_columns + legacy_time_columns:
+        if col not in df.columns:
+            continue
+        if col in legacy_count_columns:
+            values = ["None" if pd.isna(v) else str(v) for v in df[col]]
+        else:
+            values = [None if pd.isna(v) else v.ctime() for v in df[col]]
+        if is_file is not None:
+            values = [v if f else None for v, f in zip(values, is_file)]
+        df[col] = pd.Series(values, index=df.index, dtype=object)
+    return df
+
+
+class _ListedEntry:
+    # A stand-in for os.DirEntry built from a stored folder listing; the names and types are stored,
+    # and stat() reads the file again, so files changed in place are seen
+
+    def __init__(self, top, name, is_dir, is_link):
+        self.name = name
+        self.path = os.path.join(top, name)
+        self._is_dir = is_dir
+        self._is_link = is_link
+        self._stat = None
+
+    def is_dir(self):
+        return self._is_dir
+
+    def is_symlink(self):
+        return self._is_link
+
+    def stat(self):
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+def _inode_stat(path, st):
+    # Returns st, or os.stat(path) if st has no inode number: the stat results of os.scandir() on Windows
+    # leave st_ino, st_dev and st_nlink at 0, and os.stat() reads them from the file
+    return st if st.st_ino else os.stat(path)
+
 
 class LsrTree:
-    def __init__(self, path="", outfmt="list", with_counts=False, count_str="", with_file_label=False, label_str=""):
+    entry_columns = ["path", "level", "type", "file", "size_in_bytes", "modified", "created", "file_type", "N_page", "N_column", "N_row", "md5"]
+
+    def __init__(self, path="", outfmt="list", with_counts=False, count_str="", with_file_label=False, label_str="", workers=1, chunk_size=1000, cache_path=None, digests=None, include=None, exclude=None, max_depth=None, file_types=None, hash_mode="full", sample_size=1 << 16, with_duplicates=False, extractors=None, max_extractor_cost=None, extractor_options=None, slowest_n=10, sniff_types=True, archives=False, follow_symlinks=False, walk_workers=1, walk_depth=1, reuse_listings=False):
         """
         Initialize the LsrTree object.
 
@@ -35,13 +274,395 @@ class LsrTree:
             with_file_label (bool): Whether to include the label of known files in the dataframe output. Defaults to False.
             count_str (str): The string to use for search for the count of files. Defaults to an empty string.
             label_str (str): The string to use for label files. Defaults to an empty string.
+            workers (int): The number of processes used for per-file metadata in the dataframe output. Defaults to 1 (no process pool).
+            chunk_size (int): The number of entries processed, and submitted to the process pool, at a time. Defaults to 1000.
+            cache_path (str): The path to a SQLite file used to reuse per-file metadata of unchanged files between scans.
+                Rows of files no longer found are removed after a complete scan without filters or since.
+                Defaults to None (no cache).
+            digests (list): Extra digests added as columns next to 'md5', e.g. ['sha256', 'sha512']. They are computed from
+                the same read of each file as the md5. Defaults to None (md5 only).
+            include (list): Glob strings or compiled regular expressions a file must match to be listed. Defaults to None.
+            exclude (list): Glob strings or compiled regular expressions for files and folders to skip. Defaults to None.
+            max_depth (int): The deepest folder level walked; 0 lists only the files of the top folder. Defaults to None (no limit).
+            file_types (list): File extensions to list, e.g. ['xpt', 'sas7bdat']. Defaults to None (all types).
+                The filters are applied during the walk, before files are stat'ed, so skipped folders cost nothing. See LsrFilter.
+            hash_mode (str): 'full' to hash every file, or 'quick' to add 'fingerprint' and 'hash_mode' columns and
+                skip the md5 and digests of files larger than three samples. See verify_digests(). Defaults to 'full'.
+            sample_size (int): The size in bytes of the head, middle and tail samples in 'quick' mode. Defaults to 64 KiB.
+            with_duplicates (bool): Whether to add a 'duplicate_group' column to the dataframe output, numbering the groups
+                of byte-identical files. See find_duplicates(). Defaults to False.
+            extractors (list): The names of the registered extractors used for the page, column and row counts.
+                Defaults to None (all registered extractors). See register_extractor().
+            max_extractor_cost (float): Extractors with a higher relative cost are not run. Defaults to None (no limit).
+            extractor_options (dict): Per-scan 'timeout' and 'max_size' overrides by extractor name,
+                e.g. {'pdf': {'timeout': 2.0}}. Defaults to None.
+            slowest_n (int): The number of slowest files kept in the scan statistics. See get_scan_stats(). Defaults to 10.
+            sniff_types (bool): Whether extractors are picked by the file type detected from the first bytes of each file
+                rather than by its extension. The 'file_type' column still holds the extension. Defaults to True.
+            archives (bool): Whether to list the members of zip and tar files (see archive_extensions) as a virtual
+                folder named after the archive, next to the archive file itself. Member names, sizes and timestamps come
+                from the zip central directory or the tar headers, and a 'crc32' column holds the CRC-32 of zip members.
+                Members are hashed and parsed from the archive without extracting them. Defaults to False.
+            follow_symlinks (bool): Whether to walk symlinked folders whose target is outside the scanned folder.
+                Each physical folder (st_dev, st_ino) is walked once, so symlink loops end. Symlinked folders with a
+                target inside the scanned folder are listed but not walked, as their files are listed under the real path.
+                Symlinks found are saved in symlinks. Defaults to False (symlinked folders are listed but not walked).
+            walk_workers (int): The number of threads listing folders. With walk_workers > 1, the folders down to
+                walk_depth are listed first, and the subtrees below them are walked concurrently and merged back into
+                the order of the serial walk, which helps on network shares where listing a folder is slow.
+                It is ignored with follow_symlinks, where the walk order decides which link to a folder is walked.
+                Defaults to 1 (serial walk).
+            walk_depth (int): The depth of the subtrees walked concurrently; 1 gives one subtree per sub-folder of
+                the scanned folder. Use 2 or more when a few top-level folders hold most of the tree. Defaults to 1.
+            reuse_listings (bool): Whether to store the listing of each folder with its mtime_ns in the cache_path file
+                and reuse it while the folder's mtime is unchanged, so unchanged folders are not read again; their files
+                and sub-folders are still stat'ed, so files changed in place are seen.
+                The folders reused and listed are counted in listing_stats. Requires cache_path. See LsrListings.
+                Defaults to False.
         """
+        if hash_mode not in ["full", "quick"]:
+            raise ValueError("Invalid hash_mode. Must be one of 'full' or 'quick'.")
+        if int(walk_workers) < 1 or int(walk_depth) < 1:
+            raise ValueError("walk_workers and walk_depth must be positive integers.")
+        if reuse_listings and not cache_path:
+            raise ValueError("reuse_listings requires cache_path.")
         if path and path.endswith('/'):
             path = path[:-1]
         self.path = path
         self.outfmt = outfmt
         self.with_counts = with_counts
         self.count_str = count_str
+        self.workers = workers
+        self.chunk_size = max(1, int(chunk_size))
+        self.cache_path = cache_path
+        self.cache_stats = {}
+        self.verify_stats = {}
+        self.duplicate_stats = {}
+        self.extractor_stats = {}
+        self.slowest_n = max(0, int(slowest_n))
+        self.sniff_types = sniff_types
+        self.archives = archives
+        self.follow_symlinks = follow_symlinks
+        self.walk_workers = int(walk_workers)
+        self.walk_depth = int(walk_depth)
+        self.reuse_listings = reuse_listings
+        self.listing_stats = {}
+        self.previous_walk_ns = None
+        self.symlinks = []
+        self.scan_stats = {}
+        self._reset_scan_stats(walk=True, meta=True)
+        self.extractors = select_extractors(extractors, max_cost=max_extractor_cost, options=extractor_options)
+        self.with_duplicates = with_duplicates
+        self.digests = [algo for algo in dict.fromkeys(normalize_algorithm(d) for d in (digests or [])) if algo != "md5"]
+        self.hash_mode = hash_mode
+        self.sample_size = max(1, int(sample_size))
+        self.meta_digests = self.digests + (["fingerprint"] if hash_mode == "quick" else [])
+        self.columns = self.entry_columns + self.digests + (["crc32"] if archives else []) + (["fingerprint", "hash_mode"] if hash_mode == "quick" else [])
+        self.filter = LsrFilter(include=include, exclude=exclude, max_depth=max_depth, file_types=file_types)
+        self._nodes = None
+
+    def scan(self, refresh=False):
+        """
+        Walk the directory once with os.scandir and keep the result as an in-memory node table.
+
+        Each node is a dict with keys 'dirpath', 'dirs', 'files' and 'links', ordered as sorted(os.walk(path)).
+        'dirs' is a sorted list of sub-folder names and 'files' is a sorted list of (name, os.stat_result)
+        tuples, where the stat result is None if the file could not be stat'ed (e.g. a broken link).
+        'links' is a sorted list of the names in 'dirs' and 'files' that are symlinks, and 'filtered' is True if
+        entries of the folder were left out by include, exclude or file_types, so it is not reported as empty.
+        All list_files_* methods render from this table, so the file system is only walked once per object.
+
+        Args:
+            refresh (bool): Whether to discard the cached node table and walk the directory again. Defaults to False.
+
+        Returns:
+            list: The node table.
+        """
+        if self._nodes is not None and not refresh:
+            return self._nodes
+        self._reset_scan_stats(walk=True)
+        start = time.perf_counter()
+        self._nodes = list(self._walk_nodes())
+        self.scan_stats["walk_wall_seconds"] = time.perf_counter() - start
+        return self._nodes
+
+    def _reset_scan_stats(self, walk=False, meta=False):
+        stats = self.scan_stats
+        if walk:
+            stats.update({"walk_wall_seconds": 0.0, "walk_seconds": 0.0, "stat_seconds": 0.0, "folders": 0, "files": 0})
+            self.symlinks = []
+        if meta:
+            stats.update({
+                "meta_wall_seconds": 0.0, "cache_seconds": 0.0, "hash_seconds": 0.0, "extract_seconds": 0.0,
+                "meta_files": 0, "bytes_read": 0, "aliases": 0, "bytes_saved": 0, "slowest": [],
+            })
+
+    def get_scan_stats(self):
+        """
+        Return the timing and throughput of the last walk and metadata pass, e.g. to save in log_folder_meta.json.
+
+        The phases are 'walk' (listing folders), 'stat', 'cache' (lookups), 'hash' (md5, digests and fingerprints)
+        and 'extract' (page, column and row counts). With workers > 1, the 'hash' and 'extract' seconds are summed
+        over the workers, so they can exceed the wall time.
+
+        Returns:
+            dict: With the keys 'wall_seconds', 'phases' ({phase: seconds}), 'folders', 'files' (files listed),
+            'meta_files' (files hashed or parsed, i.e. not found in the cache), 'bytes_read' (bytes hashed),
+            'aliases' (hard links and symlinks to a file already read, whose metadata was reused) and 'bytes_saved'
+            (their sizes), 'symlinks' (the numbers of 'file', 'folder' and 'broken' symlinks and of symlinked folders
+            'walked'), 'files_per_second', 'bytes_per_second', 'extractors' (see extractor_stats), and 'slowest_files',
+            a list of the slowest_n files with their 'rel_path', 'seconds', 'hash_seconds', 'extractor' and
+            'extractor_seconds'.
+
+        Examples:
+            >>> lsr = LsrTree("/path/to/directory")
+            >>> df = lsr.list_files_dataframe()
+            >>> lsr.get_scan_stats()["phases"]
+            {'walk': 0.012, 'stat': 0.004, 'cache': 0.0, 'hash': 0.151, 'extract': 0.083}
+        """
+        stats = self.scan_stats
+        wall = stats["walk_wall_seconds"] + stats["meta_wall_seconds"]
+        return {
+            "wall_seconds": round(wall, 6),
+            "phases": {phase: round(stats[f"{phase}_seconds"], 6) for phase in ["walk", "stat", "cache", "hash", "extract"]},
+            "folders": stats["folders"],
+            "files": stats["files"],
+            "meta_files": stats["meta_files"],
+            "bytes_read": stats["bytes_read"],
+            "aliases": stats["aliases"],
+            "bytes_saved": stats["bytes_saved"],
+            "symlinks": {
+                "file": sum(link["type"] == "file" for link in self.symlinks),
+                "folder": sum(link["type"] == "folder" for link in self.symlinks),
+                "broken": sum(link["type"] == "broken" for link in self.symlinks),
+                "walked": sum(link["walked"] for link in self.symlinks),
+            },
+            "files_per_second": round(stats["files"] / wall, 1) if wall > 0 else None,
+            "bytes_per_second": round(stats["bytes_read"] / wall, 1) if wall > 0 else None,
+            "extractors": {name: dict(item, seconds=round(item["seconds"], 6)) for name, item in self.extractor_stats.items()},
+            "slowest_files": [
+                {"rel_path": rel_path, "seconds": round(seconds, 6), "hash_seconds": round(hash_seconds, 6),
+                 "extractor": extractor, "extractor_seconds": round(extractor_seconds, 6)}
+                for seconds, rel_path, hash_seconds, extractor, extractor_seconds in sorted(stats["slowest"], reverse=True)
+            ],
+        }
+
+    def _walk_nodes(self):
+        # With walk_workers > 1, the subtrees at walk_depth are walked in threads. Each partial node table
+        # is sorted by folder path like the serial walk, so merging the tables by path gives the serial order.
+        # With reuse_listings, the stored listings are written when the walk ends, and the start time of
+        # a completed walk without filters is saved for since='last'.
+        lsr_filter = self.filter if self.filter.active else None
+        stats = self.scan_stats
+        walk_ns = time.time_ns()
+        listings = LsrListings(self.cache_path) if self.reuse_listings else None
+        if listings is not None:
+            self.previous_walk_ns = listings.last_walk_ns
+        if self.walk_workers > 1 and not self.follow_symlinks:
+            items = self._walk_parallel(lsr_filter, listings)
+        else:
+            walked = set()
+            if self.follow_symlinks:
+                try:
+                    st = os.stat(self.path)
+                    walked.add((st.st_dev, st.st_ino))
+                except OSError:
+                    pass
+            items = self._walk([self.path], lsr_filter, walked, listings=listings)
+        completed = False
+        try:
+            for node, symlinks, walk_seconds, stat_seconds in items:
+                stats["walk_seconds"] += walk_seconds
+                stats["stat_seconds"] += stat_seconds
+                stats["folders"] += 1
+                stats["files"] += len(node["files"])
+                self.symlinks.extend(symlinks)
+                yield node
+            completed = True
+        finally:
+            if listings is not None:
+                listings.close(walk_ns=walk_ns if completed and lsr_filter is None else None, prune=completed)
+                self.listing_stats = dict(listings.stats)
+
+    def _walk_parallel(self, lsr_filter, listings=None):
+        roots = []
+        top = list(self._walk([self.path], lsr_filter, set(), self.walk_depth, roots, listings))
+        if not roots:
+            yield from top
+            return
+        with ThreadPoolExecutor(max_workers=self.walk_workers) as executor:
+            futures = [executor.submit(lambda root: list(self._walk([root], lsr_filter, set(), listings=listings)), root) for root in roots]
+            parts = [top] + [self._iter_result(future) for future in futures]
+            yield from heapq.merge(*parts, key=lambda item: item[0]["dirpath"])
+
+    @staticmethod
+    def _iter_result(future):
+        yield from future.result()
+
+    def _walk(self, roots, lsr_filter, walked, split_depth=None, split=None, listings=None):
+        # A heap keyed by the full folder path gives the sorted(os.walk()) order one folder at a time:
+        # every folder not yet listed has an ancestor in the heap whose path sorts before its own.
+        # Filters only see names and relative paths, so skipped entries are never stat'ed.
+        # With archives, the nodes of an archive are built from its headers when its folder is listed,
+        # and are queued in the same heap under the archive path.
+        # With follow_symlinks, the (st_dev, st_ino) of every walked folder is kept, and a symlinked folder
+        # is only walked if its target was not walked yet.
+        # With split_depth, folders at that depth are added to split instead of being walked.
+        # With listings, a folder with an unchanged mtime is rebuilt from its stored listing instead of os.scandir.
+        # Yields (node, symlinks, walk_seconds, stat_seconds), so the caller keeps the statistics.
+        heap = list(roots)
+        heapq.heapify(heap)
+        virtual = {}
+        while heap:
+            top = heapq.heappop(heap)
+            start = time.perf_counter()
+            stat_seconds = 0.0
+            symlinks = []
+            if lsr_filter is not None or split_depth is not None:
+                top_rel = self._relpath(top).lstrip(os.sep).replace(os.sep, "/")
+                depth = top_rel.count("/") + 1 if top_rel else 0
+            if top in virtual:
+                node = virtual.pop(top)
+                for d1 in node["dirs"]:
+                    if lsr_filter is None or lsr_filter.walk_dir(depth + 1):
+                        heapq.heappush(heap, os.path.join(top, d1))
+                yield node, symlinks, time.perf_counter() - start, 0.0
+                continue
+            try:
+                entries, listing = self._list_dir(top, listings)
+            except OSError:
+                continue
+            dirs = []
+            files = []
+            links = []
+            filtered = False
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                try:
+                    is_link = entry.is_symlink()
+                except OSError:
+                    is_link = False
+                if listing is not None:
+                    listing[0].append((entry.name, is_dir, is_link))
+                if self.archives and not is_dir and is_archive(entry.name):
+                    archive_path = os.path.join(top, entry.name)
+                    nodes = self._archive_nodes(archive_path, lsr_filter)
+                    if nodes:
+                        virtual.update(nodes)
+                        dirs.append(entry.name)
+                        heapq.heappush(heap, archive_path)
+                if lsr_filter is not None:
+                    rel = top_rel + "/" + entry.name if top_rel else entry.name
+                    if is_dir and not lsr_filter.keep_dir(rel, entry.name):
+                        filtered = True
+                        continue
+                    if not is_dir and not lsr_filter.keep_file(rel, entry.name):
+                        filtered = True
+                        continue
+                if is_link:
+                    links.append(entry.name)
+                if is_dir:
+                    dirs.append(entry.name)
+                    walk = lsr_filter is None or lsr_filter.walk_dir(depth + 1)
+                    if walk and (is_link or self.follow_symlinks):
+                        walk = self._walk_dir(entry, is_link, walked, symlinks)
+                    if walk and split_depth is not None and depth + 1 == split_depth:
+                        split.append(os.path.join(top, entry.name))
+                    elif walk:
+                        heapq.heappush(heap, os.path.join(top, entry.name))
+                else:
+                    stat_start = time.perf_counter()
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        st = None
+                    stat_seconds += time.perf_counter() - stat_start
+                    files.append((entry.name, st))
+                    if is_link:
+                        self._add_symlink(symlinks, entry.path, "file" if st is not None else "broken", False)
+            dirs.sort()
+            files.sort(key=lambda x: x[0])
+            links.sort()
+            if listing is not None:
+                listings.put(self._listing_key(top), listing[1], listing[2], listing[0])
+            node = {"dirpath": top, "dirs": dirs, "files": files, "links": links, "filtered": filtered}
+            yield node, symlinks, time.perf_counter() - start - stat_seconds, stat_seconds
+
+    def _list_dir(self, top, listings):
+        # Returns the entries of a folder, sorted by name, and the listing to store: ([], mtime_ns, listed_ns),
+        # filled by the caller, or None if nothing is stored
+        if listings is None:
+            with os.scandir(top) as it:
+                return sorted(it, key=lambda x: x.name), None
+        mtime_ns = os.stat(top).st_mtime_ns
+        stored = listings.get(self._listing_key(top), mtime_ns)
+        if stored is not None:
+            return [_ListedEntry(top, *item) for item in stored], None
+        listed_ns = time.time_ns()
+        with os.scandir(top) as it:
+            return sorted(it, key=lambda x: x.name), ([], mtime_ns, listed_ns)
+
+    def _listing_key(self, top):
+        return self._relpath(top).lstrip(os.sep).replace(os.sep, "/")
+
+    def _walk_dir(self, entry, is_link, walked, symlinks):
+        # Returns whether a folder is walked, and records symlinked folders; only called for symlinks
+        # or with follow_symlinks, so plain walks make no extra stat calls
+        walk = self.follow_symlinks
+        if walk and is_link:
+            root = os.path.realpath(self.path)
+            target = os.path.realpath(entry.path)
+            # A target inside the scanned folder is listed under its real path
+            walk = target != root and not target.startswith(root.rstrip(os.sep) + os.sep)
+        if walk:
+            try:
+                st = _inode_stat(entry.path, entry.stat())
+                # Without inode numbers (e.g. on FAT), the resolved path stands in for the folder's identity
+                key = (st.st_dev, st.st_ino) if st.st_ino else os.path.realpath(entry.path)
+            except OSError:
+                key = None
+            walk = key is not None and key not in walked
+            if walk:
+                walked.add(key)
+        if is_link:
+            self._add_symlink(symlinks, entry.path, "folder", walk)
+        return walk
+
+    def _add_symlink(self, symlinks, path, link_type, walked):
+        try:
+            target = os.readlink(path)
+        except OSError:
+            target = None
+        symlinks.append({
+            "rel_path": self._relpath(path).lstrip(os.sep).replace(os.sep, "/"), "target": target, "type": link_type, "walked": walked,
+        })
+
+    def _archive_nodes(self, archive_path, lsr_filter):
+        # Returns the virtual nodes of an archive, or None if it is not walked or cannot be read
+        keep = None
+        if lsr_filter is not None:
+            rel = self._relpath(archive_path).lstrip(os.sep).replace(os.sep, "/")
+            name = os.path.basename(archive_path)
+            if not lsr_filter.keep_dir(rel, name) or not lsr_filter.walk_dir(rel.count("/") + 1):
+                return None
+
+            def keep(parts, is_dir):
+                member_rel = rel + "/" + "/".join(parts)
+                return lsr_filter.keep_dir(member_rel, parts[-1]) if is_dir else lsr_filter.keep_file(member_rel, parts[-1])
+        try:
+            return archive_nodes(archive_path, archive_path, keep)
+        except Exception:
+            return None
+
+    def _relpath(self, s0, base=None):
+        if base is None:
+            base = self.path
+        if s0.startswith(base):
+            return s0[len(base):] if len(s0) > len(base) else ""
+        return s0
 
     def list_files(self):
         """
@@ -83,17 +704,107 @@ class LsrTree:
         Returns:
             str: The JSON string representing the file list.
         """
-        data = {}
-        idx = 0
-        for s0, d0, f0 in sorted(os.walk(self.path)):
-            if s0.startswith(self.path):
-                s1 = s0[len(self.path):] if len(s0) > len(self.path) else ""
+        return "".join(self._iter_json(self.scan(), "object"))
+
+    def iter_json(self, fmt="ndjson"):
+        """
+        Yield the JSON text of the folder records piece by piece, one folder at a time.
+
+        Each folder record has the keys 'path', 'level', 'folders' and 'files', as in list_files_json().
+        If scan() was not called, the folders are walked lazily, so memory use does not grow with the tree
+        and the first records are available right away.
+
+        Args:
+            fmt (str): 'ndjson' for one record per line, 'array' for a JSON array of the records, or 'object'
+                for the object keyed by folder index of list_files_json(). Defaults to 'ndjson'.
+
+        Yields:
+            str: Pieces of JSON text; joined, they form the whole document.
+
+        Examples:
+            >>> for line in LsrTree("/path/to/directory").iter_json():
+            ...     record = json.loads(line)
+        """
+        if fmt not in ["ndjson", "array", "object"]:
+            raise ValueError("Invalid JSON format. Must be one of 'ndjson', 'array', or 'object'.")
+        if self._nodes is None:
+            self._reset_scan_stats(walk=True)
+        return self._iter_json(self._nodes if self._nodes is not None else self._walk_nodes(), fmt)
+
+    def _iter_json(self, nodes, fmt):
+        if fmt == "array":
+            yield "["
+        elif fmt == "object":
+            yield "{"
+        for idx, node in enumerate(nodes):
+            s1 = self._relpath(node["dirpath"])
+            text = json.dumps({"path": s1, "level": s1.count(os.sep), "folders": node["dirs"], "files": [f1 for f1, _ in node["files"]]})
+            if fmt == "ndjson":
+                yield text + "\n"
+            elif fmt == "array":
+                yield (", " if idx else "") + text
             else:
-                s1 = s0 
-            n1 = s1.count(os.sep)
-            data[idx] = {"path": s1, "level": n1, "folders": d0, "files": f0}
-            idx = idx + 1
-        return json.dumps(data)
+                yield (", " if idx else "") + f'"{idx}": ' + text
+        if fmt == "array":
+            yield "]"
+        elif fmt == "object":
+            yield "}"
+
+    def write_json(self, file, fmt=None, compress=None):
+        """
+        Write the folder records of iter_json() to a file without building the document in memory.
+
+        Args:
+            file (str or file object): The output path, or a file object opened for writing text
+                (binary if compress is 'gzip').
+            fmt (str): 'ndjson', 'array' or 'object'. Defaults to None, which uses the file extension
+                ('.ndjson'/'.jsonl' for 'ndjson', '.json' for 'array', ignoring a trailing '.gz'), or 'ndjson' for file objects.
+            compress (str): 'gzip' to compress the output. Defaults to None, which compresses paths ending with '.gz'.
+
+        Returns:
+            int: The number of folder records written.
+
+        Examples:
+            >>> LsrTree("/path/to/directory").write_json("/path/to/output/log_folder_tree.ndjson.gz")
+        """
+        if compress not in [None, "gzip"]:
+            raise ValueError("Invalid compression. Must be None or 'gzip'.")
+        if isinstance(file, (str, os.PathLike)):
+            path = os.fspath(file)
+            base = path[:-3] if path.lower().endswith(".gz") else path
+            if compress is None and base != path:
+                compress = "gzip"
+            if fmt is None:
+                fmt = {".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "array"}.get(os.path.splitext(base)[1].lower())
+                if fmt is None:
+                    raise ValueError("Cannot infer the JSON format from the file extension; set fmt.")
+            pieces = self.iter_json(fmt)
+            if compress == "gzip":
+                with gzip.open(path, "wt", encoding="utf-8") as f:
+                    return self._write_pieces(f, pieces, fmt)
+            with open(path, "w", encoding="utf-8") as f:
+                return self._write_pieces(f, pieces, fmt)
+        pieces = self.iter_json(fmt or "ndjson")
+        if compress == "gzip":
+            # The caller's file object is left open
+            gz = gzip.GzipFile(fileobj=file, mode="wb")
+            f = io.TextIOWrapper(gz, encoding="utf-8")
+            try:
+                return self._write_pieces(f, pieces, fmt or "ndjson")
+            finally:
+                f.flush()
+                f.detach()
+                gz.close()
+        return self._write_pieces(file, pieces, fmt or "ndjson")
+
+    @staticmethod
+    def _write_pieces(f, pieces, fmt):
+        n = 0
+        for piece in pieces:
+            f.write(piece)
+            n += 1
+        # The array and object formats add an opening and a closing piece
+        return n if fmt == "ndjson" else n - 2
 
     def list_files_list(self):
         """
@@ -103,97 +814,551 @@ class LsrTree:
             list: The list of files.
         """
         files = []
-        for s0, d0, f0 in sorted(os.walk(self.path)):
-            if s0.startswith(self.path):
-                s1 = s0[len(self.path):] if len(s0) > len(self.path) else ""
-            else:
-                s1 = s0 
-            for f1 in sorted(f0):
+        for node in self.scan():
+            s1 = self._relpath(node["dirpath"])
+            f0 = node["files"]
+            for f1, _ in f0:
                 files.append(os.path.join(s1, f1))
-            if len(f0) == 0 and len(d0) == 0:
+            if self._is_empty(node):
                 files.append(s1 + "/(((empty folder)))")
         return files
 
     @staticmethod
     def get_md5(file_path):
-        hash_md5 = hashlib.md5()
         try:
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    hash_md5.update(chunk)
-            return hash_md5.hexdigest()
+            return get_digests(file_path, "md5")["md5"]
         except Exception:
             return None
 
 
-    def list_files_dataframe(self):
+    def iter_entries(self, with_meta=False, since=None):
+        """
+        Iterate over the files and empty folders in the specified directory without building the full result.
+
+        The folders are listed lazily in the same order as the other output formats and sorted one folder
+        at a time, so the first entries are available right away. If scan() was already called, the cached
+        node table is used instead of walking the directory again.
+
+        Each entry is a dict with the columns of list_files_dataframe(), holding typed values:
+        'level' is an int, 'size_in_bytes', 'N_page', 'N_column' and 'N_row' are int or None, and
+        'modified' and 'created' are datetime objects.
+
+        With since, only the files added or changed since that time are yielded, and only those are hashed or parsed.
+        A file counts as changed when its modification or status change time is at or after since, so files
+        moved or copied in with an older modification time are also included. Archive members are tested with
+        the times of the archive file, so all members of a changed archive are yielded. Empty folders are not yielded.
+
+        Args:
+            with_meta (bool): Whether to fill 'md5', 'N_page', 'N_column' and 'N_row'. Defaults to False.
+            since (datetime, float or str): A datetime, a POSIX timestamp in seconds, or 'last' for the start of
+                the last completed walk without filters recorded with reuse_listings=True (all files if there is none).
+                Defaults to None (all entries).
+
+        Yields:
+            dict: One entry per file or empty folder.
+
+        Raises:
+            ValueError: If since is 'last' and reuse_listings is off.
+
+        Examples:
+            >>> lsr = LsrTree("/path/to/directory")
+            >>> next(lsr.iter_entries())
+            {'path': '.', 'level': 1, 'type': 'file', 'file': 'file1.txt', 'size_in_bytes': 11, ...}
+            >>> lsr = LsrTree("/path/to/directory", cache_path="/path/to/output/log_folder_cache.sqlite", reuse_listings=True)
+            >>> changed = list(lsr.iter_entries(with_meta=True, since="last"))
+        """
+        since_ns = self._since_ns(since)
+        if self._nodes is None:
+            # The walk runs inside the pass, so its wall time is part of the metadata pass
+            self._reset_scan_stats(walk=True)
+        nodes = self._nodes if self._nodes is not None else self._walk_nodes()
+        for chunk in self._iter_entry_chunks(nodes, with_meta=with_meta, since_ns=since_ns):
+            yield from chunk
+
+    def _since_ns(self, since):
+        # Returns since as ns since the epoch, or None for all entries
+        if since is None:
+            return None
+        if isinstance(since, str):
+            if since != "last":
+                raise ValueError("since must be a datetime, a timestamp or 'last'.")
+            if not self.reuse_listings:
+                raise ValueError("since='last' requires reuse_listings=True.")
+            if self._nodes is None:
+                # The walk has not run yet, so the time of the previous one is read from the store
+                listings = LsrListings(self.cache_path)
+                self.previous_walk_ns = listings.last_walk_ns
+                listings.close(prune=False)
+            return self.previous_walk_ns
+        if isinstance(since, datetime):
+            return int(since.timestamp() * 1e9)
+        return int(float(since) * 1e9)
+
+    def write_entries(self, file_path, fmt=None, with_meta=True, batch_size=10000):
+        """
+        Write the entries of iter_entries() to a file in fixed-size batches, so memory use does not grow with the tree.
+
+        Args:
+            file_path (str): The output file path.
+            fmt (str): One of 'csv', 'ndjson' or 'parquet'. Defaults to None, which uses the file extension
+                ('.csv', '.ndjson'/'.jsonl' or '.parquet').
+            with_meta (bool): Whether to fill 'md5', 'N_page', 'N_column' and 'N_row'. Defaults to True.
+            batch_size (int): The number of entries written at a time. Defaults to 10000.
+
+        Returns:
+            int: The number of entries written.
+        """
+        if fmt is None:
+            fmt = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".parquet": "parquet"}.get(os.path.splitext(file_path)[1].lower())
+        if fmt not in ["csv", "ndjson", "parquet"]:
+            raise ValueError("Invalid output format. Must be one of 'csv', 'ndjson', or 'parquet'.")
+
+        batches = self._iter_batches(self.iter_entries(with_meta=with_meta), batch_size)
+        n = 0
+        if fmt == "csv":
+            header = True
+            with open(file_path, "w", encoding="utf-8", newline="") as f:
+                for batch in batches:
+                    pd.DataFrame(batch, columns=self.columns).to_csv(f, header=header, index=False)
+                    header = False
+                    n += len(batch)
+                if header:
+                    pd.DataFrame(columns=self.columns).to_csv(f, index=False)
+        elif fmt == "ndjson":
+            with open(file_path, "w", encoding="utf-8") as f:
+                for batch in batches:
+                    f.write("".join(json.dumps(entry, default=str) + "\n" for entry in batch))
+                    n += len(batch)
+        else:
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Writing parquet requires pyarrow (pip install pyarrow).")
+            schema = pa.schema([
+                ("path", pa.string()), ("level", pa.int64()), ("type", pa.string()), ("file", pa.string()),
+                ("size_in_bytes", pa.int64()), ("modified", pa.timestamp("us")), ("created", pa.timestamp("us")),
+                ("file_type", pa.string()), ("N_page", pa.int64()), ("N_column", pa.int64()), ("N_row", pa.int64()),
+                ("md5", pa.string()),
+            ] + [(col, pa.string()) for col in self.columns[len(self.entry_columns):]])
+            with pq.ParquetWriter(file_path, schema) as writer:
+                for batch in batches:
+                    writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+                    n += len(batch)
+        return n
+
+    @staticmethod
+    def _iter_batches(entries, batch_size):
+        batch = []
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def list_files_dataframe(self, typed=False):
         """
         List files in the specified directory and return the result as a pandas DataFrame.
 
+        The per-file work (md5, row/column counts and page counts) is run in a process pool when
+        workers > 1. Tasks are submitted in chunks of chunk_size files, so only one chunk is in flight
+        at a time, and the row order is the same as the serial scan. If cache_path is set, files whose
+        (relative path, size, mtime_ns, inode) are unchanged reuse the cached metadata, and the cache
+        hits and misses are saved in cache_stats. The page, column and row counts come from the registered
+        extractors; the files, statuses and seconds per extractor are saved in extractor_stats and in
+        df.attrs['extractor_stats'].
+
+        By default the columns use the legacy string schema (counts as str and timestamps as time.ctime strings).
+        With typed=True, counts are nullable Int64, timestamps are datetime64, and 'path', 'type' and 'file_type'
+        are categorical, which needs far less memory for large trees. See to_typed_dataframe() and to_legacy_dataframe().
+
+        Args:
+            typed (bool): Whether to return typed columns. Defaults to False.
+
         Returns:
             pd.DataFrame: The DataFrame representing the file list.
         """
+        if typed:
+            df = self._list_files_dataframe_typed()
+            if self.with_duplicates:
+                df["duplicate_group"] = self._duplicate_groups(df)
+            df.attrs["extractor_stats"] = dict(self.extractor_stats)
+            return df
         data = []
-        for s0, d0, f0 in sorted(os.walk(self.path)):
-            if s0.startswith(self.path):
-                s1 = s0[len(self.path):] if len(s0) > len(self.path) else ""
+        for chunk in self._iter_entry_chunks(self.scan(), with_meta=True):
+            for e in chunk:
+                if e["type"] == "file":
+                    data.append((
+                        e["path"], e["level"], "file", e["file"], str(e["size_in_bytes"]),
+                        e["modified"].ctime() if e["modified"] is not None else None,
+                        e["created"].ctime() if e["created"] is not None else None,
+                        e["file_type"], str(e["N_page"]), str(e["N_column"]), str(e["N_row"]), e["md5"]
+                    ) + tuple(e[col] for col in self.columns[len(self.entry_columns):]))
+                else:
+                    data.append((e["path"], e["level"], "folder", e["file"]) + (None,) * (len(self.columns) - 4))
+        df = pd.DataFrame(data, columns=self.columns)
+        if self.with_duplicates:
+            groups = self._duplicate_groups(df)
+            df["duplicate_group"] = [("None" if pd.isna(g) else str(g)) if t == "file" else None for g, t in zip(groups, df["type"])]
+        df.attrs["extractor_stats"] = dict(self.extractor_stats)
+        return df
+
+    def find_duplicates(self, df=None):
+        """
+        Find the groups of byte-identical files in the folder.
+
+        Files are grouped by size, then by a fingerprint of their head, middle and tail, and only files that
+        still collide are hashed in full (see LsrDuplicates). The 'md5' and 'fingerprint' values already in
+        the inventory are reused, so files hashed by list_files_dataframe() are not read again.
+        The work done is saved in duplicate_stats.
+
+        Args:
+            df (pd.DataFrame): An inventory of this folder from list_files_dataframe(), in either schema.
+                Defaults to None, which uses the file sizes from scan(), so no file is hashed or parsed up front.
+                Archive members are then left out.
+
+        Returns:
+            pd.DataFrame: One row per duplicated file with the columns 'duplicate_group' (numbered from 1),
+            'rel_path' and 'size_in_bytes', sorted by group and path.
+
+        Examples:
+            >>> lsr = LsrTree("/path/to/directory")
+            >>> lsr.find_duplicates()
+               duplicate_group            rel_path  size_in_bytes
+            0                1  m5/adam/adsl.xpt          10400
+            1                1  m5/sdtm/adsl.xpt          10400
+        """
+        if df is None:
+            files = [
+                (os.path.join(node["dirpath"], f1), st.st_size if st is not None else None, None, None)
+                for node in self.scan() if not node.get("sources") for f1, st in node["files"]
+            ]
+            sizes = {file_path: size for file_path, size, _, _ in files}
+            rows = sorted(
+                (i, self._relpath(file_path).lstrip(os.sep).replace(os.sep, "/"), sizes[file_path])
+                for i, group in enumerate(self._find_duplicate_paths(files), start=1) for file_path in group
+            )
+        else:
+            groups = self._duplicate_groups(df)
+            sizes = _legacy_to_int64(df["size_in_bytes"])
+            rows = sorted(
+                (int(g), inventory_rel_path(p, f), int(n))
+                for g, p, f, n in zip(groups, df["path"].astype(object), df["file"], sizes) if not pd.isna(g)
+            )
+        out = pd.DataFrame(rows, columns=["duplicate_group", "rel_path", "size_in_bytes"])
+        return out.astype({"duplicate_group": "int64", "size_in_bytes": "int64"})
+
+    def _find_duplicate_paths(self, files):
+        dup = LsrDuplicates(sample_size=self.sample_size)
+        found = dup.find(files)
+        self.duplicate_stats = dup.stats
+        return found
+
+    def _duplicate_groups(self, df):
+        # Returns the group number of each row of df, or NA for files without a duplicate and for folders
+        is_file = df["type"].astype(str) == "file" if "type" in df.columns else pd.Series(True, index=df.index)
+        files = df[is_file]
+        sizes = _legacy_to_int64(files["size_in_bytes"])
+        known = {}
+        for col in ["md5", "fingerprint"]:
+            values = files[col].astype(object) if col in files.columns else pd.Series(None, index=files.index, dtype=object)
+            known[col] = values.where(values.notna() & (values != "None"), None).tolist()
+        file_paths = [os.path.join(self.path, *inventory_rel_path(p, f).split("/")) for p, f in zip(files["path"].astype(object), files["file"])]
+        found = self._find_duplicate_paths(
+            (file_path, None if pd.isna(size) else int(size), md5, fingerprint)
+            for file_path, size, md5, fingerprint in zip(file_paths, sizes, known["md5"], known["fingerprint"])
+        )
+        number = {}
+        for i, group in enumerate(found, start=1):
+            for path in group:
+                number[path] = i
+        result = pd.Series(pd.NA, index=df.index, dtype="Int64")
+        result[files.index] = pd.array([number.get(file_path) for file_path in file_paths], dtype="Int64")
+        return result
+
+    def verify_digests(self, df, previous=None):
+        """
+        Fill the full md5 (and digests) of a 'quick' inventory for the files that need it.
+
+        Files whose fingerprint equals the one in the previous inventory reuse its md5 and digests; the other
+        files without an md5 are read in full. The rows filled are marked 'full' in 'hash_mode', and the numbers
+        of reused and hashed files are saved in verify_stats.
+
+        Args:
+            df (pd.DataFrame): An inventory of this folder from list_files_dataframe() in 'quick' mode.
+            previous (pd.DataFrame): An earlier inventory with 'fingerprint' and 'md5' columns. Defaults to None
+                (hash every file without an md5).
+
+        Returns:
+            pd.DataFrame: A copy of df with the md5 and digests filled.
+
+        Examples:
+            >>> lsr = LsrTree("/path/to/directory", hash_mode="quick")
+            >>> df = lsr.verify_digests(lsr.list_files_dataframe(), previous=pd.read_csv("log_folder_table.csv"))
+        """
+        df = df.copy()
+        fill_columns = ["md5"] + self.digests + ["hash_mode"]
+        for col in fill_columns:
+            if col not in df.columns:
+                df[col] = None
+        categorical = [col for col in fill_columns if isinstance(df[col].dtype, pd.CategoricalDtype)]
+        for col in fill_columns:
+            df[col] = df[col].astype(object)
+
+        known = {}
+        if previous is not None and "fingerprint" in previous.columns:
+            prev = previous[previous["type"].astype(str) == "file"] if "type" in previous.columns else previous
+            prev_columns = [col for col in ["md5"] + self.digests if col in prev.columns]
+            for path, file, fingerprint, *values in zip(prev["path"].astype(object), prev["file"], prev["fingerprint"], *[prev[col] for col in prev_columns]):
+                record = dict(zip(prev_columns, values))
+                if not pd.isna(fingerprint) and not pd.isna(record.get("md5")):
+                    known[inventory_rel_path(path, file)] = (fingerprint, record)
+
+        stats = {"reused": 0, "hashed": 0}
+        is_file = df["type"].astype(str) == "file" if "type" in df.columns else pd.Series(True, index=df.index)
+        todo = df.index[is_file & df["md5"].isna()]
+        for index in todo:
+            rel_path = inventory_rel_path(df.at[index, "path"], df.at[index, "file"])
+            fingerprint = df.at[index, "fingerprint"] if "fingerprint" in df.columns else None
+            previous_record = known.get(rel_path)
+            if previous_record is not None and not pd.isna(fingerprint) and previous_record[0] == fingerprint and all(not pd.isna(previous_record[1].get(algo)) for algo in self.digests):
+                values = previous_record[1]
+                stats["reused"] += 1
             else:
-                s1 = s0 
-            level = s1.count(os.sep)
-            if level == 0:
-                s1 = "."
-            if len(f0) > 0:
-                for f1 in sorted(f0):
-                    file_path = os.path.join(s0, f1)
-                    file_size = os.path.getsize(file_path)
-                    file_modified = time.ctime(os.path.getmtime(file_path))
-                    file_created = time.ctime(os.path.getctime(file_path))
-                    file_type = f1.split(".")[-1]
-                    num_pages = None
-                    num_columns = None
-                    num_rows = None
-                    file_md5 = self.get_md5(file_path)
-                    if len(file_path) > 255:
-                        continue
-                    if file_type == "xlsx":
-                        try:
-                            excel_file = pd.ExcelFile(file_path)
-                            num_pages = len(excel_file.sheet_names)
-                            first_sheet = excel_file.sheet_names[0]
-                            sheet = excel_file.parse(first_sheet)
-                            num_columns = sheet.shape[1]
-                            num_rows = sheet.shape[0]
-                        except pd.errors.EmptyDataError:
-                            num_pages = 0
-                            num_columns = 0
-                            num_rows = 0
-                    elif file_type == "sas7bdat":
-                        try:
-                            sas_file = pd.read_sas(file_path)
-                            num_columns = sas_file.shape[1]
-                            num_rows = sas_file.shape[0]
-                        except pd.errors.EmptyDataError:
-                            num_columns = 0
-                            num_rows = 0
-                    elif file_type == "csv":
-                        try:
-                            csv_file = pd.read_csv(file_path)
-                            num_columns = csv_file.shape[1]
-                            num_rows = csv_file.shape[0]
-                        except pd.errors.EmptyDataError:
-                            num_columns = 0
-                            num_rows = 0
-                    elif file_type == "pdf":
-                        with open(file_path, "rb") as f:
-                            pdf = pypdf.PdfReader(f, strict=False)
-                            num_pages = pdf.get_num_pages()
-
-                    data.append((s1, level + 1, "file", f1, str(file_size), file_modified, file_created, file_type, str(num_pages), str(num_columns), str(num_rows), file_md5))
-            elif len(d0) == 0:
-                data.append((s1, level, "folder", "<<<((( Empty Folder )))>>>", None, None, None, None, None, None, None))
-        df = pd.DataFrame(data, columns=["path", "level", "type", "file", "size_in_bytes", "modified", "created", "file_type", "N_page", "N_column", "N_row", "md5"])
+                try:
+                    values = get_digests(os.path.join(self.path, *rel_path.split("/")), ["md5"] + self.digests)
+                except Exception:
+                    continue
+                stats["hashed"] += 1
+            for algo in ["md5"] + self.digests:
+                df.at[index, algo] = values.get(algo)
+            df.at[index, "hash_mode"] = "full"
+
+        for col in categorical:
+            df[col] = df[col].astype("category")
+        self.verify_stats = stats
         return df
 
+    def _list_files_dataframe_typed(self):
+        values = {col: [] for col in self.columns}
+        for chunk in self._iter_entry_chunks(self.scan(), with_meta=True):
+            for e in chunk:
+                for col in self.columns:
+                    values[col].append(e[col])
+        data = {}
+        for col in self.columns:
+            dtype = typed_dtypes.get(col, object)
+            if dtype == "Int64":
+                data[col] = pd.array(values[col], dtype="Int64")
+            elif dtype == "datetime64[ns]":
+                data[col] = pd.to_datetime(pd.Series(values[col], dtype=object))
+            else:
+                data[col] = pd.Series(values[col], dtype=dtype)
+        return pd.DataFrame(data, columns=self.columns)
+
+    def _iter_entry_chunks(self, nodes, with_meta=True, since_ns=None):
+        chunk = []
+        pending = []
+        # Files with several names (hard links, symlinks) by (st_dev, st_ino): the first entry is read,
+        # and its metadata is copied to the later ones once it is filled
+        physical = {}
+        aliases = []
+        # Tar members waiting for their metadata by archive path, and the full chunks held back until they are
+        # filled: members of one archive are read together in offset order, even when they span several chunks,
+        # so a compressed tar is decompressed once. The walk is sorted by path, so the members of an archive
+        # are all queued once a folder path sorts after the archive's own sub-folders.
+        groups = {}
+        held = []
+        executor = None
+        cache = None
+        completed = False
+        start = time.perf_counter()
+        if with_meta:
+            self.extractor_stats = {}
+            self._reset_scan_stats(meta=True)
+            cache = LsrCache(self.cache_path) if self.cache_path else None
+            if self.workers and self.workers > 1:
+                executor = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            for node in nodes:
+                s0 = node["dirpath"]
+                if groups:
+                    yield from self._fill_groups(groups, held, executor, cache, s0)
+                f0 = node["files"]
+                s1 = self._relpath(s0)
+                level = s1.count(os.sep)
+                if level == 0:
+                    s1 = "."
+                sources = node.get("sources")
+                archive_st = node.get("archive_stat")
+                links = node.get("links") or ()
+                if len(f0) > 0:
+                    for f1, st in f0:
+                        # Checked per file, so a large flat folder is also read and yielded in chunks
+                        if len(chunk) >= self.chunk_size:
+                            yield from self._flush_chunk(chunk, pending, aliases, groups, held, executor, cache, s0)
+                            chunk, pending, aliases = [], [], []
+                        file_path = os.path.join(s0, f1)
+                        if len(file_path) > 255:
+                            continue
+                        # An archive member is tested with the archive's own stat, as its header mtime is set when
+                        # the member is packed and can predate the archive
+                        since_st = archive_st if archive_st is not None else st
+                        if since_ns is not None and (since_st is None or max(since_st.st_mtime_ns, since_st.st_ctime_ns) < since_ns):
+                            continue
+                        entry = {
+                            "path": s1, "level": level + 1, "type": "file", "file": f1,
+                            "size_in_bytes": st.st_size if st is not None else None,
+                            "modified": datetime.fromtimestamp(st.st_mtime) if st is not None else None,
+                            "created": datetime.fromtimestamp(st.st_ctime) if st is not None else None,
+                            "file_type": f1.split(".")[-1],
+                            "N_page": None, "N_column": None, "N_row": None, "md5": None,
+                        }
+                        entry.update(dict.fromkeys(self.columns[len(self.entry_columns):]))
+                        source = sources[f1] if sources else file_path
+                        if sources and source[4] is not None:
+                            entry["crc32"] = f"{source[4]:08x}"
+                        chunk.append(entry)
+                        if not with_meta:
+                            continue
+                        rel_path = file_path[len(self.path):].lstrip(os.sep)
+                        try:
+                            id_st = _inode_stat(file_path, st) if not sources and st is not None else None
+                        except OSError:
+                            id_st = None
+                        if id_st is not None and id_st.st_ino:
+                            key = (id_st.st_dev, id_st.st_ino)
+                            if key in physical:
+                                aliases.append((entry, physical[key]))
+                                continue
+                            if id_st.st_nlink > 1 or f1 in links:
+                                physical[key] = entry
+                        meta = None
+                        if cache is not None:
+                            cache_start = time.perf_counter()
+                            meta = cache.get(
+                                rel_path, st, self.meta_digests, required=["fingerprint"] if self.hash_mode == "quick" else None,
+                                extractors=self._cache_extractors(entry["file_type"], st), crc32=source[4] if sources else None,
+                                archive_st=archive_st,
+                            )
+                            self.scan_stats["cache_seconds"] += time.perf_counter() - cache_start
+                        if meta is not None:
+                            self._set_file_meta(entry, meta)
+                        else:
+                            pending.append((entry, source, entry["file_type"], rel_path, st, archive_st))
+                elif self._is_empty(node) and since_ns is None:
+                    entry = {
+                        "path": s1, "level": level, "type": "folder", "file": "<<<((( Empty Folder )))>>>",
+                        "size_in_bytes": None, "modified": None, "created": None, "file_type": None,
+                        "N_page": None, "N_column": None, "N_row": None, "md5": None,
+                    }
+                    entry.update(dict.fromkeys(self.columns[len(self.entry_columns):]))
+                    chunk.append(entry)
+                if len(chunk) >= self.chunk_size:
+                    yield from self._flush_chunk(chunk, pending, aliases, groups, held, executor, cache, s0)
+                    chunk, pending, aliases = [], [], []
+            yield from self._flush_chunk(chunk, pending, aliases, groups, held, executor, cache, None)
+            completed = True
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if self.archives:
+                close_archives()
+            if cache is not None:
+                # A filtered scan or a since= scan does not look up every file, so the rows of the others are kept
+                cache.close(prune=completed and not self.filter.active and since_ns is None)
+                self.cache_stats = dict(cache.stats)
+            if with_meta:
+                self.scan_stats["meta_wall_seconds"] = time.perf_counter() - start
+
+    def _cache_extractors(self, file_type, st):
+        # The extractors this scan runs for a file, which a cached entry must have run with success
+        size = st.st_size if st is not None else None
+        return [
+            x["name"] for x in self.extractors.get(file_type.lower(), ())
+            if x["max_size"] is None or size is None or size <= x["max_size"]
+        ]
+
+    def _flush_chunk(self, chunk, pending, aliases, groups, held, executor, cache, dirpath):
+        # Fills a chunk, except for its tar members, which join the group of their archive, and yields the chunks
+        # that no longer wait for a group (see _fill_groups)
+        rest = []
+        for item in pending:
+            if isinstance(item[1], tuple) and item[1][3] is not None:
+                groups.setdefault(item[1][0], []).append(item)
+            else:
+                rest.append(item)
+        self._fill_file_meta(rest, executor, cache)
+        self._fill_aliases(aliases)
+        if chunk:
+            held.append(chunk)
+        yield from self._fill_groups(groups, held, executor, cache, dirpath)
+
+    def _fill_groups(self, groups, held, executor, cache, dirpath):
+        # Fills the groups of the archives whose folders all sort before dirpath (all of them if dirpath is None),
+        # then yields the held chunks once no group is left
+        bound = chr(ord(os.sep) + 1)
+        for archive_path in [a for a in groups if dirpath is None or dirpath >= a + bound]:
+            self._fill_file_meta(groups.pop(archive_path), executor, cache)
+        if not groups:
+            yield from held
+            held.clear()
+
+    def _fill_aliases(self, aliases):
+        columns = ["N_page", "N_column", "N_row", "md5"] + self.meta_digests + (["hash_mode"] if self.hash_mode == "quick" else [])
+        for entry, first in aliases:
+            for col in columns:
+                entry[col] = first[col]
+            self.scan_stats["aliases"] += 1
+            self.scan_stats["bytes_saved"] += entry["size_in_bytes"] or 0
+
+    def _set_file_meta(self, entry, meta):
+        entry["N_page"], entry["N_column"], entry["N_row"], entry["md5"] = meta[:4]
+        for algo, value in zip(self.meta_digests, meta[4:]):
+            entry[algo] = value
+        if self.hash_mode == "quick":
+            entry["hash_mode"] = "full" if entry["md5"] is not None else ("quick" if entry["fingerprint"] is not None else None)
+
+    def _fill_file_meta(self, pending, executor=None, cache=None):
+        if not pending:
+            return
+        # Archive members are read in the order they are stored, so a compressed tar is decompressed once
+        pending = sorted(pending, key=lambda x: (x[1][0], x[1][3] or 0) if isinstance(x[1], tuple) else ("", 0))
+        file_paths = [x[1] for x in pending]
+        sample_size = self.sample_size if self.hash_mode == "quick" else None
+        file_types = [x[2] for x in pending]
+        args = (file_paths, file_types, repeat(tuple(self.digests)), repeat(sample_size), repeat(self.extractors), repeat(self.sniff_types))
+        if executor is None:
+            results = map(extract_file_meta, *args)
+        else:
+            chunksize = max(1, len(pending) // (self.workers * 4))
+            results = executor.map(extract_file_meta, *args, chunksize=chunksize)
+        stats = self.scan_stats
+        for (entry, source, _, rel_path, st, archive_st), (meta, records, hash_seconds, bytes_read) in zip(pending, results):
+            add_extractor_stats(self.extractor_stats, records)
+            extract_seconds = sum(record[2] for record in records)
+            stats["meta_files"] += 1
+            stats["hash_seconds"] += hash_seconds
+            stats["extract_seconds"] += extract_seconds
+            stats["bytes_read"] += bytes_read
+            if self.slowest_n:
+                slowest = max(records, key=lambda record: record[2]) if records else (None, None, 0.0)
+                item = (hash_seconds + extract_seconds, rel_path.replace(os.sep, "/"), hash_seconds, slowest[0], slowest[2])
+                if len(stats["slowest"]) < self.slowest_n:
+                    heapq.heappush(stats["slowest"], item)
+                else:
+                    heapq.heappushpop(stats["slowest"], item)
+            self._set_file_meta(entry, meta)
+            if cache is not None:
+                statuses = dict.fromkeys((x["name"] for x in self.extractors.get(entry["file_type"].lower(), ())), "ok")
+                statuses.update((name, status) for name, status, _ in records)
+                cache.put(
+                    rel_path, st, meta, self.meta_digests, extractors=statuses, crc32=source[4] if isinstance(source, tuple) else None,
+                    archive_st=archive_st,
+                )
+
     def list_files_string(self):
         """
         List files in the specified directory using the default output format.
@@ -202,20 +1367,19 @@ class LsrTree:
             str: The file list as a string.
         """
         out0 = []
-        for s0, d0, f0 in sorted(os.walk(self.path)):
-            if s0.startswith(self.path):
-                s1 = s0[len(self.path):] if len(s0) > len(self.path) else ""
-            else:
-                s1 = s0 
+        for node in self.scan():
+            s0 = node["dirpath"]
+            f0 = [f1 for f1, _ in node["files"]]
+            s1 = self._relpath(s0)
             level = s1.count(os.sep)
             if level == 0:
                 s1 = s0
             indent = "... " * (level)
             out0.append(f"{indent}{os.path.basename(s1)}/")
             subindent = "... " * (level + 1)
-            for f1 in sorted(f0):
+            for f1 in f0:
                 out0.append(f"{subindent}{f1}")
-            if len(f0) == 0 and len(d0) == 0:
+            if self._is_empty(node):
                 out0.append(f"{subindent}(((empty folder)))") 
 
         return "\n".join(out0)
@@ -225,65 +1389,84 @@ class LsrTree:
         List files in the specified directory and return the result as a tree structure.
 
         Returns:
-            str: The tree structure representing the file list.
+            pd.Series: The lines of the tree structure representing the file list.
         """
-        pre = ['', '    ', '│   ', '├── ', '└── ', '  ']
-        data = []
-        dir_path = os.path.dirname(self.path)
+        return pd.Series(list(self.iter_tree()), dtype=object)
 
-        for s0, d0, f0 in sorted(os.walk(self.path)):
-            if s0.startswith(dir_path):
-                s1 = s0[len(dir_path):] if len(s0) > len(dir_path) else ""
-            else:
-                s1 = s0 
-            if s1 and s1.startswith('/'):
-                s1 = s1[1:] 
-            level = s1.count(os.sep)
-            if len(d0) + len(f0) > 0:
-                if self.with_counts:
-                    data.append((os.path.dirname(s1), level, "folder", os.path.basename(s1), f"{pre[5]}............ [Count: F={len(f0)}; D={len(d0)}]"))
-                else:
-                    data.append((os.path.dirname(s1), level, "folder", os.path.basename(s1), ""))
-                for index, f1 in enumerate(sorted(f0)):
-                    data.append((s1, level + 1, "file", f1, ""))
-                for index, d1 in enumerate(sorted(d0)):
-                    data.append((s1, level + 1, "folder", d1, ""))
+    def iter_tree(self):
+        """
+        Iterate over the lines of the tree structure returned by list_files_tree().
+
+        The lines are built in one depth-first traversal of the node table from scan(). Within a folder,
+        files are listed first, followed by sub-folders that are not walked (e.g. symlinked folders) and
+        then the walked sub-folders with their contents.
+
+        Yields:
+            str: One line per file or folder, e.g. '│   ├── file2.txt'.
+        """
+        nodes = {node["dirpath"]: node for node in self.scan()}
+        if self.path not in nodes:
+            return
+        s1 = self._relpath(self.path, os.path.dirname(self.path))
+        if s1 and s1.startswith('/'):
+            s1 = s1[1:]
+        prefix = '    ' * s1.count(os.sep)
+        yield prefix + os.path.basename(s1) + '/' + self._tree_property(nodes[self.path])
+
+        stack = [[prefix, self._tree_children(nodes, self.path), 0]]
+        while stack:
+            top = stack[-1]
+            prefix, children, index = top
+            if index == len(children):
+                stack.pop()
+                continue
+            top[2] += 1
+            name, child_path = children[index]
+            last = index == len(children) - 1
+            line = prefix + ('└── ' if last else '├── ') + name
+            if child_path is None:
+                yield line
             else:
-                if self.with_counts:
-                    data.append((os.path.dirname(s1), level, "folder", os.path.basename(s1), f"{pre[5]}............ [Count: Empty Folder]"))
-                else:
-                    data.append((os.path.dirname(s1), level, "folder", os.path.basename(s1), ""))
-
-        colnames = ["path", "level", "type", "file", "property"]
-        df0 = pd.DataFrame(data, columns=colnames)
-        df0['row_index'] = df0.index
-
-        df = df0.groupby(df0.columns.difference(['property', 'row_index']).tolist(), sort=False).agg({'row_index': 'max', 'property': lambda x: ''.join(x)}).reset_index().sort_values('row_index')
-        prelst = pd.DataFrame([['' for _ in range(df['level'].max())] for _ in range(len(df))])
-        prelst = pd.concat([prelst, df], axis=1).sort_values('row_index')
-        prelst.reset_index(drop=True, inplace=True)
-        prelst['row_index'] = prelst.index
-
-        for index, row in prelst.iterrows():
-            if row['level'] > 0:
-                prelst.loc[index, :(row['level'] - 1)] = [pre[1]] * (row['level'])
-
-        folder_paths = prelst[prelst['type'] == 'folder'][['path', 'file', 'level']].apply(lambda row: (os.path.join(row['path'], row['file']), row['level']), axis=1)
-        for folder_path, level in folder_paths:
-            index_set = prelst[prelst['path'] == folder_path]['row_index']
-
-            if not index_set.empty:
-                min_row_index = index_set.min()
-                max_row_index = index_set.max()
-                prelst.loc[(min_row_index):(max_row_index), level] = [pre[2]] * (max_row_index - min_row_index + 1)
-                prelst.loc[index_set, level] = [pre[3]] * len(index_set)
-                prelst.loc[max_row_index, level] = pre[4]
-
-        prelst['file'] = prelst.apply(lambda row: row['file'] + '/' + row['property'] if row['type'] == 'folder' else row['file'], axis=1)
-
-        prelst = prelst.loc[:, :'file']
-        prelst_joined = prelst.apply(lambda row: ''.join(row), axis=1)
-        return prelst_joined
+                yield line + '/' + self._tree_property(nodes[child_path])
+                stack.append([prefix + ('    ' if last else '│   '), self._tree_children(nodes, child_path), 0])
+
+    def write_tree(self, file_path):
+        """
+        Write the tree structure to a text file one line at a time.
+
+        Args:
+            file_path (str): The output file path.
+
+        Returns:
+            int: The number of lines written.
+        """
+        n = 0
+        with open(file_path, "w", encoding="utf-8") as f:
+            for line in self.iter_tree():
+                f.write(line + "\n")
+                n += 1
+        return n
+
+    def _tree_property(self, node):
+        if not self.with_counts:
+            return ""
+        if not self._is_empty(node):
+            return f"  ............ [Count: F={len(node['files'])}; D={len(node['dirs'])}]"
+        return "  ............ [Count: Empty Folder]"
+
+    @staticmethod
+    def _is_empty(node):
+        # A folder whose entries were all left out by a filter is not empty on disk
+        return not node["dirs"] and not node["files"] and not node.get("filtered")
+
+    @staticmethod
+    def _tree_children(nodes, dirpath):
+        node = nodes[dirpath]
+        dirs = [(d1, os.path.join(dirpath, d1)) for d1 in node["dirs"]]
+        children = [(f1, None) for f1, _ in node["files"]]
+        children += [(d1 + '/', None) for d1, d1_path in dirs if d1_path not in nodes]
+        children += [(d1, d1_path) for d1, d1_path in dirs if d1_path in nodes]
+        return children
 
 if __name__ == "__main__":
     #lsr = LsrTree("mtbp3/data/test_lsr", outfmt="list")
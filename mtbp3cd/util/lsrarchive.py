@@ -0,0 +1,251 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+import io
+import os
+import stat
+import time
+import shutil
+import tarfile
+import zipfile
+import tempfile
+import contextlib
+
+archive_extensions = [".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz"]
+
+# Members of compressed tar files up to this size are buffered in memory, larger ones in a temporary file
+spool_size = 1 << 26
+
+# The archive last opened by open_member(), kept open because members are read in path order
+_open_archive = {}
+
+
+def is_archive(name):
+    """
+    Return whether a file name has a zip or tar extension listed in archive_extensions.
+    """
+    return name.lower().endswith(tuple(archive_extensions))
+
+
+def member_stat(size, mtime):
+    """
+    Return an os.stat_result for an archive member, so members are listed like files.
+
+    Args:
+        size (int): The uncompressed size in bytes.
+        mtime (float): The modification time in seconds since the epoch.
+
+    Returns:
+        os.stat_result: The stat result, with the modification time also used for the access and change times,
+        and 0 as the inode and device numbers.
+    """
+    ns = int(mtime * 1e9)
+    return os.stat_result((stat.S_IFREG | 0o444, 0, 0, 1, 0, 0, size, int(mtime), int(mtime), int(mtime), mtime, mtime, mtime, ns, ns, ns))
+
+
+def _member_parts(name):
+    # Returns the path parts of a member name, or None for names that leave the archive (e.g. '../x')
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".")]
+    if ".." in parts:
+        return None
+    return parts
+
+
+def list_archive(file_path):
+    """
+    List the members of a zip or tar file from its headers, without reading the member data.
+
+    For zip files only the central directory is read. For tar files the member headers are read one by one;
+    in a compressed tar this decompresses the whole archive once. Links, devices and member names that leave
+    the archive are skipped.
+
+    Args:
+        file_path (str): The path to the archive.
+
+    Returns:
+        list: One dict per member with the keys 'name' (the path in the archive, with '/' as separator),
+        'member' (the name as stored, used by open_member()), 'is_dir', 'size', 'mtime' (seconds since the epoch),
+        'crc32' (an int for zip members, None for tar members) and 'offset' (the start of the member data
+        in a tar file, None for zip members).
+
+    Raises:
+        ValueError: If the file is not a zip or tar file.
+    """
+    members = []
+    if zipfile.is_zipfile(file_path):
+        with zipfile.ZipFile(file_path) as zf:
+            for info in zf.infolist():
+                parts = _member_parts(info.filename)
+                if not parts:
+                    continue
+                try:
+                    mtime = time.mktime(info.date_time + (0, 0, -1))
+                except (OverflowError, ValueError):
+                    mtime = 0.0
+                members.append({
+                    "name": "/".join(parts), "member": info.filename, "is_dir": info.is_dir(), "size": info.file_size, "mtime": mtime,
+                    "crc32": None if info.is_dir() else info.CRC, "offset": None,
+                })
+        return members
+    try:
+        tar = tarfile.open(file_path, "r:*")
+    except tarfile.TarError as e:
+        raise ValueError(f"Not a zip or tar file: {file_path}") from e
+    with tar:
+        for info in tar:
+            parts = _member_parts(info.name)
+            if not parts or not (info.isdir() or info.isfile()):
+                continue
+            members.append({
+                "name": "/".join(parts), "member": info.name, "is_dir": info.isdir(), "size": info.size, "mtime": float(info.mtime),
+                "crc32": None, "offset": info.offset_data if info.isfile() else None,
+            })
+    return members
+
+
+def archive_nodes(file_path, dirpath, keep=None):
+    """
+    Build the virtual folder nodes of an archive for the LsrTree node table.
+
+    The archive becomes a folder at dirpath (usually the archive path itself) and each folder in it a sub-folder.
+    Besides 'dirpath', 'dirs', 'files' and 'filtered' (whether keep left out members of the folder),
+    each node has 'sources', which maps a file name to the
+    (archive path, member name, size, offset, crc32) tuple that open_member() and extract_file_meta() read from;
+    crc32 is the CRC-32 of a zip member and None for a tar member. Each node also has 'archive_stat',
+    the os.stat_result of the archive file, taken before its headers are read.
+
+    Args:
+        file_path (str): The path to the archive.
+        dirpath (str): The folder path of the archive in the node table.
+        keep (callable): Called as keep(rel_parts, is_dir) with the member path parts; members for which it
+            returns False are left out, and left-out folders are not descended. Defaults to None (keep all).
+
+    Returns:
+        dict: {dirpath: node}, where member folders are at os.path.join(dirpath, *parts).
+
+    Raises:
+        ValueError: If the file is not a zip or tar file.
+    """
+    archive_stat = os.stat(file_path)
+    nodes = {(): {"dirs": set(), "files": [], "sources": {}, "filtered": False}}
+    dropped = set()
+
+    def add_dir(parts):
+        for i in range(1, len(parts) + 1):
+            key = tuple(parts[:i])
+            if key in dropped or key[:-1] in dropped:
+                dropped.add(key)
+                return False
+            if key not in nodes:
+                if keep is not None and not keep(list(key), True):
+                    dropped.add(key)
+                    nodes[key[:-1]]["filtered"] = True
+                    return False
+                nodes[key] = {"dirs": set(), "files": [], "sources": {}, "filtered": False}
+                nodes[key[:-1]]["dirs"].add(key[-1])
+        return True
+
+    for member in list_archive(file_path):
+        parts = member["name"].split("/")
+        if member["is_dir"]:
+            add_dir(parts)
+            continue
+        if not add_dir(parts[:-1]):
+            continue
+        if keep is not None and not keep(parts, False):
+            nodes[tuple(parts[:-1])]["filtered"] = True
+            continue
+        node = nodes[tuple(parts[:-1])]
+        if parts[-1] in node["sources"] or parts[-1] in node["dirs"]:
+            # A repeated name (e.g. a member added twice to a zip) keeps the first entry
+            continue
+        node["files"].append((parts[-1], member_stat(member["size"], member["mtime"])))
+        node["sources"][parts[-1]] = (file_path, member["member"], member["size"], member["offset"], member["crc32"])
+    result = {}
+    for key, node in nodes.items():
+        node["files"].sort(key=lambda x: x[0])
+        result[os.path.join(dirpath, *key)] = {
+            "dirpath": os.path.join(dirpath, *key), "dirs": sorted(node["dirs"]), "files": node["files"], "sources": node["sources"],
+            "filtered": node["filtered"], "archive_stat": archive_stat,
+        }
+    return result
+
+
+def _get_archive(file_path, offset):
+    key = (file_path, offset is None)
+    if key not in _open_archive:
+        close_archives()
+        _open_archive[key] = zipfile.ZipFile(file_path) if offset is None else tarfile.open(file_path, "r:*")
+    return _open_archive[key]
+
+
+def _spool(f):
+    spool = tempfile.TemporaryFile()
+    shutil.copyfileobj(f, spool, 1 << 20)
+    spool.seek(0)
+    return spool
+
+
+def close_archives():
+    """
+    Close the archive kept open by open_member().
+    """
+    for archive in _open_archive.values():
+        archive.close()
+    _open_archive.clear()
+
+
+@contextlib.contextmanager
+def open_member(file_path, name, size=None, offset=None):
+    """
+    Open an archive member for reading without extracting it.
+
+    The archive stays open after the block, so reading the members of one archive in turn does not re-read
+    its central directory; call close_archives() when done. Tar members are read from their data offset,
+    without reading the headers before them. A member of a compressed tar file is decompressed once into a
+    buffer (in memory up to spool_size bytes, otherwise a temporary file), since seeking back in the compressed
+    stream would decompress the archive again from its start; reading all its members in offset order then
+    decompresses the archive once (LsrTree reads the tar members of an archive together, across chunks).
+
+    Args:
+        file_path (str): The path to the archive.
+        name (str): The member name as stored, the 'member' key of list_archive().
+        size (int): The member size. Needed for tar members.
+        offset (int): The data offset of a tar member, or None for a zip member.
+
+    Yields:
+        A seekable binary file object. Seeking backwards in a compressed zip member decompresses it again from the start.
+    """
+    archive = _get_archive(file_path, offset)
+    if offset is None:
+        f = archive.open(name)
+    else:
+        info = tarfile.TarInfo(name)
+        info.type = tarfile.REGTYPE
+        info.size = size
+        info.offset_data = offset
+        f = archive.extractfile(info)
+        if not isinstance(archive.fileobj, io.BufferedReader):
+            with f:
+                f = io.BytesIO(f.read()) if size <= spool_size else _spool(f)
+    try:
+        yield f
+    finally:
+        f.close()
+
+
+if __name__ == "__main__":
+    pass
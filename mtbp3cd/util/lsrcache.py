@@ -0,0 +1,239 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+import json
+import sqlite3
+
+
+class LsrCache:
+    """
+    On-disk cache of per-file metadata used by LsrTree.list_files_dataframe.
+
+    Entries are keyed by the path relative to the scanned folder and are reused only when the
+    file size, mtime_ns and inode are unchanged. For a zip member, its CRC-32 is compared instead of the inode,
+    and for a tar member the size and mtime_ns of its archive, as tar headers hold no checksum of the data. Digests other than md5 are kept as a JSON object,
+    and a lookup that asks for a digest not stored yet is a miss. The status of each extractor considered for
+    the file is kept too, so a value left empty by an extractor that failed, timed out or was not selected
+    is filled by a later scan that runs it. Hits and misses are counted in 'stats'.
+
+    Args:
+        db_path (str): The path to the SQLite file. It is created if it does not exist.
+
+    Examples:
+        >>> lsr = LsrTree("/path/to/directory", outfmt="dataframe", cache_path="/path/to/output/log_folder_cache.sqlite")
+        >>> df = lsr.list_files()
+        >>> lsr.cache_stats
+        {'hits': 120, 'misses': 3, 'removed': 1}
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS file_meta ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, "
+            "n_page INTEGER, n_column INTEGER, n_row INTEGER, md5 TEXT, digests TEXT, extractors TEXT)"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(file_meta)")]
+        for column in ["digests", "extractors"]:
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE file_meta ADD COLUMN {column} TEXT")
+        self.conn.commit()
+        self._rows = {
+            row[0]: row[1:-2] + (json.loads(row[-2]) if row[-2] else {}, json.loads(row[-1]) if row[-1] else None)
+            for row in self.conn.execute("SELECT path, size, mtime_ns, inode, n_page, n_column, n_row, md5, digests, extractors FROM file_meta")
+        }
+        self._seen = set()
+        self._updates = []
+        self.stats = {"hits": 0, "misses": 0, "removed": 0}
+
+    @staticmethod
+    def file_key(st, crc32=None, archive_st=None):
+        """
+        Return the (size, mtime_ns, inode) identity of a file from its stat result, with crc32 in place of the inode if given,
+        or else 'size:mtime_ns' of archive_st (the stat result of the archive holding a tar member).
+        """
+        if crc32 is not None:
+            return (st.st_size, st.st_mtime_ns, crc32)
+        if archive_st is not None:
+            return (st.st_size, st.st_mtime_ns, f"{archive_st.st_size}:{archive_st.st_mtime_ns}")
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def get(self, rel_path, st, digests=(), required=None, extractors=None, crc32=None, archive_st=None):
+        """
+        Look up cached metadata for a file.
+
+        Args:
+            rel_path (str): The path relative to the scanned folder.
+            st (os.stat_result): The current stat result of the file.
+            digests (list): Extra digest names needed besides the md5. Defaults to ().
+            required (list): The values an entry must hold to be a hit, from 'md5' and the digest names.
+                Defaults to None, which requires the md5 and all digests.
+            extractors (list): The names of the extractors that must have run with the status 'ok' for a hit.
+                Entries stored without extractor statuses are then a miss. Defaults to None (not checked).
+            crc32 (int): The CRC-32 of a zip member, compared instead of the inode. Defaults to None.
+            archive_st (os.stat_result): The stat result of the archive holding a tar member, whose size and mtime_ns
+                are compared instead of the inode. Defaults to None.
+
+        Returns:
+            tuple or None: (num_pages, num_columns, num_rows, md5, *digests) if the file is unchanged, otherwise None.
+        """
+        self._seen.add(rel_path)
+        row = self._rows.get(rel_path)
+        if required is None:
+            required = ["md5"] + list(digests)
+        if (
+            st is not None and row is not None and tuple(row[:3]) == self.file_key(st, crc32, archive_st)
+            and all(row[6] is not None if algo == "md5" else algo in row[7] for algo in required)
+            and (not extractors or (row[8] is not None and all(row[8].get(name) == "ok" for name in extractors)))
+        ):
+            self.stats["hits"] += 1
+            return tuple(row[3:7]) + tuple(row[7].get(algo) for algo in digests)
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, rel_path, st, meta, digests=(), extractors=None, crc32=None, archive_st=None):
+        """
+        Store metadata for a file. Changes are written to disk by commit() or close().
+
+        Args:
+            rel_path (str): The path relative to the scanned folder.
+            st (os.stat_result): The stat result the metadata was computed from.
+            meta (tuple): (num_pages, num_columns, num_rows, md5, *digests).
+            digests (list): The extra digest names in meta. Defaults to ().
+            extractors (dict): {name: status} of the extractors considered for the file, with the statuses of
+                run_extractors() and 'ok' for those not needed. Defaults to None (not stored).
+            crc32 (int): The CRC-32 of a zip member, stored instead of the inode. Defaults to None.
+            archive_st (os.stat_result): The stat result of the archive holding a tar member, whose size and mtime_ns
+                are stored instead of the inode. Defaults to None.
+        """
+        if st is None:
+            return
+        key = self.file_key(st, crc32, archive_st)
+        old = self._rows.get(rel_path)
+        same = old is not None and tuple(old[:3]) == key
+        extra = dict(old[7]) if same else {}
+        extra.update((algo, value) for algo, value in zip(digests, meta[4:]) if value is not None)
+        md5 = meta[3] if meta[3] is not None or not same else old[6]
+        if extractors is None and same:
+            extractors = old[8]
+        row = key + tuple(meta[:3]) + (md5, extra, extractors)
+        self._rows[rel_path] = row
+        self._updates.append((rel_path,) + row[:-2] + (json.dumps(extra) if extra else None, json.dumps(extractors) if extractors is not None else None))
+        if len(self._updates) >= 10000:
+            self.commit()
+
+    def commit(self):
+        if self._updates:
+            self.conn.executemany("INSERT OR REPLACE INTO file_meta VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", self._updates)
+            self._updates = []
+        self.conn.commit()
+
+    def close(self, prune=True):
+        """
+        Write pending changes and close the database.
+
+        Args:
+            prune (bool): Whether to drop entries for files that were not seen since the cache was opened. Defaults to True.
+        """
+        if prune and self._seen:
+            stale = [(p,) for p in self._rows if p not in self._seen]
+            self.conn.executemany("DELETE FROM file_meta WHERE path = ?", stale)
+            for (p,) in stale:
+                del self._rows[p]
+            self.stats["removed"] += len(stale)
+        self.commit()
+        self.conn.close()
+
+
+class LsrListings:
+    """
+    On-disk store of folder listings used by LsrTree(reuse_listings=True), kept in the same SQLite file as LsrCache.
+
+    Adding, removing or renaming an entry updates the mtime of its folder, so a folder whose mtime_ns is unchanged
+    still has the same entries, and its stored listing (the names and types of its entries) is reused without
+    reading the folder. A file changed in place does not update its folder's mtime, so files are still stat'ed,
+    as are sub-folders to check their own mtime. Listings stored within 2 seconds of the folder's last change
+    are not reused, as the folder may have changed again within the same mtime tick.
+
+    Args:
+        db_path (str): The path to the SQLite file. It is created if it does not exist.
+
+    Examples:
+        >>> lsr = LsrTree("/path/to/directory", cache_path="/path/to/output/log_folder_cache.sqlite", reuse_listings=True)
+        >>> lsr.scan()
+        >>> lsr.listing_stats
+        {'reused': 1250, 'listed': 3}
+    """
+
+    racy_ns = 2 * 10 ** 9
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS dir_listing (path TEXT PRIMARY KEY, mtime_ns INTEGER, listed_ns INTEGER, entries TEXT);"
+            "CREATE TABLE IF NOT EXISTS walk_info (key TEXT PRIMARY KEY, value INTEGER);"
+        )
+        self.conn.commit()
+        self._rows = {row[0]: row[1:] for row in self.conn.execute("SELECT path, mtime_ns, listed_ns, entries FROM dir_listing")}
+        row = self.conn.execute("SELECT value FROM walk_info WHERE key = 'last_walk_ns'").fetchone()
+        self.last_walk_ns = row[0] if row else None
+        self._seen = set()
+        self._updates = []
+        self.stats = {"reused": 0, "listed": 0}
+
+    def get(self, rel_path, mtime_ns):
+        """
+        Return the stored entries of a folder as a list of (name, is_dir, is_link),
+        or None if the folder has no usable listing.
+        """
+        self._seen.add(rel_path)
+        row = self._rows.get(rel_path)
+        if row is None or row[0] != mtime_ns or row[1] - row[0] < self.racy_ns:
+            return None
+        return [tuple(item[:3]) for item in json.loads(row[2])]
+
+    def put(self, rel_path, mtime_ns, listed_ns, entries):
+        """
+        Store the entries of a folder, as (name, is_dir, is_link) tuples.
+        Changes are written to disk by close().
+        """
+        text = json.dumps([list(item) for item in entries])
+        self._rows[rel_path] = (mtime_ns, listed_ns, text)
+        self._updates.append((rel_path, mtime_ns, listed_ns, text))
+
+    def close(self, walk_ns=None, prune=True):
+        """
+        Write the listings stored since the store was opened and close it.
+
+        Args:
+            walk_ns (int): The start time of a completed walk in ns, saved as last_walk_ns. Defaults to None (not saved).
+            prune (bool): Whether to drop the listings of folders that were not seen. Defaults to True.
+        """
+        self.stats = {"reused": len(self._seen) - len({u[0] for u in self._updates}), "listed": len(self._updates)}
+        if prune and self._seen:
+            self.conn.executemany("DELETE FROM dir_listing WHERE path = ?", [(p,) for p in self._rows if p not in self._seen])
+        self.conn.executemany("INSERT OR REPLACE INTO dir_listing VALUES (?, ?, ?, ?)", self._updates)
+        self._updates = []
+        if walk_ns is not None:
+            self.conn.execute("INSERT OR REPLACE INTO walk_info VALUES ('last_walk_ns', ?)", (walk_ns,))
+        self.conn.commit()
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,203 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+import pandas as pd
+from mtbp3cd.util.lsr import to_typed_dataframe, inventory_rel_path, iter_inventory_chunks
+
+
+class LsrDiff:
+    """
+    Compare two file inventories (e.g. a record and a new delivery) by relative path.
+
+    Files are joined on the path relative to the scanned folder and classified as:
+
+    - 'unchanged': same path and all compared columns are equal.
+    - 'modified': same path and at least one compared column differs.
+    - 'moved': the path only exists in one inventory each, but the content keys (size and md5) are equal.
+    - 'added': the path only exists in the new inventory.
+    - 'removed': the path only exists in the old inventory.
+
+    The old inventory is indexed in memory (one tuple per file) and the new inventory is streamed, so both can be
+    given as a DataFrame, an iterable of DataFrame chunks, or an iterable of entry dicts such as LsrTree.iter_entries().
+    Legacy string and typed inventories can be mixed; timestamps are compared to the second.
+
+    Args:
+        compare_columns (list): The columns compared for files with the same path. Defaults to None, which uses all
+            columns of the first chunks of both inventories except 'path', 'file', 'level' and 'type'.
+        key_columns (list): The content key columns used to detect moved files. Rows with a missing key are not matched.
+            Defaults to ['size_in_bytes', 'md5'].
+        suffixes (tuple): The suffixes of the old and new value columns in the result. Defaults to ('_old', '_new').
+        chunk_size (int): The number of entry dicts converted at a time. Defaults to 10000.
+
+    Examples:
+        >>> diff = LsrDiff()
+        >>> df = diff.compare(record_df, LsrTree("/path/to/delivery").iter_entries(with_meta=True))
+        >>> diff.summary
+        {'added': 2, 'removed': 0, 'modified': 1, 'moved': 1, 'unchanged': 120}
+    """
+
+    id_columns = ["path", "file", "level", "type"]
+    statuses = ["added", "removed", "modified", "moved", "unchanged"]
+
+    def __init__(self, compare_columns=None, key_columns=None, suffixes=("_old", "_new"), chunk_size=10000):
+        self.compare_columns = list(compare_columns) if compare_columns is not None else None
+        self.key_columns = list(key_columns) if key_columns is not None else ["size_in_bytes", "md5"]
+        if len(suffixes) != 2 or suffixes[0] == suffixes[1]:
+            raise ValueError("suffixes must be two different strings.")
+        self.suffixes = suffixes
+        self.chunk_size = max(1, int(chunk_size))
+        self.summary = {}
+
+    @staticmethod
+    def rel_path(path, file):
+        """
+        Return the path of a file relative to the scanned folder from the 'path' and 'file' columns.
+        """
+        return inventory_rel_path(path, file)
+
+    def _iter_chunks(self, inventory):
+        return iter_inventory_chunks(inventory, self.chunk_size)
+
+    def _iter_rows(self, chunks, columns):
+        # Yields (rel_path, values) for the file rows, with values normalized for comparison.
+        # Timestamps are compared as whole seconds since the epoch and converted back in compare().
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            if "type" in chunk.columns:
+                chunk = chunk[chunk["type"].astype(str) == "file"]
+            chunk = to_typed_dataframe(chunk)
+            value_lists = []
+            for col in columns:
+                if col not in chunk.columns:
+                    value_lists.append([None] * len(chunk))
+                    continue
+                values = chunk[col]
+                if pd.api.types.is_datetime64_any_dtype(values):
+                    self._time_columns.add(col)
+                    values = pd.Series(values.to_numpy().astype("datetime64[s]").astype("int64"), index=values.index).mask(values.isna())
+                    values = values.astype("Int64")
+                values = values.astype(object)
+                value_lists.append(values.where(values.notna(), None).tolist())
+            paths = chunk["path"].astype("category")
+            prefixes = {c: self.rel_path(c, "") for c in paths.cat.categories}
+            prefixes = paths.map({c: p + "/" if p else "" for c, p in prefixes.items()}).astype(object)
+            rel_paths = (prefixes + chunk["file"].astype(str)).tolist()
+            yield from zip(rel_paths, zip(*value_lists) if value_lists else [()] * len(rel_paths))
+
+    def _peek_columns(self, old_chunks, new_chunks):
+        old_first = next(old_chunks, None)
+        new_first = next(new_chunks, None)
+        if self.compare_columns is not None:
+            columns = list(self.compare_columns)
+        else:
+            old_cols = list(old_first.columns) if old_first is not None else []
+            new_cols = set(new_first.columns) if new_first is not None else set()
+            columns = [c for c in old_cols if c in new_cols and c not in self.id_columns]
+        return columns, old_first, new_first
+
+    @staticmethod
+    def _chain(first, rest):
+        if first is not None:
+            yield first
+        yield from rest
+
+    def compare(self, old, new, include_unchanged=False):
+        """
+        Compare two inventories.
+
+        Args:
+            old: The old inventory (DataFrame, iterable of DataFrames, or iterable of entry dicts).
+            new: The new inventory, in any of the same forms.
+            include_unchanged (bool): Whether to include unchanged files in the result. Defaults to False.
+
+        Returns:
+            pd.DataFrame: One row per file with the columns 'status', 'rel_path', 'old_rel_path', 'changed_columns',
+            and the old and new value of each compared column. The counts per status are saved in 'summary'.
+        """
+        self._time_columns = set()
+        old_chunks = self._iter_chunks(old)
+        new_chunks = self._iter_chunks(new)
+        columns, old_first, new_first = self._peek_columns(old_chunks, new_chunks)
+        key_index = [columns.index(c) for c in self.key_columns if c in columns]
+        if len(key_index) != len(self.key_columns):
+            key_index = []
+
+        old_index = {}
+        for rel_path, values in self._iter_rows(self._chain(old_first, old_chunks), columns):
+            old_index[rel_path] = values
+
+        summary = dict.fromkeys(self.statuses, 0)
+        rows = []
+        unmatched_new = []
+        for rel_path, values in self._iter_rows(self._chain(new_first, new_chunks), columns):
+            old_values = old_index.pop(rel_path, None)
+            if old_values is None:
+                unmatched_new.append((rel_path, values))
+                continue
+            if old_values == values:
+                summary["unchanged"] += 1
+                if include_unchanged:
+                    rows.append(("unchanged", rel_path, None, [], old_values, values))
+                continue
+            changed = [c for c, a, b in zip(columns, old_values, values) if a != b]
+            status = "modified" if changed else "unchanged"
+            summary[status] += 1
+            if changed or include_unchanged:
+                rows.append((status, rel_path, None, changed, old_values, values))
+
+        # Files left on both sides are matched by content key; the remaining ones are added or removed
+        by_key = {}
+        if key_index:
+            for rel_path, values in old_index.items():
+                key = tuple(values[i] for i in key_index)
+                if None not in key:
+                    by_key.setdefault(key, []).append(rel_path)
+        for rel_path, values in unmatched_new:
+            candidates = by_key.get(tuple(values[i] for i in key_index)) if key_index else None
+            if candidates:
+                name = rel_path.rsplit("/", 1)[-1]
+                pick = next((p for p in candidates if p.rsplit("/", 1)[-1] == name), candidates[0])
+                candidates.remove(pick)
+                old_values = old_index.pop(pick)
+                changed = [c for c, a, b in zip(columns, old_values, values) if a != b]
+                summary["moved"] += 1
+                rows.append(("moved", rel_path, pick, changed, old_values, values))
+            else:
+                summary["added"] += 1
+                rows.append(("added", rel_path, None, [], (None,) * len(columns), values))
+        for rel_path, old_values in old_index.items():
+            summary["removed"] += 1
+            rows.append(("removed", rel_path, None, [], old_values, (None,) * len(columns)))
+
+        self.summary = summary
+        data = {
+            "status": [r[0] for r in rows],
+            "rel_path": [r[1] for r in rows],
+            "old_rel_path": [r[2] for r in rows],
+            "changed_columns": [",".join(r[3]) for r in rows],
+        }
+        for i, col in enumerate(columns):
+            for j, suffix in [(4, self.suffixes[0]), (5, self.suffixes[1])]:
+                values = [r[j][i] for r in rows]
+                if col in self._time_columns:
+                    values = pd.to_datetime(pd.Series(values, dtype="Int64"), unit="s")
+                data[col + suffix] = values
+        return pd.DataFrame(data, columns=list(data.keys()))
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,118 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+from mtbp3cd.util.lsrhash import get_digests, get_fingerprint, normalize_algorithm
+
+
+class LsrDuplicates:
+    """
+    Find byte-identical files in three stages, so most files are never read in full:
+
+    1. Files are grouped by size; a file with a unique size has no duplicate and is not read.
+    2. Files in the same size group are grouped by a quick fingerprint of their head, middle and tail (see get_fingerprint).
+       For files no larger than three samples the fingerprint covers the whole file, so it is final.
+    3. Only larger files whose fingerprints still collide are compared by a full digest.
+
+    Digests and fingerprints already known (e.g. the 'md5' and 'fingerprint' columns of an inventory) are reused.
+    Known fingerprints must have been computed with the same sample_size.
+
+    Args:
+        algorithm (str): The full digest used in stage 3 and expected for known digests. Defaults to 'md5'.
+        sample_size (int): The size in bytes of the fingerprint samples. Defaults to 64 KiB.
+
+    Examples:
+        >>> dup = LsrDuplicates()
+        >>> dup.find([("/a/adsl.xpt", 1040, None, None), ("/b/adsl.xpt", 1040, None, None)])
+        [['/a/adsl.xpt', '/b/adsl.xpt']]
+        >>> dup.stats
+        {'files': 2, 'candidates': 2, 'fingerprinted': 2, 'hashed': 0, 'reused': 0, 'groups': 1, 'duplicates': 1}
+    """
+
+    def __init__(self, algorithm="md5", sample_size=1 << 16):
+        self.algorithm = normalize_algorithm(algorithm)
+        self.sample_size = max(1, int(sample_size))
+        self.stats = {}
+
+    def find(self, files):
+        """
+        Find groups of identical files.
+
+        Args:
+            files (iterable): (path, size, digest, fingerprint) tuples, where digest and fingerprint may be None
+                if unknown. Files with an unknown size are skipped.
+
+        Returns:
+            list: The groups of identical file paths. Each group is sorted and has at least two paths;
+            the groups are sorted by their first path. The work done is saved in stats.
+        """
+        stats = dict.fromkeys(["files", "candidates", "fingerprinted", "hashed", "reused", "groups", "duplicates"], 0)
+        by_size = {}
+        for path, size, digest, fingerprint in files:
+            stats["files"] += 1
+            if size is None:
+                continue
+            by_size.setdefault(int(size), []).append([path, digest, fingerprint])
+
+        groups = []
+        for size, items in by_size.items():
+            if len(items) < 2:
+                continue
+            stats["candidates"] += len(items)
+            if size == 0 or all(item[1] is not None for item in items):
+                stats["reused"] += sum(item[1] is not None for item in items) if size else 0
+                groups.extend(self._group(items, None if size == 0 else 1))
+                continue
+            for item in items:
+                if item[2] is None:
+                    try:
+                        item[2] = get_fingerprint(item[0], self.sample_size)
+                    except OSError:
+                        continue
+                    stats["fingerprinted"] += 1
+            for candidates in self._group(items, 2):
+                if size <= 3 * self.sample_size:
+                    groups.append(candidates)
+                    continue
+                for item in candidates:
+                    if item[1] is None:
+                        try:
+                            item[1] = get_digests(item[0], self.algorithm)[self.algorithm]
+                        except OSError:
+                            continue
+                        stats["hashed"] += 1
+                    else:
+                        stats["reused"] += 1
+                groups.extend(self._group(candidates, 1))
+
+        groups = sorted(sorted(item[0] for item in group) for group in groups)
+        stats["groups"] = len(groups)
+        stats["duplicates"] = sum(len(group) - 1 for group in groups)
+        self.stats = stats
+        return groups
+
+    @staticmethod
+    def _group(items, index):
+        # Items with a missing key are left out; index None puts all items in one group
+        buckets = {}
+        for item in items:
+            key = item[index] if index is not None else True
+            if key is not None:
+                buckets.setdefault(key, []).append(item)
+        return [bucket for bucket in buckets.values() if len(bucket) > 1]
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,214 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+import time
+from mtbp3cd.util.lsrhash import open_binary
+from mtbp3cd.util.lsrmeta import get_sas7bdat_shape, get_xpt_shape, get_csv_shape, get_xlsx_shape, call_with_time_budget, sniff_bytes
+from mtbp3cd.util.lsrpdf import get_pdf_page_count
+
+meta_columns = ["N_page", "N_column", "N_row"]
+extractor_statuses = ["ok", "error", "timeout", "skipped"]
+# Extensions whose content is checked by detect_file_type()
+signature_types = ["xpt", "sas7bdat", "pdf", "csv", "xlsx", "xlsm", "docx", "pptx", "zip", "gz"]
+zip_types = ["xlsx", "xlsm", "docx", "pptx", "zip"]
+
+# name -> extractor dict, see register_extractor()
+extractors = {}
+
+
+def register_extractor(name, file_types, func, columns, cost=1, timeout=None, max_size=None):
+    """
+    Register a per-file metadata extractor used by LsrTree for the given file types.
+
+    The extractor is called as func(file_path) and returns a tuple with one value per column. For a member of
+    an archive (LsrTree(archives=True)), file_path is a seekable binary file object instead of a path. If several
+    extractors handle a file type, they run from the cheapest, and a later one only fills the columns
+    that are still None. Registering an existing name replaces it.
+    With LsrTree(workers > 1), func must be a module-level function so it can be sent to the process pool.
+
+    Args:
+        name (str): The extractor name.
+        file_types (list): The file extensions handled, e.g. ['xpt']. Case-insensitive.
+        func (callable): The extractor function.
+        columns (list): The columns returned, a subset of 'N_page', 'N_column' and 'N_row'.
+        cost (float): The relative cost per file, used to order extractors and to skip expensive ones
+            with LsrTree(max_extractor_cost=...). Defaults to 1.
+        timeout (float): The time limit in seconds per file. Defaults to None (no limit). See call_with_time_budget().
+        max_size (int): Files larger than this many bytes are skipped. Defaults to None (no limit).
+
+    Examples:
+        >>> register_extractor("json", ["json"], get_json_shape, ["N_column", "N_row"], cost=2, max_size=1 << 26)
+    """
+    columns = list(columns)
+    if not columns or any(col not in meta_columns for col in columns):
+        raise ValueError(f"Extractor columns must be a subset of {meta_columns}.")
+    if cost is None or cost < 0:
+        raise ValueError("cost must be a non-negative number.")
+    if isinstance(file_types, str):
+        file_types = [file_types]
+    extractors[name] = {
+        "name": name, "file_types": sorted({str(t).lower().lstrip(".") for t in file_types}), "func": func,
+        "columns": columns, "cost": cost, "timeout": timeout, "max_size": max_size,
+    }
+
+
+def unregister_extractor(name):
+    """
+    Remove a registered extractor. Unknown names are ignored.
+    """
+    extractors.pop(name, None)
+
+
+def select_extractors(names=None, max_cost=None, options=None):
+    """
+    Select the extractors used by one scan.
+
+    Args:
+        names (list): The extractor names to use. Defaults to None (all registered extractors).
+        max_cost (float): Extractors with a higher cost are left out. Defaults to None (no limit).
+        options (dict): Per-scan overrides of 'timeout' and 'max_size' by extractor name,
+            e.g. {'pdf': {'timeout': 2.0}}. Defaults to None.
+
+    Returns:
+        dict: {file_type: tuple of extractor dicts, cheapest first}.
+
+    Raises:
+        ValueError: If a name or an option is unknown.
+    """
+    names = list(extractors) if names is None else list(names)
+    options = options or {}
+    for name in list(names) + list(options):
+        if name not in extractors:
+            raise ValueError(f"Unknown extractor: {name}")
+    selected = {}
+    for name in names:
+        extractor = dict(extractors[name])
+        for key, value in options.get(name, {}).items():
+            if key not in ["timeout", "max_size"]:
+                raise ValueError(f"Invalid extractor option: {key}")
+            extractor[key] = value
+        if max_cost is not None and extractor["cost"] > max_cost:
+            continue
+        for file_type in extractor["file_types"]:
+            selected.setdefault(file_type, []).append(extractor)
+    return {file_type: tuple(sorted(items, key=lambda x: x["cost"])) for file_type, items in selected.items()}
+
+
+def run_extractors(file_path, file_type, size, selected):
+    """
+    Run the selected extractors for one file.
+
+    Args:
+        file_path (str or file object): The path to the file, or a seekable binary file object.
+        file_type (str): The file extension.
+        size (int): The file size in bytes, used for max_size. None skips the size check.
+        selected (dict): The output of select_extractors().
+
+    Returns:
+        tuple: ({column: value}, [(name, status, seconds), ...]), where status is one of
+        'ok', 'error', 'timeout' or 'skipped' (larger than max_size).
+    """
+    values = dict.fromkeys(meta_columns)
+    records = []
+    for extractor in selected.get(str(file_type).lower(), ()):
+        columns = extractor["columns"]
+        if all(values[col] is not None for col in columns):
+            continue
+        if extractor["max_size"] is not None and size is not None and size > extractor["max_size"]:
+            records.append((extractor["name"], "skipped", 0.0))
+            continue
+        start = time.perf_counter()
+        try:
+            result = call_with_time_budget(lambda: extractor["func"](file_path), extractor["timeout"])
+            status = "ok"
+        except TimeoutError:
+            result, status = None, "timeout"
+        except Exception:
+            result, status = None, "error"
+        records.append((extractor["name"], status, time.perf_counter() - start))
+        if result is not None:
+            for col, value in zip(columns, result):
+                if values[col] is None:
+                    values[col] = value
+    return values, records
+
+
+def add_extractor_stats(stats, records):
+    """
+    Add the records of run_extractors() to a stats dict of {name: {'files', 'ok', 'error', 'timeout', 'skipped', 'seconds'}}.
+    """
+    for name, status, seconds in records:
+        item = stats.setdefault(name, dict(dict.fromkeys(["files"] + extractor_statuses, 0), seconds=0.0))
+        item["files"] += 1
+        item[status] += 1
+        item["seconds"] += seconds
+    return stats
+
+
+def detect_file_type(file_path, file_type, head_size=512):
+    """
+    Return the file type used to pick extractors, from the first bytes of the file and its extension.
+
+    A detected SAS XPORT, SAS7BDAT, PDF or gzip file gets that type whatever its extension. A zip file keeps
+    an OOXML extension such as 'xlsx' and is 'zip' otherwise, and a text file keeps the 'csv' extension.
+    A file whose content does not match an extension in signature_types gets 'txt' (text) or 'bin' (binary),
+    so no parser runs on it. Other extensions and empty files are kept.
+
+    Args:
+        file_path (str or file object): The path to the file, or a seekable binary file object.
+        file_type (str): The file extension.
+        head_size (int): The number of bytes read. Defaults to 512.
+
+    Returns:
+        str: The file type.
+
+    Examples:
+        >>> detect_file_type("/path/to/adsl.xpt", "xpt")  # a zip file saved as .xpt
+        'zip'
+    """
+    ext = str(file_type).lower()
+    try:
+        with open_binary(file_path) as f:
+            head = f.read(head_size)
+    except OSError:
+        return ext
+    signature = sniff_bytes(head)
+    if signature in ["xpt", "sas7bdat", "pdf"]:
+        return signature
+    if signature == "gzip":
+        return "gz"
+    if signature == "zip":
+        return ext if ext in zip_types else "zip"
+    if signature == "text":
+        return ext if ext == "csv" or ext not in signature_types else "txt"
+    if signature is None and head and ext in signature_types:
+        return "bin"
+    return ext
+
+
+def _pdf_shape(file_path):
+    return (get_pdf_page_count(file_path),)
+
+
+register_extractor("xlsx", ["xlsx"], get_xlsx_shape, ["N_page", "N_column", "N_row"], cost=3)
+register_extractor("sas7bdat", ["sas7bdat"], get_sas7bdat_shape, ["N_column", "N_row"], cost=1)
+register_extractor("xpt", ["xpt"], get_xpt_shape, ["N_column", "N_row"], cost=1)
+register_extractor("csv", ["csv"], get_csv_shape, ["N_column", "N_row"], cost=2)
+register_extractor("pdf", ["pdf"], _pdf_shape, ["N_page"], cost=2, timeout=10.0)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,122 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+import re
+import fnmatch
+
+
+class LsrFilter:
+    """
+    Include/exclude rules applied by LsrTree while walking, before any file is stat'ed, hashed or parsed.
+
+    Rules are glob strings or compiled regular expressions:
+
+    - A glob without '/' is matched against the file or folder name, e.g. '.git' or '*.tmp'.
+    - A glob with '/' is matched against the path relative to the scanned folder, using '/' as
+      separator, e.g. '/output' (only the top-level 'output' folder) or 'sdtm/*.xpt'.
+    - A compiled regular expression is searched in the relative path, e.g. re.compile(r'(^|/)~\\$').
+
+    Args:
+        include (list): Rules a file must match to be listed. Folders are not pruned by include rules. Defaults to None (all files).
+        exclude (list): Rules for files and folders to skip. Excluded folders are not walked. Defaults to None.
+        max_depth (int): The deepest folder level walked; 0 lists only the files of the scanned folder. Deeper folders
+            are listed by name but not walked. Defaults to None (no limit).
+        file_types (list): File extensions to list, e.g. ['xpt', 'sas7bdat']. Case-insensitive. Defaults to None (all types).
+
+    Examples:
+        >>> lsr = LsrTree("/path/to/directory", outfmt="tree", exclude=[".git", "*.tmp"], max_depth=2)
+        >>> lsr = LsrTree("/path/to/directory", outfmt="dataframe", file_types=["xpt", "pdf"])
+    """
+
+    def __init__(self, include=None, exclude=None, max_depth=None, file_types=None):
+        if max_depth is not None and int(max_depth) < 0:
+            raise ValueError("max_depth must be a non-negative integer or None.")
+        self.include = self._compile(include)
+        self.exclude = self._compile(exclude)
+        self.max_depth = int(max_depth) if max_depth is not None else None
+        self.file_types = {str(t).lower().lstrip(".") for t in file_types} if file_types else None
+
+    @property
+    def active(self):
+        return bool(self.include or self.exclude or self.max_depth is not None or self.file_types)
+
+    @staticmethod
+    def _compile(rules):
+        if not rules:
+            return []
+        if isinstance(rules, (str, re.Pattern)):
+            rules = [rules]
+        compiled = []
+        for rule in rules:
+            if isinstance(rule, re.Pattern):
+                compiled.append(("regex", rule))
+            elif isinstance(rule, str) and rule:
+                if "/" in rule:
+                    compiled.append(("path", rule.lstrip("/")))
+                else:
+                    compiled.append(("name", rule))
+            else:
+                raise ValueError(f"Invalid filter rule: {rule!r}")
+        return compiled
+
+    @staticmethod
+    def _match(rules, rel_path, name):
+        for kind, rule in rules:
+            if kind == "name":
+                if fnmatch.fnmatch(name, rule):
+                    return True
+            elif kind == "path":
+                if fnmatch.fnmatch(rel_path, rule):
+                    return True
+            elif rule.search(rel_path):
+                return True
+        return False
+
+    def keep_dir(self, rel_path, name):
+        """
+        Return whether a folder is listed.
+
+        Args:
+            rel_path (str): The folder path relative to the scanned folder, with '/' as separator.
+            name (str): The folder name.
+        """
+        return not (self.exclude and self._match(self.exclude, rel_path, name))
+
+    def walk_dir(self, depth):
+        """
+        Return whether a listed folder at the given depth (1 for sub-folders of the scanned folder) is walked.
+        """
+        return self.max_depth is None or depth <= self.max_depth
+
+    def keep_file(self, rel_path, name):
+        """
+        Return whether a file is listed.
+
+        Args:
+            rel_path (str): The file path relative to the scanned folder, with '/' as separator.
+            name (str): The file name.
+        """
+        if self.file_types is not None and name.split(".")[-1].lower() not in self.file_types:
+            return False
+        if self.exclude and self._match(self.exclude, rel_path, name):
+            return False
+        if self.include and not self._match(self.include, rel_path, name):
+            return False
+        return True
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,139 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+import os
+import hashlib
+import contextlib
+
+checksum_extensions = {"md5": ".md5", "sha256": ".sha256", "sha512": ".sha512", "blake2b": ".blake2b"}
+
+
+def normalize_algorithm(name):
+    """
+    Normalize a digest name, e.g. 'SHA-512' to 'sha512'.
+
+    Args:
+        name (str): The digest name.
+
+    Returns:
+        str: The hashlib name of the digest.
+
+    Raises:
+        ValueError: If the digest is not available in hashlib.
+    """
+    algo = str(name).lower().replace("-", "").replace("_", "")
+    if algo not in hashlib.algorithms_available:
+        raise ValueError(f"Unsupported digest: {name}")
+    return algo
+
+
+@contextlib.contextmanager
+def open_binary(file, buffering=-1):
+    """
+    Open a path for binary reading, or rewind a binary file object such as an archive member.
+
+    A file object is left open when the block ends, so the caller keeps control of it.
+
+    Args:
+        file (str or file object): The path, or a seekable binary file object.
+        buffering (int): The buffering passed to open() for paths. Defaults to -1.
+
+    Yields:
+        A binary file object positioned at the start.
+    """
+    if hasattr(file, "read"):
+        file.seek(0)
+        yield file
+    else:
+        with open(file, "rb", buffering=buffering) as f:
+            yield f
+
+
+def get_digests(file_path, algorithms=("md5",), buffer_size=1 << 20):
+    """
+    Compute one or more digests of a file from a single read.
+
+    The file is read once into a reusable buffer and every hasher is updated from the same bytes.
+    With a single digest, hashlib.file_digest is used when available (Python 3.11+).
+
+    Args:
+        file_path (str or file object): The path to the file, or a binary file object.
+        algorithms (list or str): The digest names, e.g. ['md5', 'sha256', 'sha512', 'blake2b']. Defaults to ('md5',).
+        buffer_size (int): The number of bytes read at a time. Defaults to 1 MiB.
+
+    Returns:
+        dict: {algorithm: hexdigest}, with the normalized algorithm names as keys.
+
+    Examples:
+        >>> get_digests("/path/to/file.xpt", ["md5", "SHA-256"])
+        {'md5': '...', 'sha256': '...'}
+    """
+    if isinstance(algorithms, str):
+        algorithms = [algorithms]
+    algos = list(dict.fromkeys(normalize_algorithm(a) for a in algorithms))
+    if not algos:
+        return {}
+
+    if len(algos) == 1 and hasattr(hashlib, "file_digest"):
+        with open_binary(file_path) as f:
+            return {algos[0]: hashlib.file_digest(f, algos[0]).hexdigest()}
+
+    hashers = [hashlib.new(a) for a in algos]
+    buf = bytearray(buffer_size)
+    view = memoryview(buf)
+    with open_binary(file_path, buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            chunk = view[:n]
+            for h in hashers:
+                h.update(chunk)
+    return {a: h.hexdigest() for a, h in zip(algos, hashers)}
+
+
+def get_fingerprint(file_path, sample_size=1 << 16):
+    """
+    Compute a quick fingerprint of a file from its size and samples of its head, middle and tail.
+
+    At most three samples of sample_size bytes are read, so the cost does not grow with the file size.
+    Files no larger than three samples are hashed in full. A changed fingerprint means the file changed;
+    an unchanged fingerprint does not prove it is unchanged, so use full digests to verify.
+
+    Args:
+        file_path (str or file object): The path to the file, or a seekable binary file object.
+        sample_size (int): The number of bytes in each sample. Defaults to 64 KiB.
+
+    Returns:
+        str: The 32-character hex fingerprint (blake2b, 16 bytes).
+    """
+    sample_size = max(1, int(sample_size))
+    hasher = hashlib.blake2b(digest_size=16)
+    with open_binary(file_path) as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(0)
+        hasher.update(size.to_bytes(8, "little"))
+        if size <= 3 * sample_size:
+            hasher.update(f.read())
+        else:
+            for offset in (0, (size - sample_size) // 2, size - sample_size):
+                f.seek(offset)
+                hasher.update(f.read(sample_size))
+    return hasher.hexdigest()
+
+
+if __name__ == "__main__":
+    pass
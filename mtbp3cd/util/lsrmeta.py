@@ -0,0 +1,427 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+import io
+import os
+import re
+import csv
+import time
+import struct
+import signal
+import threading
+from mtbp3cd.util.lsrhash import open_binary
+
+_sas7bdat_magic = (
+    b"\x00\x00\x00\x00\x00\x00\x00\x00"
+    b"\x00\x00\x00\x00\xc2\xea\x81\x60"
+    b"\xb3\x14\x11\xcf\xbd\x92\x08\x00"
+    b"\x09\xc7\x31\x8c\x18\x1f\x10\x11"
+)
+_sas7bdat_rowsize_signatures = (
+    b"\xF7\xF7\xF7\xF7",
+    b"\x00\x00\x00\x00\xF7\xF7\xF7\xF7",
+    b"\xF7\xF7\xF7\xF7\x00\x00\x00\x00",
+    b"\xF7\xF7\xF7\xF7\xFF\xFF\xFB\xFE",
+)
+_sas7bdat_colsize_signatures = (
+    b"\xF6\xF6\xF6\xF6",
+    b"\x00\x00\x00\x00\xF6\xF6\xF6\xF6",
+    b"\xF6\xF6\xF6\xF6\x00\x00\x00\x00",
+    b"\xF6\xF6\xF6\xF6\xFF\xFF\xFB\xFE",
+)
+_sas7bdat_meta_page_types = (0x0000, 0x4000, 0x0400, 0x0200)
+_sas7bdat_data_page_type = 0x0100
+_sas7bdat_mix_page_type = 0x0200
+
+_csv_quoted = re.compile(rb'"[^"]*"')
+
+_xpt_header_prefix = b"HEADER RECORD*******"
+_xpt_header_names = {
+    5: {"library": b"LIBRARY ", "member": b"MEMBER  ", "dscrptr": b"DSCRPTR ", "namestr": b"NAMESTR ", "obs": b"OBS     "},
+    8: {"library": b"LIBV8   ", "member": b"MEMBV8  ", "dscrptr": b"DSCPTV8 ", "namestr": b"NAMSTV8 ", "obs": b"OBSV8   "},
+}
+
+
+def get_sas7bdat_shape(file_path):
+    """
+    Get the number of columns and rows of a SAS7BDAT file from its header and subheaders.
+
+    Only the file header and the leading metadata pages are read, so the cost does not depend on
+    the number of observations.
+
+    Args:
+        file_path (str or file object): The path to the SAS7BDAT file, or a seekable binary file object.
+
+    Returns:
+        tuple: (num_columns, num_rows).
+
+    Raises:
+        ValueError: If the file is not a SAS7BDAT file or the row/column size subheaders are not found.
+    """
+    with open_binary(file_path) as f:
+        head = f.read(288)
+        if len(head) < 288 or head[:32] != _sas7bdat_magic:
+            raise ValueError("magic number mismatch (not a SAS7BDAT file?)")
+        u64 = head[32:33] == b"3"
+        int_len = 8 if u64 else 4
+        page_bit_offset = 32 if u64 else 16
+        pointer_len = 24 if u64 else 12
+        align1 = 4 if head[35:36] == b"3" else 0
+        bo = "<" if head[37:38] == b"\x01" else ">"
+        uint_fmt = bo + ("Q" if u64 else "I")
+        header_length, page_length, page_count = struct.unpack(bo + "III", head[196 + align1:208 + align1])
+
+        f.seek(header_length)
+        num_columns = None
+        num_rows = None
+        for _ in range(page_count):
+            page = f.read(page_length)
+            if len(page) != page_length:
+                break
+            page_type = struct.unpack(bo + "H", page[page_bit_offset:page_bit_offset + 2])[0] & 0xFF00
+            if page_type == _sas7bdat_data_page_type:
+                break
+            if page_type not in _sas7bdat_meta_page_types:
+                continue
+            n_subheaders = struct.unpack(bo + "H", page[page_bit_offset + 4:page_bit_offset + 6])[0]
+            for i in range(n_subheaders):
+                p = page_bit_offset + 8 + pointer_len * i
+                sh_offset, sh_length = struct.unpack(bo + ("QQ" if u64 else "II"), page[p:p + 2 * int_len])
+                sh_compression = page[p + 2 * int_len]
+                if sh_length == 0 or sh_compression == 1:
+                    continue
+                signature = page[sh_offset:sh_offset + int_len]
+                if signature in _sas7bdat_rowsize_signatures:
+                    q = sh_offset + 6 * int_len
+                    num_rows = struct.unpack(uint_fmt, page[q:q + int_len])[0]
+                elif signature in _sas7bdat_colsize_signatures:
+                    q = sh_offset + int_len
+                    num_columns = struct.unpack(uint_fmt, page[q:q + int_len])[0]
+                if num_rows is not None and num_columns is not None:
+                    return num_columns, num_rows
+            if page_type == _sas7bdat_mix_page_type:
+                break
+    raise ValueError("row size or column size subheader not found")
+
+
+def _xpt_header_name(record):
+    if len(record) != 80 or not record.startswith(_xpt_header_prefix):
+        return None
+    return record[20:28]
+
+
+def get_xpt_shape(file_path):
+    """
+    Get the number of columns and rows of a SAS XPORT (v5 or v8) file from the member header and the file size.
+
+    The variable count is taken from the NAMESTR header and the observation length from the
+    namestr records. The observation count is derived from the size of the data section, with the
+    trailing blank padding of the last 80-byte record removed in the same way as pandas.read_sas.
+    Only the first member is described, which is the usual one-dataset-per-file layout.
+
+    Args:
+        file_path (str or file object): The path to the XPORT file, or a seekable binary file object.
+
+    Returns:
+        tuple: (num_columns, num_rows).
+
+    Raises:
+        ValueError: If the file is not a SAS XPORT file.
+    """
+    with open_binary(file_path) as f:
+        name = _xpt_header_name(f.read(80))
+        version = [v for v, names in _xpt_header_names.items() if names["library"] == name]
+        if not version:
+            raise ValueError("Header record is not an XPORT file.")
+        names = _xpt_header_names[version[0]]
+        f.seek(240)
+        member_header = f.read(80)
+        if _xpt_header_name(member_header) != names["member"] or _xpt_header_name(f.read(80)) != names["dscrptr"]:
+            raise ValueError("Member header not found")
+        namestr_length = int(member_header[-5:-2])
+        f.seek(160, os.SEEK_CUR)
+        namestr_header = f.read(80)
+        if _xpt_header_name(namestr_header) != names["namestr"]:
+            raise ValueError("Namestr header not found")
+        num_columns = int(namestr_header[53:58])
+        data_length = namestr_length * num_columns
+        if data_length % 80:
+            data_length += 80 - data_length % 80
+        namestr_data = f.read(data_length)
+        obs_length = sum(
+            struct.unpack(">h", namestr_data[i * namestr_length + 4:i * namestr_length + 6])[0]
+            for i in range(num_columns)
+        )
+
+        header = f.read(80)
+        name = _xpt_header_name(header)
+        if name in (b"LABELV8 ", b"LABELV9 "):
+            # v8 long labels: a counted list of variable-length entries, padded to 80 bytes
+            n_shorts = 3 if name == b"LABELV8 " else 5
+            label_length = 0
+            for _ in range(int(header[48:53])):
+                lengths = struct.unpack(">" + "h" * n_shorts, f.read(2 * n_shorts))
+                label_length += 2 * n_shorts + sum(lengths[1:])
+                f.seek(sum(lengths[1:]), os.SEEK_CUR)
+            if label_length % 80:
+                f.seek(80 - label_length % 80, os.SEEK_CUR)
+            name = _xpt_header_name(f.read(80))
+        if name != names["obs"]:
+            raise ValueError("Observation header not found.")
+
+        record_start = f.tell()
+        total_length = f.seek(0, os.SEEK_END) - record_start
+        if obs_length <= 0:
+            return num_columns, 0
+        if obs_length > 80 or total_length < 80:
+            return num_columns, total_length // obs_length
+        f.seek(-80, os.SEEK_END)
+        last_card = f.read(80)
+        tail_pad = 8 * sum(last_card[i:i + 8] == b" " * 8 for i in range(0, 80, 8))
+        return num_columns, (total_length - tail_pad) // obs_length
+
+
+def _is_blank(line):
+    return not line.strip(b" \t")
+
+
+def _count_csv_records(f, block_size):
+    # Quoted fields are replaced by a placeholder before counting, so newlines inside quotes
+    # are not counted; an unclosed quote at the end of a block carries over to the next block.
+    records = 0
+    in_quotes = False
+    fresh = True
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        if in_quotes:
+            idx = block.find(b'"')
+            if idx < 0:
+                continue
+            block = b"Q" + block[idx + 1:]
+            in_quotes = False
+        block = _csv_quoted.sub(b"Q", block)
+        idx = block.find(b'"')
+        if idx >= 0:
+            block = block[:idx] + b"Q"
+            in_quotes = True
+        block = block.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        pieces = block.split(b"\n")
+        if fresh and not _is_blank(pieces[0]):
+            records += 1
+        if len(pieces) == 1:
+            fresh = fresh and _is_blank(pieces[0])
+            continue
+        tail = pieces[1:]
+        if b" \n" in block or b"\t\n" in block or _is_blank(tail[-1]) or tail[0][:1] in (b" ", b"\t"):
+            records += sum(1 for x in tail if not _is_blank(x))
+        else:
+            records += len(tail) - tail.count(b"")
+        fresh = _is_blank(tail[-1])
+    return records
+
+
+def get_csv_shape(file_path, block_size=1 << 20, encoding="utf-8"):
+    """
+    Get the number of columns and rows of a CSV file without parsing the values.
+
+    The column count is taken from the header line. The rows are counted by streaming the file in
+    blocks and counting record terminators outside quoted fields, skipping blank lines the same way
+    as pandas.read_csv, so the counts match pd.read_csv(file_path).shape for well-formed files.
+
+    Args:
+        file_path (str or file object): The path to the CSV file, or a seekable binary file object.
+        block_size (int): The number of bytes read at a time. Defaults to 1 MiB.
+        encoding (str): The encoding used to read the header line. Defaults to 'utf-8'.
+
+    Returns:
+        tuple: (num_columns, num_rows). (0, 0) for a file without a header line.
+    """
+    num_columns = 0
+    with open_binary(file_path) as raw:
+        f = io.TextIOWrapper(raw, encoding=encoding, errors="replace", newline="")
+        try:
+            for row in csv.reader(f):
+                if row and not (len(row) == 1 and not row[0].strip(" \t")):
+                    num_columns = len(row)
+                    break
+        finally:
+            # Keep the binary file open for the row count and for the caller's file object
+            f.detach()
+    if num_columns == 0:
+        return 0, 0
+    with open_binary(file_path) as f:
+        records = _count_csv_records(f, block_size)
+    return num_columns, max(records - 1, 0)
+
+
+def _xlsx_sheet_shape(ws):
+    max_row, max_column = ws.max_row, ws.max_column
+    if max_row is None or max_column is None or (max_row <= 1 and max_column <= 1):
+        # no stored dimension (or a single-cell one): find the last non-empty cell by streaming the rows
+        max_row = max_column = 0
+        for i, row in enumerate(ws.iter_rows(values_only=True), start=1):
+            filled = [j for j, value in enumerate(row, start=1) if value is not None and value != ""]
+            if filled:
+                max_row = i
+                max_column = max(max_column, filled[-1])
+        if max_row == 0:
+            return 0, 0
+    return max_column, max_row - 1
+
+
+def get_xlsx_sheet_shapes(file_path, first_only=False):
+    """
+    Get the number of columns and rows of the sheets of an xlsx file.
+
+    The workbook is opened in openpyxl read-only mode and the counts come from each sheet's stored
+    dimension, so cell values are not loaded. The rows are streamed only for sheets without a stored
+    dimension. As in pd.read_excel, the sheet is read from cell A1 and its first row is the header.
+
+    Args:
+        file_path (str or file object): The path to the xlsx file, or a seekable binary file object.
+        first_only (bool): Whether to read the dimension of the first sheet only. Defaults to False.
+
+    Returns:
+        dict: {sheet_name: (num_columns, num_rows)}, in workbook order. All sheet names are included;
+        with first_only=True the sheets after the first one have None counts.
+    """
+    # openpyxl is only needed for xlsx files, and is imported here as in pandas.read_excel
+    import openpyxl
+
+    if hasattr(file_path, "read"):
+        file_path.seek(0)
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        shapes = {}
+        for i, name in enumerate(wb.sheetnames):
+            if first_only and i > 0:
+                shapes[name] = (None, None)
+            else:
+                shapes[name] = _xlsx_sheet_shape(wb[name])
+        return shapes
+    finally:
+        wb.close()
+
+
+def get_xlsx_shape(file_path):
+    """
+    Get the number of sheets and the number of columns and rows of the first sheet of an xlsx file.
+
+    Args:
+        file_path (str or file object): The path to the xlsx file, or a seekable binary file object.
+
+    Returns:
+        tuple: (num_sheets, num_columns, num_rows). (0, 0, 0) for a workbook without sheets.
+    """
+    shapes = get_xlsx_sheet_shapes(file_path, first_only=True)
+    if not shapes:
+        return 0, 0, 0
+    num_columns, num_rows = next(iter(shapes.values()))
+    return len(shapes), num_columns, num_rows
+
+
+def sniff_bytes(head):
+    """
+    Identify a file type from its first bytes.
+
+    Args:
+        head (bytes): The first bytes of the file; 512 are enough.
+
+    Returns:
+        str or None: 'xpt', 'sas7bdat', 'pdf', 'zip' (including xlsx and other OOXML files), 'gzip', 'text',
+        or None for an empty file or an unknown binary format.
+    """
+    if not head:
+        return None
+    if head[:32] == _sas7bdat_magic:
+        return "sas7bdat"
+    if head.startswith(_xpt_header_prefix) and _xpt_header_name(head[:80]) in (_xpt_header_names[5]["library"], _xpt_header_names[8]["library"]):
+        return "xpt"
+    if head.startswith((b"PK\x03\x04", b"PK\x05\x06")):
+        return "zip"
+    if head.startswith(b"\x1f\x8b"):
+        return "gzip"
+    # The PDF header may follow a few junk bytes
+    if b"%PDF-" in head[:1024]:
+        return "pdf"
+    if b"\x00" not in head:
+        # A multi-byte character may be cut at the end of the head
+        for cut in range(4):
+            try:
+                text = head[:len(head) - cut].decode("utf-8")
+                break
+            except UnicodeDecodeError:
+                text = None
+        if text is None:
+            text = head.decode("latin-1")
+        controls = sum(1 for c in text if ord(c) < 32 and c not in "\t\n\r\f")
+        if controls <= len(text) // 100:
+            return "text"
+    return None
+
+
+def sniff_file_type(file_path, head_size=512):
+    """
+    Identify the type of a file (a path or a binary file object) from its first head_size bytes. See sniff_bytes().
+    """
+    with open_binary(file_path) as f:
+        return sniff_bytes(f.read(head_size))
+
+
+def call_with_time_budget(func, seconds):
+    """
+    Call func() and raise TimeoutError if it runs longer than the time budget.
+
+    The call is interrupted with SIGALRM, which is only available on POSIX and in the main thread
+    (including process pool workers); elsewhere func() runs without a limit. Budgets can be nested:
+    an outer budget that is shorter still applies, and it is re-armed when the inner call returns.
+
+    Args:
+        func (callable): The function to call without arguments.
+        seconds (float): The time budget in seconds. None or 0 means no limit.
+
+    Returns:
+        The return value of func().
+
+    Raises:
+        TimeoutError: If the time budget is exceeded.
+    """
+    if not seconds or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        return func()
+
+    def on_alarm(signum, frame):
+        raise TimeoutError(f"Time budget of {seconds} s exceeded.")
+
+    outer = signal.getitimer(signal.ITIMER_REAL)[0]
+    if outer and outer <= seconds:
+        # The outer budget ends first and still applies
+        return func()
+    start = time.monotonic()
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        return func()
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+        if outer:
+            signal.setitimer(signal.ITIMER_REAL, max(outer - (time.monotonic() - start), 1e-6))
+
+
+if __name__ == "__main__":
+    pass
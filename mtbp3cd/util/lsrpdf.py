@@ -0,0 +1,414 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+import re
+import mmap
+import time
+import zlib
+import pypdf
+from mtbp3cd.util.lsrhash import open_binary
+from mtbp3cd.util.lsrmeta import call_with_time_budget
+
+_pdf_whitespace = b" \t\r\n\f\x00"
+_pdf_delimiters = b"()<>[]{}/%"
+_pdf_startxref = re.compile(rb"startxref\s+(\d+)")
+_pdf_obj_header = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")
+_pdf_ref_tail = re.compile(rb"\s+(\d+)\s+R(?=[\s/<>\[\]()%]|$)")
+_pdf_int = re.compile(rb"[+-]?\d+")
+_pdf_real = re.compile(rb"[+-]?(\d+\.?\d*|\.\d+)")
+_pdf_xref_subsection = re.compile(rb"\s*(\d+)\s+(\d+)[ \t]*\r?\n?")
+_pdf_tail_size = 4096
+
+
+class PdfRef:
+    """
+    An indirect reference 'num gen R' in a PDF object.
+    """
+
+    def __init__(self, num, gen):
+        self.num = num
+        self.gen = gen
+
+    def __eq__(self, other):
+        return isinstance(other, PdfRef) and (self.num, self.gen) == (other.num, other.gen)
+
+    def __repr__(self):
+        return f"PdfRef({self.num}, {self.gen})"
+
+
+class _PdfParser:
+    # A minimal PDF object parser: enough to follow the xref chain to /Root /Pages /Count.
+
+    def __init__(self, data, deadline=None):
+        self.data = data
+        self.deadline = deadline
+        self.sections = []
+        self.trailer = {}
+        self._objstm = {}
+
+    def check_time(self):
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TimeoutError("PDF page count time budget exceeded.")
+
+    def skip_space(self, pos):
+        data = self.data
+        n = len(data)
+        while pos < n:
+            c = data[pos]
+            if c in _pdf_whitespace:
+                pos += 1
+            elif c == 0x25:  # '%' comment
+                while pos < n and data[pos] not in b"\r\n":
+                    pos += 1
+            else:
+                break
+        return pos
+
+    def read_token(self, pos):
+        data = self.data
+        start = pos
+        while pos < len(data) and data[pos] not in _pdf_whitespace and data[pos] not in _pdf_delimiters:
+            pos += 1
+        return data[start:pos], pos
+
+    def parse_value(self, pos):
+        """
+        Parse one object starting at pos and return (value, end).
+        """
+        data = self.data
+        pos = self.skip_space(pos)
+        head = data[pos:pos + 2]
+        if head == b"<<":
+            result = {}
+            pos += 2
+            while True:
+                pos = self.skip_space(pos)
+                if data[pos:pos + 2] == b">>":
+                    return result, pos + 2
+                if data[pos] != 0x2F:  # '/'
+                    raise ValueError(f"Expected a name at {pos}.")
+                key, pos = self.read_token(pos + 1)
+                value, pos = self.parse_value(pos)
+                result[key.decode("latin-1")] = value
+        c = data[pos:pos + 1]
+        if c == b"[":
+            result = []
+            pos += 1
+            while True:
+                pos = self.skip_space(pos)
+                if data[pos:pos + 1] == b"]":
+                    return result, pos + 1
+                value, pos = self.parse_value(pos)
+                result.append(value)
+        if c == b"/":
+            name, pos = self.read_token(pos + 1)
+            return "/" + name.decode("latin-1"), pos
+        if c == b"(":
+            depth = 0
+            start = pos
+            while True:
+                ch = data[pos]
+                if ch == 0x5C:  # backslash
+                    pos += 2
+                    continue
+                if ch == 0x28:
+                    depth += 1
+                elif ch == 0x29:
+                    depth -= 1
+                    if depth == 0:
+                        return data[start + 1:pos], pos + 1
+                pos += 1
+        if c == b"<":
+            end = data.find(b">", pos)
+            if end < 0:
+                raise ValueError("Unterminated hex string.")
+            return data[pos + 1:end], end + 1
+        token, end = self.read_token(pos)
+        if not token:
+            raise ValueError(f"Unexpected byte at {pos}.")
+        if _pdf_int.fullmatch(token):
+            # 'num gen R' is an indirect reference
+            m = _pdf_ref_tail.match(data, end) if token.isdigit() else None
+            if m:
+                return PdfRef(int(token), int(m.group(1))), m.end()
+            return int(token), end
+        if _pdf_real.fullmatch(token):
+            return float(token), end
+        return {b"true": True, b"false": False, b"null": None}.get(token, token.decode("latin-1")), end
+
+    def parse_indirect(self, pos, num=None):
+        m = _pdf_obj_header.match(self.data, pos)
+        if not m or (num is not None and int(m.group(1)) != num):
+            raise ValueError(f"Object {num} not found at offset {pos}.")
+        return self.parse_value(m.end())
+
+    def stream_data(self, obj_dict, end):
+        # 'end' is the position after the stream dictionary
+        data = self.data
+        pos = self.skip_space(end)
+        if data[pos:pos + 6] != b"stream":
+            raise ValueError("Stream keyword not found.")
+        pos += 6
+        if data[pos:pos + 2] == b"\r\n":
+            pos += 2
+        elif data[pos:pos + 1] in (b"\n", b"\r"):
+            pos += 1
+        length = obj_dict.get("Length")
+        if isinstance(length, PdfRef):
+            length = self.resolve(length)
+        if not isinstance(length, int) or data[pos + length:pos + length + 20].lstrip()[:9] != b"endstream":
+            length = data.find(b"endstream", pos) - pos
+            if length < 0:
+                raise ValueError("endstream not found.")
+        raw = data[pos:pos + length]
+        filters = obj_dict.get("Filter")
+        filters = filters if isinstance(filters, list) else ([filters] if filters else [])
+        params = obj_dict.get("DecodeParms")
+        params = params[0] if isinstance(params, list) and params else params
+        for f in filters:
+            if f != "/FlateDecode":
+                raise ValueError(f"Unsupported filter {f}.")
+            raw = zlib.decompressobj().decompress(raw)
+        if isinstance(params, dict) and params.get("Predictor", 1) >= 10:
+            raw = self.png_unpredict(raw, int(params.get("Columns", 1)) * int(params.get("Colors", 1)) * int(params.get("BitsPerComponent", 8)) // 8)
+        return raw
+
+    @staticmethod
+    def png_unpredict(raw, columns):
+        rows = []
+        prev = bytearray(columns)
+        for i in range(0, len(raw), columns + 1):
+            kind = raw[i]
+            row = bytearray(raw[i + 1:i + 1 + columns])
+            if kind == 1:
+                for j in range(1, len(row)):
+                    row[j] = (row[j] + row[j - 1]) & 0xFF
+            elif kind == 2:
+                for j in range(len(row)):
+                    row[j] = (row[j] + prev[j]) & 0xFF
+            elif kind == 3:
+                for j in range(len(row)):
+                    left = row[j - 1] if j else 0
+                    row[j] = (row[j] + ((left + prev[j]) >> 1)) & 0xFF
+            elif kind == 4:
+                for j in range(len(row)):
+                    a = row[j - 1] if j else 0
+                    b = prev[j]
+                    c = prev[j - 1] if j else 0
+                    p = a + b - c
+                    pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                    row[j] = (row[j] + (a if pa <= pb and pa <= pc else (b if pb <= pc else c))) & 0xFF
+            elif kind != 0:
+                raise ValueError(f"Unsupported PNG predictor {kind}.")
+            rows.append(bytes(row))
+            prev = row
+        return b"".join(rows)
+
+    def load_xref(self):
+        data = self.data
+        tail = data[max(0, len(data) - _pdf_tail_size):]
+        matches = list(_pdf_startxref.finditer(tail))
+        if not matches:
+            raise ValueError("startxref not found.")
+        offset = int(matches[-1].group(1))
+        seen = set()
+        while offset is not None and offset not in seen:
+            self.check_time()
+            seen.add(offset)
+            pos = self.skip_space(offset)
+            if data[pos:pos + 4] == b"xref":
+                trailer = self.load_xref_table(pos + 4)
+                if isinstance(trailer.get("XRefStm"), int):
+                    self.load_xref_stream(trailer["XRefStm"])
+            else:
+                trailer = self.load_xref_stream(pos)
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            prev = trailer.get("Prev")
+            offset = prev if isinstance(prev, int) else None
+
+    def load_xref_table(self, pos):
+        data = self.data
+        subsections = []
+        while True:
+            pos = self.skip_space(pos)
+            if data[pos:pos + 7] == b"trailer":
+                break
+            m = _pdf_xref_subsection.match(data, pos)
+            if not m:
+                raise ValueError("Invalid xref subsection.")
+            first, count = int(m.group(1)), int(m.group(2))
+            subsections.append((first, count, m.end()))
+            # Entries are 20 bytes each; they are read only when looked up
+            pos = m.end() + 20 * count
+        trailer, _ = self.parse_value(pos + 7)
+        self.sections.append(("table", subsections))
+        return trailer
+
+    def load_xref_stream(self, pos):
+        obj, end = self.parse_indirect(pos)
+        if obj.get("Type") != "/XRef":
+            raise ValueError("Invalid xref stream.")
+        raw = self.stream_data(obj, end)
+        widths = [int(w) for w in obj["W"]]
+        index = obj.get("Index", [0, obj["Size"]])
+        subsections = []
+        row = 0
+        for first, count in zip(index[0::2], index[1::2]):
+            subsections.append((int(first), int(count), row))
+            row += int(count)
+        self.sections.append(("stream", (subsections, widths, raw)))
+        return obj
+
+    def lookup(self, num):
+        data = self.data
+        for kind, section in self.sections:
+            if kind == "table":
+                for first, count, start in section:
+                    if first <= num < first + count:
+                        entry = data[start + 20 * (num - first):start + 20 * (num - first) + 20]
+                        if entry[17:18] == b"n":
+                            return (1, int(entry[0:10]), None)
+                        return (0, None, None)
+            else:
+                subsections, widths, raw = section
+                size = sum(widths)
+                for first, count, row in subsections:
+                    if first <= num < first + count:
+                        entry = raw[(row + num - first) * size:(row + num - first + 1) * size]
+                        fields = []
+                        pos = 0
+                        for w in widths:
+                            fields.append(int.from_bytes(entry[pos:pos + w], "big") if w else None)
+                            pos += w
+                        kind = fields[0] if widths[0] else 1
+                        return (kind, fields[1], fields[2])
+        return None
+
+    def resolve(self, value):
+        depth = 0
+        while isinstance(value, PdfRef):
+            self.check_time()
+            depth += 1
+            if depth > 32:
+                raise ValueError("Reference chain too long.")
+            entry = self.lookup(value.num)
+            if entry is None or entry[0] == 0:
+                raise ValueError(f"Object {value.num} is not in use.")
+            if entry[0] == 1:
+                value, _ = self.parse_indirect(entry[1], value.num)
+            elif entry[0] == 2:
+                value = self.resolve_compressed(value.num, entry[1])
+            else:
+                raise ValueError(f"Unknown xref entry type {entry[0]}.")
+        return value
+
+    def resolve_compressed(self, num, stream_num):
+        if stream_num not in self._objstm:
+            entry = self.lookup(stream_num)
+            if entry is None or entry[0] != 1:
+                raise ValueError(f"Object stream {stream_num} not found.")
+            obj, end = self.parse_indirect(entry[1], stream_num)
+            raw = self.stream_data(obj, end)
+            header = raw[:int(obj["First"])].split()
+            offsets = {int(header[i]): int(obj["First"]) + int(header[i + 1]) for i in range(0, 2 * int(obj["N"]), 2)}
+            self._objstm[stream_num] = (raw, offsets)
+        raw, offsets = self._objstm[stream_num]
+        if num not in offsets:
+            raise ValueError(f"Object {num} not found in object stream {stream_num}.")
+        value, _ = _PdfParser(raw, self.deadline).parse_value(offsets[num])
+        return value
+
+
+def get_pdf_page_count_fast(file_path, time_budget=None):
+    """
+    Read the page count of a PDF from the /Count of the root /Pages node, following the xref chain.
+
+    Only the trailer, the xref sections and the catalog and page tree root objects are read from a memory map
+    of the file. A file object without a file descriptor (e.g. an archive member) is read into memory instead.
+    Classic xref tables, xref streams, object streams and incremental updates are supported.
+
+    Args:
+        file_path (str or file object): The path to the PDF file, or a seekable binary file object.
+        time_budget (float): The time limit in seconds. Defaults to None (no limit).
+
+    Returns:
+        int: The number of pages.
+
+    Raises:
+        ValueError: If the page count cannot be read this way (e.g. a damaged xref or an encrypted object stream).
+        TimeoutError: If the time budget is exceeded.
+    """
+    deadline = time.monotonic() + time_budget if time_budget else None
+    if hasattr(file_path, "read"):
+        file_path.seek(0)
+        return _pdf_count(file_path.read(), deadline)
+    with open(file_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _pdf_count(data, deadline)
+
+
+def _pdf_count(data, deadline):
+    if data[:5] != b"%PDF-":
+        raise ValueError("Not a PDF file.")
+    parser = _PdfParser(data, deadline)
+    parser.load_xref()
+    root = parser.resolve(parser.trailer.get("Root"))
+    pages = parser.resolve(root.get("Pages")) if isinstance(root, dict) else None
+    count = parser.resolve(pages.get("Count")) if isinstance(pages, dict) else None
+    if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+        raise ValueError("Invalid /Pages /Count.")
+    return count
+
+
+def get_pdf_page_count(file_path, time_budget=10.0):
+    """
+    Return the number of pages in a PDF file.
+
+    The fast path (get_pdf_page_count_fast) is tried first. If it fails, pypdf parses the file instead.
+    Both share the per-file time budget; the pypdf fallback can only be interrupted on POSIX in the main
+    thread (e.g. in a process pool worker).
+
+    Args:
+        file_path (str or file object): The path to the PDF file, or a seekable binary file object.
+        time_budget (float): The time limit in seconds for the file. Defaults to 10.0; None means no limit.
+
+    Returns:
+        int: The number of pages.
+
+    Raises:
+        TimeoutError: If the time budget is exceeded.
+    """
+    start = time.monotonic()
+    try:
+        return get_pdf_page_count_fast(file_path, time_budget)
+    except TimeoutError:
+        raise
+    except Exception:
+        pass
+    remaining = time_budget - (time.monotonic() - start) if time_budget else None
+    if remaining is not None and remaining <= 0:
+        raise TimeoutError("PDF page count time budget exceeded.")
+
+    def read_pypdf():
+        with open_binary(file_path) as f:
+            return pypdf.PdfReader(f, strict=False).get_num_pages()
+
+    return call_with_time_budget(read_pypdf, remaining)
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,264 @@
+#  Copyright (C) 2025 Y Hsu <yh202109@gmail.com>
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public license as published by
+#  the Free software Foundation, either version 3 of the License, or
+#  any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU General Public License for more details
+#
+#  You should have received a copy of the GNU General Public license
+#  along with this program. If not, see <https://www.gnu.org/license/>
+
+
+import os
+import json
+import sqlite3
+import hashlib
+from datetime import datetime
+import pandas as pd
+from mtbp3cd.util.lsr import to_typed_dataframe, inventory_rel_path, iter_inventory_chunks
+
+_present_at = "{t}.first_scan <= {s} AND ({t}.last_scan IS NULL OR {t}.last_scan >= {s})"
+
+
+class LsrSnapshots:
+    """
+    A SQLite store of inventory snapshots of one folder, e.g. the deliveries of a study.
+
+    Each file version is stored once with the first and last scan it was seen in, so adding a scan only
+    writes the files that were added, changed or removed since the previous scan. A file is changed when its
+    size, modification time (to the second), file type, counts, md5 or extra digests differ.
+    Versions are indexed by path, md5, size and scan id.
+
+    Args:
+        db_path (str): The path to the SQLite file. It is created if it does not exist.
+
+    Examples:
+        >>> store = LsrSnapshots("/path/to/output/log_folder_snapshots.sqlite")
+        >>> scan_id = store.add_scan(LsrTree("/path/to/delivery").list_files_dataframe(), label="delivery 3")
+        >>> store.changed_since(scan_id - 1)
+        >>> store.find_md5("0cc175b9c0f1b6a831c399e269772661")
+        >>> store.close()
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS scans ("
+            "scan_id INTEGER PRIMARY KEY AUTOINCREMENT, label TEXT, root TEXT, created TEXT, n_files INTEGER, n_changed INTEGER);"
+            "CREATE TABLE IF NOT EXISTS versions ("
+            "id INTEGER PRIMARY KEY, rel_path TEXT NOT NULL, first_scan INTEGER NOT NULL, last_scan INTEGER, "
+            "size INTEGER, mtime INTEGER, file_type TEXT, n_page INTEGER, n_column INTEGER, n_row INTEGER, md5 TEXT, digests TEXT);"
+            "CREATE INDEX IF NOT EXISTS idx_versions_path ON versions (rel_path, first_scan);"
+            "CREATE INDEX IF NOT EXISTS idx_versions_md5 ON versions (md5);"
+            "CREATE INDEX IF NOT EXISTS idx_versions_size ON versions (size);"
+            "CREATE INDEX IF NOT EXISTS idx_versions_first ON versions (first_scan);"
+            "CREATE INDEX IF NOT EXISTS idx_versions_last ON versions (last_scan);"
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def latest_scan(self):
+        """
+        Return the id of the latest scan, or None if the store is empty.
+        """
+        return self.conn.execute("SELECT MAX(scan_id) FROM scans").fetchone()[0]
+
+    def scans(self):
+        """
+        Return the scans as a DataFrame with the columns 'scan_id', 'label', 'root', 'created', 'n_files' and 'n_changed'.
+        """
+        return pd.read_sql_query("SELECT scan_id, label, root, created, n_files, n_changed FROM scans ORDER BY scan_id", self.conn)
+
+    def _check_scan(self, scan_id):
+        if self.conn.execute("SELECT 1 FROM scans WHERE scan_id = ?", (scan_id,)).fetchone() is None:
+            raise ValueError(f"Unknown scan: {scan_id}")
+        return int(scan_id)
+
+    @staticmethod
+    def _iter_rows(inventory, chunk_size):
+        # Yields (rel_path, (size, mtime, file_type, n_page, n_column, n_row, md5, digests)) for the file rows
+        for chunk in iter_inventory_chunks(inventory, chunk_size):
+            if chunk.empty:
+                continue
+            if "type" in chunk.columns:
+                chunk = chunk[chunk["type"].astype(str) == "file"]
+            chunk = to_typed_dataframe(chunk)
+            columns = []
+            for col in ["size_in_bytes", "modified", "file_type", "N_page", "N_column", "N_row", "md5"]:
+                if col not in chunk.columns:
+                    columns.append([None] * len(chunk))
+                    continue
+                values = chunk[col]
+                if pd.api.types.is_datetime64_any_dtype(values):
+                    values = pd.Series(values.to_numpy().astype("datetime64[s]").astype("int64"), index=values.index).mask(values.isna()).astype("Int64")
+                values = values.astype(object)
+                columns.append(values.where(values.notna(), None).tolist())
+            # Extra digests and the quick fingerprint are kept as one JSON object
+            extra = [col for col in chunk.columns if (col in hashlib.algorithms_available and col != "md5") or col == "fingerprint"]
+            digests = []
+            for record in chunk[extra].astype(object).to_dict("records") if extra else [{}] * len(chunk):
+                record = {k: v for k, v in record.items() if not pd.isna(v)}
+                digests.append(json.dumps(record, sort_keys=True) if record else None)
+            columns.append(digests)
+            rel_paths = [inventory_rel_path(p, f) for p, f in zip(chunk["path"].astype(object), chunk["file"])]
+            yield from zip(rel_paths, zip(*columns))
+
+    def add_scan(self, inventory, label=None, root=None, chunk_size=10000):
+        """
+        Add an inventory as a new scan.
+
+        Args:
+            inventory: The inventory, as a DataFrame from LsrTree.list_files_dataframe() (either schema),
+                an iterable of DataFrame chunks, or an iterable of entry dicts such as LsrTree.iter_entries(with_meta=True).
+            label (str): A label for the scan, e.g. the delivery name. Defaults to None.
+            root (str): The scanned folder. A store holds the scans of one folder, so the root must match
+                the root of earlier scans that recorded one. Defaults to None.
+            chunk_size (int): The number of rows converted and written at a time. Defaults to 10000.
+
+        Returns:
+            int: The id of the new scan.
+
+        Raises:
+            ValueError: If root differs from the root recorded by earlier scans.
+        """
+        if root is not None:
+            root = os.path.normpath(os.path.abspath(root))
+            stored = self.conn.execute("SELECT root FROM scans WHERE root IS NOT NULL ORDER BY scan_id DESC LIMIT 1").fetchone()
+            if stored is not None and os.path.normcase(stored[0]) != os.path.normcase(root):
+                raise ValueError(f"The store holds scans of {stored[0]}, not {root}.")
+        prev = self.latest_scan()
+        current = {
+            row[0]: (row[1], tuple(row[2:]))
+            for row in self.conn.execute(
+                "SELECT rel_path, id, size, mtime, file_type, n_page, n_column, n_row, md5, digests FROM versions WHERE last_scan IS NULL"
+            )
+        }
+        created = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.conn:
+            scan_id = self.conn.execute("INSERT INTO scans (label, root, created) VALUES (?, ?, ?)", (label, root, created)).lastrowid
+            inserts = []
+            closes = []
+            n_files = 0
+            n_changed = 0
+            for rel_path, values in self._iter_rows(inventory, chunk_size):
+                n_files += 1
+                old = current.pop(rel_path, None)
+                if old is not None:
+                    if old[1] == values:
+                        continue
+                    closes.append((prev, old[0]))
+                inserts.append((rel_path, scan_id) + values)
+                if len(inserts) >= chunk_size:
+                    n_changed += self._write(inserts, closes)
+                    inserts, closes = [], []
+            closes.extend((prev, old[0]) for old in current.values())
+            n_changed += self._write(inserts, closes) + len(current)
+            self.conn.execute("UPDATE scans SET n_files = ?, n_changed = ? WHERE scan_id = ?", (n_files, n_changed, scan_id))
+        return scan_id
+
+    def _write(self, inserts, closes):
+        self.conn.executemany("UPDATE versions SET last_scan = ? WHERE id = ?", closes)
+        self.conn.executemany(
+            "INSERT INTO versions (rel_path, first_scan, size, mtime, file_type, n_page, n_column, n_row, md5, digests) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", inserts
+        )
+        return len(inserts)
+
+    def _frame(self, sql, params, columns):
+        rows = self.conn.execute(sql, params).fetchall() if sql else []
+        df = pd.DataFrame(rows, columns=columns)
+        for col in columns:
+            if col.startswith(("size_in_bytes", "N_", "first_scan", "last_scan")):
+                df[col] = pd.array(df[col].astype(object).where(df[col].notna(), None).tolist(), dtype="Int64")
+            elif col == "modified":
+                df[col] = pd.to_datetime(pd.Series(df[col], dtype="Int64"), unit="s")
+        return df
+
+    def get_scan(self, scan_id=None):
+        """
+        Return the files of a scan.
+
+        Args:
+            scan_id (int): The scan id. Defaults to None (the latest scan).
+
+        Returns:
+            pd.DataFrame: One row per file with the columns 'rel_path', 'size_in_bytes', 'modified', 'file_type',
+            'N_page', 'N_column', 'N_row', 'md5', and one column per extra digest, sorted by 'rel_path'.
+        """
+        scan_id = self._check_scan(self.latest_scan() if scan_id is None else scan_id)
+        df = self._frame(
+            "SELECT rel_path, size, mtime, file_type, n_page, n_column, n_row, md5, digests FROM versions v "
+            f"WHERE {_present_at.format(t='v', s='?')} ORDER BY rel_path", (scan_id, scan_id),
+            ["rel_path", "size_in_bytes", "modified", "file_type", "N_page", "N_column", "N_row", "md5", "digests"],
+        )
+        extra = [json.loads(v) if v else {} for v in df.pop("digests")]
+        for col in sorted({k for d in extra for k in d}):
+            df[col] = [d.get(col) for d in extra]
+        return df
+
+    def changed_since(self, scan_id, until=None):
+        """
+        Return the files added, modified or removed after a scan.
+
+        Args:
+            scan_id (int): The scan to compare from.
+            until (int): The scan to compare to. Defaults to None (the latest scan).
+
+        Returns:
+            pd.DataFrame: One row per changed file with the columns 'status' ('added', 'modified' or 'removed'),
+            'rel_path', 'size_in_bytes_old', 'size_in_bytes_new', 'md5_old' and 'md5_new', sorted by 'rel_path'.
+        """
+        scan_id = self._check_scan(scan_id)
+        until = self._check_scan(self.latest_scan() if until is None else until)
+        columns = ["status", "rel_path", "size_in_bytes_old", "size_in_bytes_new", "md5_old", "md5_new"]
+        if until <= scan_id:
+            return self._frame(None, None, columns)
+        return self._frame(
+            "SELECT CASE WHEN o.id IS NULL THEN 'added' ELSE 'modified' END, n.rel_path, o.size, n.size, o.md5, n.md5 "
+            f"FROM versions n LEFT JOIN versions o ON o.rel_path = n.rel_path AND {_present_at.format(t='o', s=':n')} "
+            f"WHERE n.first_scan > :n AND {_present_at.format(t='n', s=':m')} "
+            "UNION ALL "
+            "SELECT 'removed', o.rel_path, o.size, NULL, o.md5, NULL FROM versions o "
+            "WHERE o.first_scan <= :n AND o.last_scan >= :n AND o.last_scan < :m "
+            f"AND NOT EXISTS (SELECT 1 FROM versions x WHERE x.rel_path = o.rel_path AND {_present_at.format(t='x', s=':m')}) "
+            "ORDER BY 2",
+            {"n": scan_id, "m": until}, columns,
+        )
+
+    def find_md5(self, md5):
+        """
+        Return where a file content (md5) appeared across all scans.
+
+        Returns:
+            pd.DataFrame: One row per file version with the columns 'rel_path', 'first_scan', 'last_scan'
+            (NA if the file is still in the latest scan) and 'size_in_bytes', sorted by 'first_scan' and 'rel_path'.
+        """
+        return self._frame(
+            "SELECT rel_path, first_scan, last_scan, size FROM versions WHERE md5 = ? ORDER BY first_scan, rel_path",
+            (md5,), ["rel_path", "first_scan", "last_scan", "size_in_bytes"],
+        )
+
+    def history(self, rel_path):
+        """
+        Return the versions of one file across all scans.
+
+        Returns:
+            pd.DataFrame: One row per version with the columns 'first_scan', 'last_scan' (NA if current),
+            'size_in_bytes', 'modified' and 'md5', sorted by 'first_scan'.
+        """
+        return self._frame(
+            "SELECT first_scan, last_scan, size, mtime, md5 FROM versions WHERE rel_path = ? ORDER BY first_scan",
+            (rel_path,), ["first_scan", "last_scan", "size_in_bytes", "modified", "md5"],
+        )
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The benchmark harness and the file fixtures it shares with the tests live in benchmarks/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
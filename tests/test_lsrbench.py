@@ -0,0 +1,47 @@
+import os
+import json
+import tempfile
+import shutil
+import pytest
+from mtbp3cd.util.lsr import LsrTree
+from lsrbench import make_synthetic_tree, run_benchmark, main
+
+@pytest.fixture
+def temp_dir():
+    dirpath = tempfile.mkdtemp()
+    yield dirpath
+    shutil.rmtree(dirpath)
+
+def test_make_synthetic_tree(temp_dir):
+    counts = make_synthetic_tree(temp_dir, 60, depth=2, fanout=3)
+    assert sum(counts.values()) == 60
+    df = LsrTree(temp_dir).list_files_dataframe(typed=True)
+    assert len(df) == 60
+    assert set(df["level"]) == {3}
+    # Every fixture is a valid file of its type
+    for file_type, column in [("xpt", "N_row"), ("csv", "N_row"), ("pdf", "N_page"), ("xlsx", "N_row"), ("sas7bdat", "N_row")]:
+        rows = df[df["file_type"] == file_type]
+        if len(rows):
+            assert rows[column].notna().all(), file_type
+    with pytest.raises(ValueError):
+        make_synthetic_tree(temp_dir, 10, mix={"docx": 1})
+
+def test_run_benchmark(temp_dir):
+    make_synthetic_tree(temp_dir, 30, mix={"xpt": 1, "txt": 1})
+    results = run_benchmark(temp_dir)
+    cases = [r["case"] for r in results]
+    assert cases[:6] == ["scan", "outfmt:list", "outfmt:json", "outfmt:string", "outfmt:tree", "outfmt:dataframe"]
+    assert {"scan:walk_workers", "column:md5", "column:fingerprint", "column:xpt", "column:pdf"} <= set(cases)
+    by_case = {r["case"]: r for r in results}
+    assert by_case["scan"]["files"] == 30
+    assert by_case["column:pdf"]["files"] == 0
+    assert 0 < by_case["column:xpt"]["files"] < 30
+    with pytest.raises(ValueError):
+        run_benchmark(temp_dir, cases=["outfmt:xml"])
+
+def test_main_output(temp_dir):
+    output = os.path.join(temp_dir, "bench.json")
+    main(["--sizes", "10", "20", "--cases", "scan", "column:md5", "--workdir", os.path.join(temp_dir, "work"), "--output", output])
+    with open(output) as f:
+        report = json.load(f)
+    assert [(r["n_files"], r["case"]) for r in report["results"]] == [(10, "scan"), (10, "column:md5"), (20, "scan"), (20, "column:md5")]
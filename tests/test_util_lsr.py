@@ -3,9 +3,14 @@ import tempfile
 import shutil
 import pandas as pd
 import pytest
-from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsr import LsrTree, to_typed_dataframe, to_legacy_dataframe
 import hashlib
-from io import StringIO
+import time
+import threading
+import gzip
+import json
+import contextlib
+from io import StringIO, BytesIO
 
 @pytest.fixture
 def temp_dir():
@@ -66,6 +71,32 @@ def test_list_files_tree(temp_dir):
     assert "file2.txt" in result_str
     assert "Empty Folder" in result_str
 
+def test_list_files_tree_lines(temp_dir):
+    create_files_structure(temp_dir)
+    os.makedirs(os.path.join(temp_dir, "x", "z"))
+    os.makedirs(os.path.join(temp_dir, "x-y"))
+    lsr = LsrTree(temp_dir, outfmt="tree")
+    name = os.path.basename(temp_dir)
+    assert lsr.list_files().tolist() == [
+        f"{name}/",
+        "├── file1.txt",
+        "├── folder1/",
+        "│   └── file2.txt",
+        "├── folder2/",
+        "│   └── empty_folder/",
+        "├── x/",
+        "│   └── z/",
+        "└── x-y/",
+    ]
+    out_dir = tempfile.mkdtemp()
+    try:
+        out_file = os.path.join(out_dir, "tree.txt")
+        assert lsr.write_tree(out_file) == 9
+        with open(out_file, encoding="utf-8") as f:
+            assert f.read().splitlines() == lsr.list_files().tolist()
+    finally:
+        shutil.rmtree(out_dir)
+
 def test_nonexistent_path():
     lsr = LsrTree("/nonexistent/path", outfmt="list")
     result = lsr.list_files()
@@ -83,3 +114,384 @@ def test_get_md5(temp_dir):
     md5 = LsrTree.get_md5(file_path)
     expected = hashlib.md5(b"abc").hexdigest()
     assert md5 == expected
+
+def test_scan_shared_by_outfmts(temp_dir):
+    create_files_structure(temp_dir)
+    lsr = LsrTree(temp_dir, outfmt="tree", with_counts=True)
+    nodes = lsr.scan()
+    assert [os.path.relpath(n["dirpath"], temp_dir) for n in nodes] == [".", "folder1", "folder2", os.path.join("folder2", "empty_folder")]
+    with open(os.path.join(temp_dir, "file3.txt"), "w") as f:
+        f.write("new")
+    lsr.list_files()
+    assert not any("file3.txt" in f for f in lsr.list_files_list())
+    assert "file3.txt" not in lsr.list_files_dataframe()["file"].values
+    lsr.scan(refresh=True)
+    assert any("file3.txt" in f for f in lsr.list_files_list())
+
+def test_list_files_dataframe_workers(temp_dir):
+    create_files_structure(temp_dir)
+    for i in range(5):
+        with open(os.path.join(temp_dir, "folder1", f"data{i}.csv"), "w") as f:
+            f.write("a,b,c\n" + "1,2,3\n" * i)
+    df1 = LsrTree(temp_dir, outfmt="dataframe").list_files()
+    df2 = LsrTree(temp_dir, outfmt="dataframe", workers=2, chunk_size=2).list_files()
+    pd.testing.assert_frame_equal(df1, df2)
+    row = df2[df2["file"] == "data3.csv"].iloc[0]
+    assert (row["N_column"], row["N_row"]) == ("3", "3")
+
+def test_list_files_dataframe_cache(temp_dir):
+    create_files_structure(temp_dir)
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache_path = os.path.join(cache_dir, "log_folder_cache.sqlite")
+        lsr = LsrTree(temp_dir, outfmt="dataframe", cache_path=cache_path)
+        df1 = lsr.list_files()
+        assert lsr.cache_stats["hits"] == 0 and lsr.cache_stats["misses"] == 2
+        with open(os.path.join(temp_dir, "file1.txt"), "a") as f:
+            f.write("!")
+        lsr = LsrTree(temp_dir, outfmt="dataframe", cache_path=cache_path)
+        df2 = lsr.list_files()
+        assert lsr.cache_stats["hits"] == 1 and lsr.cache_stats["misses"] == 1
+        assert df2[df2["file"] == "file2.txt"]["md5"].iloc[0] == df1[df1["file"] == "file2.txt"]["md5"].iloc[0]
+        assert df2[df2["file"] == "file1.txt"]["md5"].iloc[0] == hashlib.md5(b"hello world!").hexdigest()
+    finally:
+        shutil.rmtree(cache_dir)
+
+@pytest.mark.parametrize("kwargs", [{}, {"digests": ["sha256"]}])
+def test_list_files_dataframe_empty_folders_only(temp_dir, kwargs):
+    os.makedirs(os.path.join(temp_dir, "a", "b"))
+    os.makedirs(os.path.join(temp_dir, "c"))
+    df = LsrTree(temp_dir, **kwargs).list_files_dataframe()
+    assert df.columns.tolist() == LsrTree(temp_dir, **kwargs).columns
+    assert list(zip(df["path"], df["type"])) == [("/a/b", "folder"), ("/c", "folder")]
+    assert df["md5"].isna().all()
+
+def test_iter_entries(temp_dir):
+    create_files_structure(temp_dir)
+    lsr = LsrTree(temp_dir)
+    entries = list(lsr.iter_entries())
+    assert lsr._nodes is None
+    df = lsr.list_files_dataframe()
+    assert [e["file"] for e in entries] == df["file"].tolist()
+    assert entries[0]["size_in_bytes"] == 11 and entries[0]["md5"] is None
+    entry = next(LsrTree(temp_dir).iter_entries(with_meta=True))
+    assert entry["md5"] == hashlib.md5(b"hello world").hexdigest()
+
+def test_iter_entries_flat_folder_chunks(temp_dir):
+    for i in range(25):
+        with open(os.path.join(temp_dir, f"f{i:02d}.txt"), "w") as f:
+            f.write(f"f{i:02d}.txt")
+    lsr = LsrTree(temp_dir, chunk_size=10)
+    chunks = list(lsr._iter_entry_chunks(lsr._walk_nodes(), with_meta=True))
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert all(e["md5"] == hashlib.md5(e["file"].encode()).hexdigest() for chunk in chunks for e in chunk)
+
+@pytest.mark.parametrize("ext", [".csv", ".ndjson", ".parquet"])
+def test_write_entries(temp_dir, ext):
+    if ext == ".parquet":
+        pytest.importorskip("pyarrow")
+    create_files_structure(temp_dir)
+    out_dir = tempfile.mkdtemp()
+    try:
+        out_path = os.path.join(out_dir, "log_folder_table" + ext)
+        n = LsrTree(temp_dir, chunk_size=1).write_entries(out_path, batch_size=2)
+        assert n == 3
+        if ext == ".csv":
+            df = pd.read_csv(out_path)
+        elif ext == ".ndjson":
+            df = pd.read_json(out_path, lines=True)
+        else:
+            df = pd.read_parquet(out_path)
+        assert df.columns.tolist() == LsrTree.entry_columns
+        assert df["file"].tolist() == ["file1.txt", "file2.txt", "<<<((( Empty Folder )))>>>"]
+        assert df.loc[0, "md5"] == hashlib.md5(b"hello world").hexdigest()
+    finally:
+        shutil.rmtree(out_dir)
+
+def test_list_files_dataframe_digests(temp_dir):
+    create_files_structure(temp_dir)
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache_path = os.path.join(cache_dir, "log_folder_cache.sqlite")
+        LsrTree(temp_dir, outfmt="dataframe", cache_path=cache_path).list_files()
+        lsr = LsrTree(temp_dir, outfmt="dataframe", cache_path=cache_path, digests=["SHA-256"])
+        df = lsr.list_files()
+        assert lsr.cache_stats["misses"] == 2
+        assert df.columns.tolist()[-2:] == ["md5", "sha256"]
+        assert df[df["file"] == "file1.txt"]["sha256"].iloc[0] == hashlib.sha256(b"hello world").hexdigest()
+        lsr = LsrTree(temp_dir, outfmt="dataframe", cache_path=cache_path, digests=["sha256"])
+        assert lsr.list_files().equals(df)
+        assert lsr.cache_stats["hits"] == 2
+    finally:
+        shutil.rmtree(cache_dir)
+
+def test_list_files_dataframe_typed(temp_dir):
+    create_files_structure(temp_dir)
+    lsr = LsrTree(temp_dir)
+    legacy = lsr.list_files_dataframe()
+    typed = lsr.list_files_dataframe(typed=True)
+    assert str(typed["size_in_bytes"].dtype) == "Int64"
+    assert str(typed["N_row"].dtype) == "Int64"
+    assert str(typed["modified"].dtype) == "datetime64[ns]"
+    assert isinstance(typed["path"].dtype, pd.CategoricalDtype)
+    assert typed["size_in_bytes"].tolist()[:2] == [11, 12]
+    assert typed["N_page"].isna().all()
+    assert to_legacy_dataframe(typed).equals(legacy)
+    reread = to_typed_dataframe(pd.read_csv(StringIO(legacy.to_csv(index=False))))
+    assert reread.dtypes.equals(typed.dtypes)
+    assert reread["modified"].equals(typed["modified"].dt.floor("s"))
+    assert reread["size_in_bytes"].equals(typed["size_in_bytes"])
+
+def test_quick_hash_mode(temp_dir):
+    create_files_structure(temp_dir)
+    big = os.path.join(temp_dir, "big.bin")
+    with open(big, "wb") as f:
+        f.write(bytes(range(256)) * 4)
+    other = os.path.join(temp_dir, "folder1", "other.bin")
+    with open(other, "wb") as f:
+        f.write(b"x" * 1000)
+    lsr = LsrTree(temp_dir, hash_mode="quick", sample_size=16)
+    df = lsr.list_files_dataframe()
+    assert df.columns.tolist()[-3:] == ["md5", "fingerprint", "hash_mode"]
+    rows = df.set_index("file")
+    assert rows.loc["big.bin", "md5"] is None and rows.loc["big.bin", "hash_mode"] == "quick"
+    assert rows.loc["file1.txt", "md5"] == hashlib.md5(b"hello world").hexdigest() and rows.loc["file1.txt", "hash_mode"] == "full"
+
+    verified = lsr.verify_digests(df)
+    assert lsr.verify_stats == {"reused": 0, "hashed": 2}
+    assert verified.set_index("file").loc["big.bin", "md5"] == hashlib.md5(bytes(range(256)) * 4).hexdigest()
+    assert (verified[verified["type"] == "file"]["hash_mode"] == "full").all()
+
+    with open(big, "r+b") as f:
+        f.seek(512)
+        f.write(b"!")
+    lsr = LsrTree(temp_dir, hash_mode="quick", sample_size=16)
+    df2 = lsr.list_files_dataframe(typed=True)
+    verified2 = lsr.verify_digests(df2, previous=verified)
+    assert lsr.verify_stats == {"reused": 1, "hashed": 1}
+    assert verified2.set_index("file").loc["other.bin", "md5"] == hashlib.md5(b"x" * 1000).hexdigest()
+    assert verified2.set_index("file").loc["big.bin", "md5"] != verified.set_index("file").loc["big.bin", "md5"]
+    with pytest.raises(ValueError):
+        LsrTree(temp_dir, hash_mode="fast")
+
+def test_get_scan_stats(temp_dir):
+    create_files_structure(temp_dir)
+    with open(os.path.join(temp_dir, "folder1", "data.csv"), "w") as f:
+        f.write("a,b\n1,2\n")
+    lsr = LsrTree(temp_dir, slowest_n=2)
+    lsr.list_files_dataframe()
+    stats = lsr.get_scan_stats()
+    assert set(stats["phases"]) == {"walk", "stat", "cache", "hash", "extract"}
+    assert (stats["folders"], stats["files"], stats["meta_files"]) == (4, 3, 3)
+    assert stats["bytes_read"] == len("hello world") + len("another file") + 8
+    assert stats["wall_seconds"] >= stats["phases"]["hash"] > 0
+    assert stats["extractors"]["csv"]["ok"] == 1
+    slowest = stats["slowest_files"]
+    assert len(slowest) == 2 and slowest[0]["seconds"] >= slowest[1]["seconds"]
+    assert {"rel_path", "seconds", "hash_seconds", "extractor", "extractor_seconds"} == set(slowest[0])
+
+    # A lazy walk inside iter_entries is counted in the same pass
+    lsr = LsrTree(temp_dir)
+    assert len(list(lsr.iter_entries(with_meta=True))) == 4
+    stats = lsr.get_scan_stats()
+    assert (stats["files"], stats["meta_files"]) == (3, 3)
+    assert stats["wall_seconds"] > 0
+
+@pytest.mark.parametrize("name, fmt", [("tree.ndjson", "ndjson"), ("tree.json", "array"), ("tree.jsonl.gz", "ndjson"), ("tree.json.gz", "array")])
+def test_write_json(temp_dir, name, fmt):
+    create_files_structure(temp_dir)
+    out_dir = tempfile.mkdtemp()
+    try:
+        file_path = os.path.join(out_dir, name)
+        lsr = LsrTree(temp_dir)
+        assert lsr.write_json(file_path) == 4
+        opener = gzip.open if name.endswith(".gz") else open
+        with opener(file_path, "rt", encoding="utf-8") as f:
+            text = f.read()
+        records = [json.loads(line) for line in text.splitlines()] if fmt == "ndjson" else json.loads(text)
+        expected = json.loads(LsrTree(temp_dir).list_files_json())
+        assert records == [expected[str(i)] for i in range(len(expected))]
+    finally:
+        shutil.rmtree(out_dir)
+
+def test_iter_json(temp_dir):
+    create_files_structure(temp_dir)
+    lsr = LsrTree(temp_dir)
+    assert "".join(lsr.iter_json("object")) == lsr.list_files_json()
+    first = next(LsrTree(temp_dir).iter_json())
+    assert json.loads(first) == {"path": "", "level": 0, "folders": ["folder1", "folder2"], "files": ["file1.txt"]}
+    buf = BytesIO()
+    assert LsrTree(temp_dir).write_json(buf, fmt="array", compress="gzip") == 4
+    assert not buf.closed
+    assert len(json.loads(gzip.decompress(buf.getvalue()))) == 4
+    text = StringIO()
+    LsrTree(temp_dir).write_json(text)
+    assert len(text.getvalue().splitlines()) == 4
+    with pytest.raises(ValueError):
+        list(lsr.iter_json("csv"))
+
+class ZeroInodeEntry:
+    # An os.scandir() entry whose stat() reports 0 as st_ino, st_dev and st_nlink, as on Windows
+
+    def __init__(self, entry):
+        self.entry = entry
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_dir(self):
+        return self.entry.is_dir()
+
+    def is_symlink(self):
+        return self.entry.is_symlink()
+
+    def stat(self):
+        st = self.entry.stat()
+        return os.stat_result((
+            st.st_mode, 0, 0, 0, st.st_uid, st.st_gid, st.st_size, int(st.st_atime), int(st.st_mtime), int(st.st_ctime),
+            st.st_atime, st.st_mtime, st.st_ctime, st.st_atime_ns, st.st_mtime_ns, st.st_ctime_ns,
+        ))
+
+@contextlib.contextmanager
+def zero_inode_scandir(path, scandir=os.scandir):
+    with scandir(path) as it:
+        yield [ZeroInodeEntry(entry) for entry in it]
+
+@pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt", reason="needs POSIX symlinks and hard links")
+@pytest.mark.parametrize("zero_inodes", [False, True])
+def test_links_and_symlink_loops(temp_dir, monkeypatch, zero_inodes):
+    outside = tempfile.mkdtemp()
+    outside2 = tempfile.mkdtemp()
+    try:
+        root = os.path.join(temp_dir, "root")
+        os.makedirs(os.path.join(root, "a"))
+        os.makedirs(os.path.join(root, "b"))
+        with open(os.path.join(root, "a", "data.csv"), "w") as f:
+            f.write("x,y\n" + "1,2\n" * 100)
+        os.link(os.path.join(root, "a", "data.csv"), os.path.join(root, "b", "data_hard.csv"))
+        os.symlink(os.path.join(root, "a", "data.csv"), os.path.join(root, "data_link.csv"))
+        os.symlink(os.path.join(root, "a"), os.path.join(root, "a_link"))
+        os.symlink("/nonexistent/target", os.path.join(root, "broken"))
+        os.makedirs(os.path.join(outside, "inner"))
+        with open(os.path.join(outside, "e.txt"), "w") as f:
+            f.write("e")
+        os.symlink(outside, os.path.join(root, "ext"))
+        os.symlink(outside, os.path.join(outside, "inner", "loop"))
+        with open(os.path.join(outside2, "f.txt"), "w") as f:
+            f.write("f")
+        os.symlink(outside2, os.path.join(root, "ext2"))
+        if zero_inodes:
+            monkeypatch.setattr(os, "scandir", zero_inode_scandir)
+
+        lsr = LsrTree(root, outfmt="dataframe")
+        df = lsr.list_files_dataframe()
+        assert "e.txt" not in df["file"].values
+        rows = df[df["file"].str.startswith("data")]
+        assert rows["md5"].nunique() == 1 and rows["N_row"].tolist() == ["100"] * 3
+        stats = lsr.get_scan_stats()
+        assert (stats["meta_files"], stats["aliases"], stats["bytes_saved"]) == (2, 2, 2 * 404)
+        assert stats["symlinks"] == {"file": 1, "folder": 3, "broken": 1, "walked": 0}
+
+        lsr = LsrTree(root, outfmt="dataframe", follow_symlinks=True)
+        df = lsr.list_files_dataframe()
+        assert df[df["file"] == "e.txt"]["path"].tolist() == ["/ext"]
+        assert df[df["file"] == "f.txt"]["path"].tolist() == ["/ext2"]
+        # The loop back to the outside folder and the link to a folder inside root are not walked
+        assert {link["rel_path"]: link["walked"] for link in lsr.symlinks if link["type"] == "folder"} == {
+            "a_link": False, "ext": True, "ext/inner/loop": False, "ext2": True,
+        }
+        assert lsr.get_scan_stats()["symlinks"]["walked"] == 2
+    finally:
+        monkeypatch.undo()
+        shutil.rmtree(outside)
+        shutil.rmtree(outside2)
+
+def test_parallel_walk_matches_serial(temp_dir, monkeypatch):
+    create_files_structure(temp_dir)
+    for i in range(4):
+        for j in range(3):
+            sub = os.path.join(temp_dir, f"part{i}", f"sub {j}", "deep")
+            os.makedirs(sub)
+            with open(os.path.join(sub, f"f{i}{j}.txt"), "w") as f:
+                f.write("x")
+        os.makedirs(os.path.join(temp_dir, f"part{i}-x"))
+    expected = LsrTree(temp_dir).scan()
+    assert LsrTree(temp_dir, walk_workers=3, walk_depth=2, exclude=["deep"]).list_files_list() == LsrTree(temp_dir, exclude=["deep"]).list_files_list()
+    # A slowed-down listing stands in for a high-latency network share; the most listings running at once is kept
+    scandir = os.scandir
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def slow_scandir(path):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", slow_scandir)
+    serial = LsrTree(temp_dir).scan()
+    assert running[1] == 1
+    lsr = LsrTree(temp_dir, walk_workers=8)
+    parallel = lsr.scan()
+    assert [n["dirpath"] for n in parallel] == [n["dirpath"] for n in expected]
+    assert parallel == serial == expected
+    assert lsr.get_scan_stats()["folders"] == len(expected)
+    assert running[1] > 1
+    with pytest.raises(ValueError):
+        LsrTree(temp_dir, walk_workers=0)
+
+def test_reuse_listings_and_since(temp_dir, monkeypatch):
+    root = os.path.join(temp_dir, "data")
+    create_files_structure(root)
+    cache_path = os.path.join(temp_dir, "cache.sqlite")
+    old = time.time() - 3600
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, (old, old))
+    with pytest.raises(ValueError):
+        LsrTree(root, reuse_listings=True)
+    with pytest.raises(ValueError):
+        list(LsrTree(root).iter_entries(since="last"))
+    lsr = LsrTree(root, cache_path=cache_path, reuse_listings=True)
+    expected = lsr.scan()
+    lsr.list_files_dataframe()
+    assert lsr.listing_stats == {"reused": 0, "listed": 4}
+    assert lsr.previous_walk_ns is None
+    # Unchanged folders are not read again
+    scandir = os.scandir
+    listed = []
+
+    def counting_scandir(path):
+        listed.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    lsr = LsrTree(root, cache_path=cache_path, reuse_listings=True)
+    assert lsr.scan() == expected
+    assert listed == []
+    assert lsr.listing_stats == {"reused": 4, "listed": 0}
+    assert lsr.previous_walk_ns is not None
+    # A new file updates the mtime of its folder, so only that folder is listed again
+    with open(os.path.join(root, "folder2", "new.txt"), "w") as f:
+        f.write("new")
+    lsr = LsrTree(root, cache_path=cache_path, reuse_listings=True)
+    changed = list(lsr.iter_entries(with_meta=True, since="last"))
+    assert listed == [os.path.join(root, "folder2")]
+    assert [(e["path"], e["file"], e["md5"]) for e in changed] == [("/folder2", "new.txt", hashlib.md5(b"new").hexdigest())]
+    assert lsr.listing_stats == {"reused": 3, "listed": 1}
+    # The since= scan keeps the cached rows of the files it skipped
+    lsr = LsrTree(root, cache_path=cache_path, reuse_listings=True)
+    lsr.list_files_dataframe()
+    assert lsr.cache_stats == {"hits": 3, "misses": 0, "removed": 0}
+    # A file changed in place keeps its folder's mtime; the listing is reused, but the file is stat'ed again
+    time.sleep(0.01)
+    with open(os.path.join(root, "folder1", "file2.txt"), "w") as f:
+        f.write("changed in place")
+    listed.clear()
+    lsr = LsrTree(root, cache_path=cache_path, reuse_listings=True)
+    changed = list(lsr.iter_entries(with_meta=True, since="last"))
+    assert os.path.join(root, "folder1") not in listed
+    assert [(e["file"], e["size_in_bytes"], e["md5"]) for e in changed] == [("file2.txt", 16, hashlib.md5(b"changed in place").hexdigest())]
+    assert "/folder2/new.txt" in LsrTree(root, cache_path=cache_path, reuse_listings=True).list_files_list()
+    assert list(LsrTree(root).iter_entries(since=time.time() + 60)) == []
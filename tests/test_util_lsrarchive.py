@@ -0,0 +1,197 @@
+import io
+import os
+import time
+import builtins
+import zlib
+import hashlib
+import tarfile
+import zipfile
+import tempfile
+import shutil
+import pytest
+from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsrarchive import is_archive, list_archive, archive_nodes, open_member, close_archives
+from lsrfixtures import get_fixtures
+
+@pytest.fixture
+def temp_dir():
+    dirpath = tempfile.mkdtemp()
+    yield dirpath
+    shutil.rmtree(dirpath)
+
+@pytest.fixture
+def fixtures():
+    return get_fixtures()
+
+def write_zip(file_path, members):
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+
+def write_tar(file_path, members, mode="w:gz"):
+    with tarfile.open(file_path, mode) as tar:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = 1700000000
+            tar.addfile(info, io.BytesIO(data))
+
+def test_is_archive():
+    assert is_archive("bundle.ZIP")
+    assert is_archive("bundle.tar.gz")
+    assert not is_archive("adsl.xpt")
+    assert not is_archive("data.gz")
+
+def test_list_archive_zip(temp_dir, fixtures):
+    file_path = os.path.join(temp_dir, "bundle.zip")
+    write_zip(file_path, {"m5/adsl.xpt": fixtures["xpt"], "../evil.txt": b"x", "m5/empty/": b""})
+    members = {m["name"]: m for m in list_archive(file_path)}
+    assert sorted(members) == ["m5/adsl.xpt", "m5/empty"]
+    assert members["m5/adsl.xpt"]["size"] == len(fixtures["xpt"])
+    assert members["m5/adsl.xpt"]["crc32"] == zlib.crc32(fixtures["xpt"])
+    assert members["m5/empty"]["is_dir"]
+
+def test_list_archive_tar(temp_dir, fixtures):
+    file_path = os.path.join(temp_dir, "bundle.tar.gz")
+    write_tar(file_path, {"./m5/adsl.xpt": fixtures["xpt"]})
+    members = list_archive(file_path)
+    assert [(m["name"], m["size"], m["mtime"], m["crc32"]) for m in members] == [("m5/adsl.xpt", len(fixtures["xpt"]), 1700000000.0, None)]
+    with open_member(file_path, members[0]["member"], members[0]["size"], members[0]["offset"]) as f:
+        assert f.read() == fixtures["xpt"]
+    close_archives()
+
+def test_list_archive_invalid(temp_dir):
+    file_path = os.path.join(temp_dir, "bad.zip")
+    with open(file_path, "wb") as f:
+        f.write(b"not an archive")
+    with pytest.raises(ValueError):
+        list_archive(file_path)
+
+def test_archive_nodes(temp_dir, fixtures):
+    file_path = os.path.join(temp_dir, "bundle.zip")
+    write_zip(file_path, {"a/b/adsl.xpt": fixtures["xpt"], "a/notes.txt": b"x", "data.csv": fixtures["csv"]})
+    nodes = archive_nodes(file_path, file_path, keep=lambda parts, is_dir: is_dir or parts[-1] != "notes.txt")
+    assert sorted(nodes) == [file_path, os.path.join(file_path, "a"), os.path.join(file_path, "a", "b")]
+    assert nodes[file_path]["dirs"] == ["a"]
+    assert [name for name, _ in nodes[os.path.join(file_path, "a")]["files"]] == []
+    node = nodes[os.path.join(file_path, "a", "b")]
+    name, st = node["files"][0]
+    assert (name, st.st_size, st.st_ino) == ("adsl.xpt", len(fixtures["xpt"]), 0)
+    assert node["sources"]["adsl.xpt"] == (file_path, "a/b/adsl.xpt", len(fixtures["xpt"]), None, zlib.crc32(fixtures["xpt"]))
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_list_files_dataframe_archives(temp_dir, fixtures, workers):
+    write_zip(os.path.join(temp_dir, "bundle.zip"), {"m5/adsl.xpt": fixtures["xpt"], "m5/report.pdf": fixtures["pdf"]})
+    os.makedirs(os.path.join(temp_dir, "sub"))
+    write_tar(os.path.join(temp_dir, "sub", "data.tar"), {"data.csv": fixtures["csv"]}, mode="w")
+    df = LsrTree(temp_dir, outfmt="dataframe", archives=True, workers=workers).list_files_dataframe(typed=True)
+    rows = {(p, f): row for p, f, row in zip(df["path"].astype(str), df["file"], df.to_dict("records"))}
+    xpt = rows[("/bundle.zip/m5", "adsl.xpt")]
+    assert (xpt["N_column"], xpt["N_row"]) == (4, 20)
+    assert xpt["md5"] == hashlib.md5(fixtures["xpt"]).hexdigest()
+    assert xpt["crc32"] == f"{zlib.crc32(fixtures['xpt']):08x}"
+    assert rows[("/bundle.zip/m5", "report.pdf")]["N_page"] == 2
+    csv = rows[("/sub/data.tar", "data.csv")]
+    assert (csv["N_column"], csv["N_row"], csv["crc32"]) == (4, 20, None)
+    assert csv["modified"].timestamp() == 1700000000
+    # The archive files are still listed, and nothing is extracted
+    assert (".", "bundle.zip") in rows and ("/sub", "data.tar") in rows
+    assert sorted(os.listdir(temp_dir)) == ["bundle.zip", "sub"]
+
+@pytest.mark.parametrize("chunk_size", [1000, 7])
+def test_compressed_tar_read_once(temp_dir, monkeypatch, chunk_size):
+    # Members stored in reverse name order, so reading them in path order would seek back in the gzip stream;
+    # with chunk_size=7 the members span several chunks, with the folder 'bundle.tar.gz.d' walked between them
+    members = {f"m{i:03d}.bin": os.urandom(20000) for i in reversed(range(40))}
+    members.update({f"sub/s{i}.bin": os.urandom(20000) for i in range(5)})
+    file_path = os.path.join(temp_dir, "bundle.tar.gz")
+    write_tar(file_path, members)
+    os.makedirs(os.path.join(temp_dir, "bundle.tar.gz.d"))
+    with open(os.path.join(temp_dir, "bundle.tar.gz.d", "notes.txt"), "w") as f:
+        f.write("notes")
+    order = [(entry["path"], entry["file"]) for entry in LsrTree(temp_dir, archives=True).iter_entries()]
+    bytes_read = [0]
+    real_open = builtins.open
+
+    class CountingFile:
+        def __init__(self, f):
+            self.f = f
+
+        def read(self, *args):
+            data = self.f.read(*args)
+            bytes_read[0] += len(data)
+            return data
+
+        def __getattr__(self, name):
+            return getattr(self.f, name)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            self.f.close()
+
+    def counting_open(file, *args, **kwargs):
+        f = real_open(file, *args, **kwargs)
+        return CountingFile(f) if file == file_path else f
+
+    monkeypatch.setattr(builtins, "open", counting_open)
+    df = LsrTree(temp_dir, archives=True, chunk_size=chunk_size).list_files_dataframe()
+    assert list(zip(df["path"], df["file"])) == order
+    rows = df[df["file"].str.endswith(".bin")]
+    assert sorted(rows["md5"]) == sorted(hashlib.md5(data).hexdigest() for data in members.values())
+    # One pass each to hash the archive file, list its headers and read its members, whatever the number of members
+    assert bytes_read[0] < 4 * os.path.getsize(file_path)
+
+def test_list_files_archives_off_and_filters(temp_dir, fixtures):
+    write_zip(os.path.join(temp_dir, "bundle.zip"), {"m5/adsl.xpt": fixtures["xpt"], "m5/notes.txt": b"x"})
+    with open(os.path.join(temp_dir, "bad.zip"), "wb") as f:
+        f.write(b"not an archive")
+    assert LsrTree(temp_dir).list_files_list() == ["bad.zip", "bundle.zip"]
+    assert LsrTree(temp_dir, archives=True).list_files_list() == ["bad.zip", "bundle.zip", "/bundle.zip/m5/adsl.xpt", "/bundle.zip/m5/notes.txt"]
+    assert LsrTree(temp_dir, archives=True, file_types=["xpt"]).list_files_list() == ["/bundle.zip/m5/adsl.xpt"]
+    assert LsrTree(temp_dir, archives=True, exclude=["bundle.zip"]).list_files_list() == ["bad.zip"]
+
+def test_archive_members_cached(temp_dir, fixtures):
+    write_zip(os.path.join(temp_dir, "bundle.zip"), {"adsl.xpt": fixtures["xpt"]})
+    cache_path = os.path.join(temp_dir, "cache.sqlite")
+    lsr = LsrTree(temp_dir, outfmt="dataframe", archives=True, cache_path=cache_path, exclude=["cache.sqlite"])
+    lsr.list_files_dataframe()
+    assert lsr.cache_stats["misses"] == 2
+    lsr = LsrTree(temp_dir, outfmt="dataframe", archives=True, cache_path=cache_path, exclude=["cache.sqlite"])
+    df = lsr.list_files_dataframe()
+    assert lsr.cache_stats["hits"] == 2
+    assert df.loc[df["file"] == "adsl.xpt", "N_row"].tolist() == ["20"]
+
+def test_archive_member_crc_in_cache_key(temp_dir):
+    file_path = os.path.join(temp_dir, "bundle.zip")
+    cache_path = os.path.join(temp_dir, "cache.sqlite")
+    for data, misses in [(b"a,b\n1,2\n", 1), (b"a,b\n3,4\n", 1), (b"a,b\n3,4\n", 0)]:
+        # Same name, size and timestamp; only the content and its CRC-32 change
+        with zipfile.ZipFile(file_path, "w") as zf:
+            zf.writestr(zipfile.ZipInfo("data.csv", date_time=(2025, 1, 1, 0, 0, 0)), data)
+        lsr = LsrTree(temp_dir, archives=True, cache_path=cache_path, exclude=["cache.sqlite"], file_types=["csv"])
+        entry = next(lsr.iter_entries(with_meta=True))
+        assert (entry["crc32"], entry["md5"]) == (f"{zlib.crc32(data):08x}", hashlib.md5(data).hexdigest())
+        assert lsr.cache_stats["misses"] == misses
+
+def test_tar_member_archive_in_cache_key(temp_dir):
+    file_path = os.path.join(temp_dir, "bundle.tar")
+    cache_path = os.path.join(temp_dir, "cache.sqlite")
+    for i, (data, misses) in enumerate([(b"a,b\n1,2\n", 1), (b"a,b\n3,4\n", 1), (b"a,b\n3,4\n", 0)]):
+        # Same name, size and header mtime; only the content and the archive's mtime change
+        if misses:
+            write_tar(file_path, {"data.csv": data}, mode="w")
+            os.utime(file_path, ns=(1700000000 * 10 ** 9 + i, 1700000000 * 10 ** 9 + i))
+        lsr = LsrTree(temp_dir, archives=True, cache_path=cache_path, exclude=["cache.sqlite"], file_types=["csv"])
+        entry = next(lsr.iter_entries(with_meta=True))
+        assert entry["md5"] == hashlib.md5(data).hexdigest()
+        assert lsr.cache_stats["misses"] == misses
+
+def test_archive_members_since(temp_dir):
+    # The member headers keep their packing time (2023); the archive itself is written now
+    write_tar(os.path.join(temp_dir, "bundle.tar.gz"), {"m5/adsl.csv": b"a\n1\n", "m5/dm.csv": b"a\n2\n"})
+    lsr = LsrTree(temp_dir, archives=True)
+    since = time.time() - 60
+    assert [entry["file"] for entry in lsr.iter_entries(since=since)] == ["bundle.tar.gz", "adsl.csv", "dm.csv"]
+    assert list(lsr.iter_entries(since=time.time() + 60)) == []
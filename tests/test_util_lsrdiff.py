@@ -0,0 +1,56 @@
+import os
+import tempfile
+import shutil
+import pandas as pd
+import pytest
+from io import StringIO
+from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsrdiff import LsrDiff
+
+@pytest.fixture
+def temp_dir():
+    dirpath = tempfile.mkdtemp()
+    yield dirpath
+    shutil.rmtree(dirpath)
+
+def write_file(base_dir, rel_path, text):
+    file_path = os.path.join(base_dir, *rel_path.split("/"))
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as f:
+        f.write(text)
+
+def test_compare_inventories(temp_dir):
+    for rel_path, text in [("a.txt", "a"), ("sub/b.txt", "bb"), ("sub/c.txt", "ccc"), ("d.txt", "dddd")]:
+        write_file(temp_dir, rel_path, text)
+    record = LsrTree(temp_dir).list_files_dataframe()
+    record = pd.read_csv(StringIO(record.to_csv(index=False)))
+
+    write_file(temp_dir, "sub/b.txt", "BB")
+    os.rename(os.path.join(temp_dir, "sub", "c.txt"), os.path.join(temp_dir, "c_moved.txt"))
+    os.remove(os.path.join(temp_dir, "d.txt"))
+    write_file(temp_dir, "e.txt", "eeeee")
+
+    diff = LsrDiff(compare_columns=["size_in_bytes", "N_row", "md5"])
+    df = diff.compare(record, LsrTree(temp_dir).iter_entries(with_meta=True), include_unchanged=True)
+    assert diff.summary == {"added": 1, "removed": 1, "modified": 1, "moved": 1, "unchanged": 1}
+    status = dict(zip(df["rel_path"], df["status"]))
+    assert status == {"a.txt": "unchanged", "sub/b.txt": "modified", "c_moved.txt": "moved", "e.txt": "added", "d.txt": "removed"}
+    row = df[df["status"] == "modified"].iloc[0]
+    assert row["changed_columns"] == "md5"
+    assert df[df["status"] == "moved"]["old_rel_path"].iloc[0] == "sub/c.txt"
+
+def test_compare_chunked(temp_dir):
+    old = pd.DataFrame({
+        "path": [".", "/x", "/x"], "level": [1, 2, 2], "type": ["file"] * 3, "file": ["a", "b", "c"],
+        "size_in_bytes": ["1", "2", "3"], "modified": ["Fri Jan  5 03:04:05 2024"] * 3, "md5": ["m1", "m2", "m3"],
+    })
+    new = old.copy()
+    new.loc[1, "modified"] = "Sat Jan  6 03:04:05 2024"
+    diff = LsrDiff()
+    df = diff.compare([old.iloc[:1], old.iloc[1:]], [new.iloc[:2], new.iloc[2:]])
+    assert diff.summary["modified"] == 1 and diff.summary["unchanged"] == 2
+    assert df["rel_path"].tolist() == ["x/b"]
+    assert df["changed_columns"].tolist() == ["modified"]
+    assert df["modified_new"].iloc[0] == pd.Timestamp("2024-01-06 03:04:05")
+    with pytest.raises(ValueError):
+        LsrDiff(suffixes=("_x", "_x"))
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import shutil
+import pytest
+from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsrdup import LsrDuplicates
+
+@pytest.fixture
+def temp_dir():
+    dirpath = tempfile.mkdtemp()
+    yield dirpath
+    shutil.rmtree(dirpath)
+
+def write(temp_dir, rel_path, data):
+    file_path = os.path.join(temp_dir, *rel_path.split("/"))
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as f:
+        f.write(data)
+    return file_path
+
+def test_find_duplicates_stages(temp_dir):
+    big = bytes(range(256)) * 64
+    paths = {
+        "a": write(temp_dir, "a/big.bin", big),
+        "b": write(temp_dir, "b/big.bin", big),
+        "c": write(temp_dir, "c/big.bin", big[:3000] + b"x" + big[3001:]),
+        "d": write(temp_dir, "d/small.txt", b"same"),
+        "e": write(temp_dir, "e/small.txt", b"same"),
+        "f": write(temp_dir, "f/other.txt", b"diff"),
+        "g": write(temp_dir, "g/unique.txt", b"unique size"),
+        "h": write(temp_dir, "h/empty1", b""),
+        "i": write(temp_dir, "i/empty2", b""),
+    }
+    files = [(p, os.path.getsize(p), None, None) for p in paths.values()]
+    # With 1 KiB samples, the middle change in 'c' is missed by the fingerprint and caught by the full digest
+    dup = LsrDuplicates(sample_size=1024)
+    groups = dup.find(files)
+    assert groups == [[paths["a"], paths["b"]], [paths["d"], paths["e"]], [paths["h"], paths["i"]]]
+    assert dup.stats["candidates"] == 8
+    assert dup.stats["fingerprinted"] == 6
+    assert dup.stats["hashed"] == 3
+    assert dup.stats["groups"] == 3
+    assert dup.stats["duplicates"] == 3
+
+def test_find_duplicates_reuses_digests(temp_dir):
+    a = write(temp_dir, "a.bin", b"1" * 100)
+    b = write(temp_dir, "b.bin", b"1" * 100)
+    c = write(temp_dir, "c.bin", b"2" * 100)
+    dup = LsrDuplicates()
+    groups = dup.find([(a, 100, "m1", None), (b, 100, "m1", None), (c, 100, "m2", None)])
+    assert groups == [[a, b]]
+    assert dup.stats["fingerprinted"] == 0 and dup.stats["hashed"] == 0 and dup.stats["reused"] == 3
+    # A missing file is left out of the groups
+    assert dup.find([(a, 100, None, None), (os.path.join(temp_dir, "missing"), 100, None, None)]) == []
+
+def test_inventory_duplicate_group(temp_dir):
+    write(temp_dir, "m5/adam/adsl.xpt", b"adsl" * 100)
+    write(temp_dir, "m5/sdtm/adsl.xpt", b"adsl" * 100)
+    write(temp_dir, "m5/sdtm/dm.xpt", b"dm" * 200)
+    lsr = LsrTree(temp_dir, outfmt="dataframe", with_duplicates=True)
+    df = lsr.list_files_dataframe()
+    assert dict(zip(df["file"] + df["path"], df["duplicate_group"])) == {
+        "adsl.xpt/m5/adam": "1", "adsl.xpt/m5/sdtm": "1", "dm.xpt/m5/sdtm": "None",
+    }
+    # The md5 values of the inventory are reused, so no file is read again
+    assert lsr.duplicate_stats["fingerprinted"] == 0 and lsr.duplicate_stats["hashed"] == 0
+    typed = lsr.list_files_dataframe(typed=True)
+    assert str(typed["duplicate_group"].dtype) == "Int64"
+    assert typed["duplicate_group"].isna().sum() == 1
+
+    lsr = LsrTree(temp_dir, hash_mode="quick")
+    dups = lsr.find_duplicates()
+    assert dups["rel_path"].tolist() == ["m5/adam/adsl.xpt", "m5/sdtm/adsl.xpt"]
+    assert dups["duplicate_group"].tolist() == [1, 1]
+    assert dups["size_in_bytes"].tolist() == [400, 400]
+    # Without an inventory, nothing is parsed, and the three 400-byte files are only read for their fingerprints
+    assert lsr.scan_stats.get("meta_files", 0) == 0 and lsr.extractor_stats == {}
+    assert (lsr.duplicate_stats["candidates"], lsr.duplicate_stats["fingerprinted"], lsr.duplicate_stats["hashed"]) == (3, 3, 0)
@@ -0,0 +1,136 @@
+import os
+import time
+import tempfile
+import shutil
+import pytest
+from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsrextract import register_extractor, unregister_extractor, select_extractors, run_extractors, detect_file_type
+from lsrfixtures import get_fixtures
+
+@pytest.fixture
+def temp_dir():
+    dirpath = tempfile.mkdtemp()
+    yield dirpath
+    shutil.rmtree(dirpath)
+
+@pytest.fixture
+def txt_extractors():
+    register_extractor("txt_lines", ["txt"], get_txt_shape, ["N_row"], cost=1, max_size=100)
+    register_extractor("txt_slow", ["TXT"], get_txt_shape_slow, ["N_column", "N_row"], cost=5, timeout=0.05)
+    yield
+    unregister_extractor("txt_lines")
+    unregister_extractor("txt_slow")
+
+def get_txt_shape(file_path):
+    with open(file_path, "rb") as f:
+        return (len(f.read().splitlines()),)
+
+def get_txt_shape_slow(file_path):
+    time.sleep(1)
+    return (1, 1)
+
+def write(temp_dir, name, data):
+    with open(os.path.join(temp_dir, name), "w") as f:
+        f.write(data)
+
+def test_select_extractors(txt_extractors):
+    selected = select_extractors()
+    assert [e["name"] for e in selected["txt"]] == ["txt_lines", "txt_slow"]
+    assert [e["name"] for e in selected["xpt"]] == ["xpt"]
+    assert "txt" not in select_extractors(["xpt", "pdf"])
+    assert [e["name"] for e in select_extractors(max_cost=2)["txt"]] == ["txt_lines"]
+    assert select_extractors(options={"txt_lines": {"max_size": 5}})["txt"][0]["max_size"] == 5
+    with pytest.raises(ValueError):
+        select_extractors(["unknown"])
+    with pytest.raises(ValueError):
+        select_extractors(options={"txt_lines": {"cost": 0}})
+    with pytest.raises(ValueError):
+        register_extractor("bad", ["txt"], get_txt_shape, ["N_bytes"])
+
+def test_run_extractors(temp_dir, txt_extractors):
+    write(temp_dir, "a.txt", "1\n2\n3\n")
+    file_path = os.path.join(temp_dir, "a.txt")
+    values, records = run_extractors(file_path, "txt", 6, select_extractors())
+    # The slow extractor still runs for N_column, and its N_row does not replace the cheaper one
+    assert values == {"N_page": None, "N_column": None, "N_row": 3}
+    assert [(r[0], r[1]) for r in records] == [("txt_lines", "ok"), ("txt_slow", "timeout")]
+    assert records[1][2] < 0.5
+    values, records = run_extractors(file_path, "txt", 1000, select_extractors(["txt_lines"]))
+    assert values["N_row"] is None
+    assert records == [("txt_lines", "skipped", 0.0)]
+
+def test_inventory_extractor_stats(temp_dir, txt_extractors):
+    write(temp_dir, "a.txt", "1\n2\n")
+    write(temp_dir, "b.txt", "x" * 200)
+    write(temp_dir, "c.csv", "a,b\n1,2\n")
+    lsr = LsrTree(temp_dir, outfmt="dataframe", extractors=["txt_lines", "csv"])
+    df = lsr.list_files_dataframe()
+    assert dict(zip(df["file"], df["N_row"])) == {"a.txt": "2", "b.txt": "None", "c.csv": "1"}
+    stats = df.attrs["extractor_stats"]
+    assert stats == lsr.extractor_stats
+    assert {k: (v["files"], v["ok"], v["skipped"]) for k, v in stats.items()} == {"txt_lines": (2, 1, 1), "csv": (1, 1, 0)}
+
+    df = LsrTree(temp_dir, outfmt="dataframe", max_extractor_cost=1).list_files_dataframe(typed=True)
+    assert df["N_row"].isna().tolist() == [False, True, True]
+
+def test_inventory_cache_extractors(temp_dir, txt_extractors):
+    write(temp_dir, "a.txt", "1\n2\n")
+    write(temp_dir, "c.csv", "a,b\n1,2\n")
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache_path = os.path.join(cache_dir, "log_folder_cache.sqlite")
+        df = LsrTree(temp_dir, outfmt="dataframe", cache_path=cache_path, max_extractor_cost=1).list_files_dataframe()
+        assert df["N_row"].tolist() == ["2", "None"]
+        # The csv extractor did not run, so the cached entry of c.csv is a miss once it is selected
+        lsr = LsrTree(temp_dir, outfmt="dataframe", cache_path=cache_path, extractors=["txt_lines", "csv"])
+        df = lsr.list_files_dataframe()
+        assert (lsr.cache_stats["hits"], lsr.cache_stats["misses"]) == (1, 1)
+        assert df["N_row"].tolist() == ["2", "1"]
+        lsr = LsrTree(temp_dir, outfmt="dataframe", cache_path=cache_path, extractors=["txt_lines", "csv"])
+        lsr.list_files_dataframe()
+        assert (lsr.cache_stats["hits"], lsr.cache_stats["misses"]) == (2, 0)
+        # A timed-out extractor is tried again by the next scan
+        for _ in range(2):
+            lsr = LsrTree(temp_dir, outfmt="dataframe", cache_path=cache_path)
+            lsr.list_files_dataframe()
+            assert (lsr.cache_stats["hits"], lsr.cache_stats["misses"]) == (1, 1)
+            assert lsr.extractor_stats["txt_slow"]["timeout"] == 1
+    finally:
+        shutil.rmtree(cache_dir)
+
+@pytest.mark.parametrize("name,content,expected", [
+    ("adsl.xpt", "xpt", "xpt"),
+    ("adsl.xpt", "xlsx", "zip"),
+    ("adsl.XPT", "txt", "txt"),
+    ("report", "pdf", "pdf"),
+    ("report.dat", "pdf", "pdf"),
+    ("spec.xlsx", "xlsx", "xlsx"),
+    ("data.csv", "csv", "csv"),
+    ("data.csv", "sas7bdat", "sas7bdat"),
+    ("notes.txt", "txt", "txt"),
+    ("notes.log", "txt", "log"),
+])
+def test_detect_file_type(temp_dir, name, content, expected):
+    file_path = os.path.join(temp_dir, name)
+    with open(file_path, "wb") as f:
+        f.write(get_fixtures()[content])
+    assert detect_file_type(file_path, name.split(".")[-1]) == expected
+
+def test_inventory_sniff_types(temp_dir):
+    fixtures = get_fixtures()
+    for name, content in [("report", "pdf"), ("zipped.xpt", "xlsx"), ("adsl.xpt", "xpt"), ("bad.pdf", "txt")]:
+        with open(os.path.join(temp_dir, name), "wb") as f:
+            f.write(fixtures[content])
+    df = LsrTree(temp_dir, outfmt="dataframe", with_counts=True).list_files_dataframe()
+    rows = df.set_index("file")
+    assert rows.loc["report", "N_page"] == "2"
+    assert rows.loc["report", "file_type"] == "report"
+    assert rows.loc["zipped.xpt", "N_row"] == "None"
+    assert rows.loc["adsl.xpt", "N_row"] == "20"
+    assert rows.loc["bad.pdf", "N_page"] == "None"
+    assert df.attrs["extractor_stats"]["pdf"]["files"] == 1
+    assert df.attrs["extractor_stats"]["xpt"]["files"] == 1
+    df = LsrTree(temp_dir, outfmt="dataframe", with_counts=True, sniff_types=False).list_files_dataframe()
+    rows = df.set_index("file")
+    assert rows.loc["report", "N_page"] == "None"
+    assert df.attrs["extractor_stats"]["xpt"]["error"] == 1
@@ -0,0 +1,83 @@
+import os
+import re
+import tempfile
+import shutil
+import zipfile
+import pytest
+from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsrfilter import LsrFilter
+
+@pytest.fixture
+def temp_dir():
+    dirpath = tempfile.mkdtemp()
+    yield dirpath
+    shutil.rmtree(dirpath)
+
+def create_files_structure(base_dir):
+    for rel_path in [".git/config", "sdtm/dm.xpt", "sdtm/ae.xpt", "sdtm/notes.txt", "sdtm/tmp/x.xpt", "adam/adsl.xpt", "output/log.txt", "readme.txt"]:
+        file_path = os.path.join(base_dir, *rel_path.split("/"))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "w") as f:
+            f.write(rel_path)
+
+def test_lsr_filter_rules():
+    lsr_filter = LsrFilter(include=["*.xpt"], exclude=[".git", "/output", re.compile(r"(^|/)tmp/")])
+    assert not lsr_filter.keep_dir(".git", ".git")
+    assert not lsr_filter.keep_dir("output", "output")
+    assert lsr_filter.keep_dir("sdtm/output", "output")
+    assert not lsr_filter.keep_file("sdtm/tmp/x.xpt", "x.xpt")
+    assert lsr_filter.keep_file("sdtm/dm.xpt", "dm.xpt")
+    assert not lsr_filter.keep_file("readme.txt", "readme.txt")
+    assert not LsrFilter().active
+    with pytest.raises(ValueError):
+        LsrFilter(max_depth=-1)
+
+def test_list_files_filtered(temp_dir):
+    create_files_structure(temp_dir)
+    lsr = LsrTree(temp_dir, outfmt="list", exclude=[".git", "/output"], file_types=["XPT"])
+    assert lsr.list_files() == ["/adam/adsl.xpt", "/sdtm/ae.xpt", "/sdtm/dm.xpt", "/sdtm/tmp/x.xpt"]
+    df = LsrTree(temp_dir, exclude=[".git", "/output"], file_types=["xpt"]).list_files_dataframe()
+    assert df["file"].tolist() == ["adsl.xpt", "ae.xpt", "dm.xpt", "x.xpt"]
+
+def test_filtered_folders_not_empty(temp_dir):
+    for rel_path in ["a/x.txt", "c/d.csv"]:
+        os.makedirs(os.path.join(temp_dir, os.path.dirname(rel_path)))
+        with open(os.path.join(temp_dir, rel_path), "w") as f:
+            f.write(rel_path)
+    os.makedirs(os.path.join(temp_dir, "b"))
+    with zipfile.ZipFile(os.path.join(temp_dir, "c", "notes.zip"), "w") as zf:
+        zf.writestr("m5/notes.txt", "x")
+    # /a and the folders of notes.zip only hold files left out by the filter; only /b is empty on disk
+    lsr = LsrTree(temp_dir, file_types=["csv", "zip"], archives=True, with_counts=True)
+    assert lsr.list_files_list() == ["/b/(((empty folder)))", "/c/d.csv", "/c/notes.zip"]
+    df = lsr.list_files_dataframe()
+    assert df.loc[df["type"] == "folder", "path"].tolist() == ["/b"]
+    assert lsr.list_files_string().count("(((empty folder)))") == 1
+    tree = lsr.list_files_tree().tolist()
+    assert [line for line in tree if "Empty Folder" in line] == ["├── b/  ............ [Count: Empty Folder]"]
+    assert "├── a/  ............ [Count: F=0; D=0]" in tree
+
+def test_filtered_scan_keeps_cache(temp_dir):
+    create_files_structure(temp_dir)
+    cache_dir = tempfile.mkdtemp()
+    try:
+        cache_path = os.path.join(cache_dir, "log_folder_cache.sqlite")
+        LsrTree(temp_dir, cache_path=cache_path).list_files_dataframe()
+        lsr = LsrTree(temp_dir, cache_path=cache_path, file_types=["xpt"])
+        lsr.list_files_dataframe()
+        assert lsr.cache_stats == {"hits": 4, "misses": 0, "removed": 0}
+        lsr = LsrTree(temp_dir, cache_path=cache_path)
+        lsr.list_files_dataframe()
+        assert lsr.cache_stats == {"hits": 8, "misses": 0, "removed": 0}
+    finally:
+        shutil.rmtree(cache_dir)
+
+def test_list_files_max_depth(temp_dir):
+    create_files_structure(temp_dir)
+    lsr = LsrTree(temp_dir, outfmt="tree", exclude=".git", max_depth=1)
+    tree = lsr.list_files().tolist()
+    assert tree[-2:] == ["    ├── notes.txt", "    └── tmp/"]
+    assert not any("x.xpt" in line for line in tree)
+    assert [os.path.relpath(n["dirpath"], temp_dir) for n in lsr.scan()] == [".", "adam", "output", "sdtm"]
+    lsr = LsrTree(temp_dir, outfmt="list", max_depth=0)
+    assert lsr.list_files() == ["readme.txt"]
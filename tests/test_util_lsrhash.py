@@ -0,0 +1,52 @@
+import os
+import tempfile
+import shutil
+import hashlib
+import pytest
+from mtbp3cd.util.lsrhash import get_digests, get_fingerprint, normalize_algorithm
+
+@pytest.fixture
+def temp_dir():
+    dirpath = tempfile.mkdtemp()
+    yield dirpath
+    shutil.rmtree(dirpath)
+
+@pytest.mark.parametrize("buffer_size", [7, 1 << 20])
+def test_get_digests(temp_dir, buffer_size):
+    data = os.urandom(100003)
+    file_path = os.path.join(temp_dir, "data.bin")
+    with open(file_path, "wb") as f:
+        f.write(data)
+    result = get_digests(file_path, ["MD5", "SHA-256", "sha512", "blake2b"], buffer_size=buffer_size)
+    assert result == {
+        "md5": hashlib.md5(data).hexdigest(),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "sha512": hashlib.sha512(data).hexdigest(),
+        "blake2b": hashlib.blake2b(data).hexdigest(),
+    }
+    assert get_digests(file_path, "sha256") == {"sha256": hashlib.sha256(data).hexdigest()}
+
+def test_get_digests_empty_file(temp_dir):
+    file_path = os.path.join(temp_dir, "empty.txt")
+    open(file_path, "w").close()
+    assert get_digests(file_path, ["md5", "sha256"]) == {"md5": hashlib.md5(b"").hexdigest(), "sha256": hashlib.sha256(b"").hexdigest()}
+
+def test_normalize_algorithm():
+    assert normalize_algorithm("SHA-512") == "sha512"
+    with pytest.raises(ValueError):
+        normalize_algorithm("crc32")
+
+def test_get_fingerprint(temp_dir):
+    file_path = os.path.join(temp_dir, "data.bin")
+    with open(file_path, "wb") as f:
+        f.write(b"a" * 1000)
+    fp1 = get_fingerprint(file_path, sample_size=100)
+    with open(file_path, "r+b") as f:
+        f.seek(200)
+        f.write(b"b")
+    assert get_fingerprint(file_path, sample_size=100) == fp1
+    with open(file_path, "r+b") as f:
+        f.seek(500)
+        f.write(b"b")
+    assert get_fingerprint(file_path, sample_size=100) != fp1
+    assert len(fp1) == 32
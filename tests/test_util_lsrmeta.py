@@ -0,0 +1,127 @@
+import os
+import tempfile
+import shutil
+import zipfile
+import re
+import openpyxl
+import pandas as pd
+import pytest
+from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsrmeta import get_sas7bdat_shape, get_xpt_shape, get_csv_shape, get_xlsx_shape, get_xlsx_sheet_shapes, sniff_bytes, sniff_file_type
+from lsrfixtures import get_fixtures, xpt_fixture, sas7bdat_fixture
+
+@pytest.fixture
+def temp_dir():
+    dirpath = tempfile.mkdtemp()
+    yield dirpath
+    shutil.rmtree(dirpath)
+
+def write_xpt(file_path, n_columns, n_rows):
+    with open(file_path, "wb") as f:
+        f.write(xpt_fixture(n_columns, n_rows))
+
+def write_sas7bdat_header(file_path, n_columns, n_rows):
+    with open(file_path, "wb") as f:
+        f.write(sas7bdat_fixture(n_columns, n_rows))
+
+@pytest.mark.parametrize("n_columns, n_rows", [(1, 0), (1, 3), (3, 7), (10, 1), (25, 100)])
+def test_get_xpt_shape(temp_dir, n_columns, n_rows):
+    file_path = os.path.join(temp_dir, "dm.xpt")
+    write_xpt(file_path, n_columns, n_rows)
+    assert get_xpt_shape(file_path) == (n_columns, n_rows)
+    if n_rows > 0:
+        assert pd.read_sas(file_path, format="xport").shape == (n_rows, n_columns)
+
+def test_get_sas7bdat_shape(temp_dir):
+    file_path = os.path.join(temp_dir, "adlb.sas7bdat")
+    write_sas7bdat_header(file_path, 42, 123456789)
+    assert get_sas7bdat_shape(file_path) == (42, 123456789)
+
+def test_invalid_sas_files(temp_dir):
+    file_path = os.path.join(temp_dir, "bad.xpt")
+    with open(file_path, "wb") as f:
+        f.write(b"not a sas file" * 100)
+    with pytest.raises(ValueError):
+        get_xpt_shape(file_path)
+    with pytest.raises(ValueError):
+        get_sas7bdat_shape(file_path)
+
+def test_list_files_dataframe_sas(temp_dir):
+    write_xpt(os.path.join(temp_dir, "dm.xpt"), 4, 9)
+    write_sas7bdat_header(os.path.join(temp_dir, "adlb.sas7bdat"), 5, 11)
+    with open(os.path.join(temp_dir, "ae.sas7bdat"), "wb") as f:
+        f.write(b"corrupted")
+    df = LsrTree(temp_dir, outfmt="dataframe").list_files().set_index("file")
+    assert (df.loc["dm.xpt", "N_column"], df.loc["dm.xpt", "N_row"]) == ("4", "9")
+    assert (df.loc["adlb.sas7bdat", "N_column"], df.loc["adlb.sas7bdat", "N_row"]) == ("5", "11")
+    assert (df.loc["ae.sas7bdat", "N_column"], df.loc["ae.sas7bdat", "N_row"]) == ("None", "None")
+
+@pytest.mark.parametrize("text", [
+    "a,b\n1,2\n3,4\n",
+    "a,b\n1,2\n3,4",
+    "\n\na,b\n1,2\n\n  \n\t\n3,4\n\n",
+    "a,b\r\n1,2\r\n\r\n3,4\r\n",
+    'a,b\n"x\n\ny",2\n"q""\n",3\n"",\n',
+    'a,"b\nc",d\n1,2,3\n',
+    "a,b,c\n",
+])
+@pytest.mark.parametrize("block_size", [1, 3, 1 << 20])
+def test_get_csv_shape(temp_dir, text, block_size):
+    file_path = os.path.join(temp_dir, "data.csv")
+    with open(file_path, "w", newline="") as f:
+        f.write(text)
+    assert get_csv_shape(file_path, block_size=block_size) == pd.read_csv(file_path).shape[::-1]
+
+def test_get_csv_shape_empty(temp_dir):
+    file_path = os.path.join(temp_dir, "empty.csv")
+    with open(file_path, "w") as f:
+        f.write("\n\n")
+    assert get_csv_shape(file_path) == (0, 0)
+
+def write_xlsx(file_path, drop_dimension=False):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "spec"
+    ws.append(["A", "B", "C"])
+    for i in range(12):
+        ws.append([i, None if i % 3 else "x", i * 2])
+    ws.cell(20, 5, "note")
+    wb.create_sheet("codelist").append(["code", "decode"])
+    wb.create_sheet("empty")
+    wb.save(file_path)
+    if drop_dimension:
+        tmp_path = file_path + ".tmp"
+        with zipfile.ZipFile(file_path) as zin, zipfile.ZipFile(tmp_path, "w") as zout:
+            for item in zin.infolist():
+                data = zin.read(item.filename)
+                if item.filename.startswith("xl/worksheets/"):
+                    data = re.sub(rb"<dimension[^>]*/>", b"", data)
+                zout.writestr(item, data)
+        os.replace(tmp_path, file_path)
+
+@pytest.mark.parametrize("drop_dimension", [False, True])
+def test_get_xlsx_shape(temp_dir, drop_dimension):
+    file_path = os.path.join(temp_dir, "spec.xlsx")
+    write_xlsx(file_path, drop_dimension)
+    excel_file = pd.ExcelFile(file_path)
+    expected = (len(excel_file.sheet_names),) + excel_file.parse(excel_file.sheet_names[0]).shape[::-1]
+    assert get_xlsx_shape(file_path) == expected == (3, 5, 19)
+    assert get_xlsx_sheet_shapes(file_path) == {"spec": (5, 19), "codelist": (2, 0), "empty": (0, 0)}
+
+@pytest.mark.parametrize("file_type,expected", [
+    ("xpt", "xpt"), ("sas7bdat", "sas7bdat"), ("pdf", "pdf"), ("xlsx", "zip"), ("csv", "text"), ("txt", "text"),
+])
+def test_sniff_file_type(temp_dir, file_type, expected):
+    file_path = os.path.join(temp_dir, "noext")
+    with open(file_path, "wb") as f:
+        f.write(get_fixtures()[file_type])
+    assert sniff_file_type(file_path) == expected
+
+def test_sniff_bytes():
+    assert sniff_bytes(b"\x1f\x8b\x08\x00") == "gzip"
+    assert sniff_bytes(b"PK\x05\x06" + bytes(18)) == "zip"
+    assert sniff_bytes(b"\xef\xbb\xbfUSUBJID,AGE\n01,\xc3\xa9") == "text"
+    assert sniff_bytes(b"\x00\x01\x02\x03binary") is None
+    assert sniff_bytes(b"") is None
+    # An xpt library header must match, not only the record prefix
+    assert sniff_bytes(b"HEADER RECORD*******OTHER   HEADER RECORD!!!!!!!".ljust(80)) == "text"
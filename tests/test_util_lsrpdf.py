@@ -0,0 +1,134 @@
+import os
+import zlib
+import tempfile
+import shutil
+import pypdf
+import pytest
+from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsrpdf import get_pdf_page_count, get_pdf_page_count_fast
+
+@pytest.fixture
+def temp_dir():
+    dirpath = tempfile.mkdtemp()
+    yield dirpath
+    shutil.rmtree(dirpath)
+
+def write_pypdf(file_path, n_pages):
+    writer = pypdf.PdfWriter()
+    for _ in range(n_pages):
+        writer.add_blank_page(width=72, height=72)
+    with open(file_path, "wb") as f:
+        writer.write(f)
+
+def write_xref_stream_pdf(file_path, n_pages):
+    # Catalog and page tree root are stored in an object stream; the xref is a compressed stream with a PNG predictor
+    kids = " ".join(f"{4 + i} 0 R" for i in range(n_pages))
+    objstm_objs = [b"<< /Type /Catalog /Pages 2 0 R >>", f"<< /Type /Pages /Kids [{kids}] /Count {n_pages} >>".encode()]
+    header = b""
+    body = b""
+    for num, obj in zip([1, 2], objstm_objs):
+        header += b"%d %d " % (num, len(body))
+        body += obj + b"\n"
+    objstm_data = header + body
+    out = b"%PDF-1.5\n"
+    offsets = {}
+    offsets[3] = len(out)
+    out += b"3 0 obj\n<< /Type /ObjStm /N 2 /First %d /Length %d >>\nstream\n" % (len(header), len(objstm_data)) + objstm_data + b"\nendstream\nendobj\n"
+    for i in range(n_pages):
+        offsets[4 + i] = len(out)
+        out += b"%d 0 obj\n<< /Type /Page /Parent 2 0 R /MediaBox [0 0 72 72] >>\nendobj\n" % (4 + i)
+    xref_num = 4 + n_pages
+    offsets[xref_num] = len(out)
+    rows = [(0, 0, 65535), (2, 3, 0), (2, 3, 1)] + [(1, offsets[n], 0) for n in range(3, xref_num + 1)]
+    raw = b""
+    prev = bytes(6)
+    for row in rows:
+        cur = bytes([row[0]]) + row[1].to_bytes(4, "big") + row[2].to_bytes(1, "big") if row[2] < 256 else bytes([row[0]]) + row[1].to_bytes(4, "big") + b"\xff"
+        raw += b"\x02" + bytes((c - p) & 0xFF for c, p in zip(cur, prev))
+        prev = cur
+    data = zlib.compress(raw)
+    out += (b"%d 0 obj\n<< /Type /XRef /Size %d /W [1 4 1] /Root 1 0 R /Filter /FlateDecode "
+            b"/DecodeParms << /Columns 6 /Predictor 12 >> /Length %d >>\nstream\n" % (xref_num, xref_num + 1, len(data)))
+    out += data + b"\nendstream\nendobj\nstartxref\n%d\n%%%%EOF\n" % offsets[xref_num]
+    with open(file_path, "wb") as f:
+        f.write(out)
+
+@pytest.mark.parametrize("n_pages", [1, 3, 25])
+def test_get_pdf_page_count_classic_xref(temp_dir, n_pages):
+    file_path = os.path.join(temp_dir, "doc.pdf")
+    write_pypdf(file_path, n_pages)
+    assert get_pdf_page_count_fast(file_path) == n_pages
+    assert get_pdf_page_count(file_path) == n_pages
+
+@pytest.mark.parametrize("n_pages", [1, 4])
+def test_get_pdf_page_count_xref_stream(temp_dir, n_pages):
+    file_path = os.path.join(temp_dir, "doc.pdf")
+    write_xref_stream_pdf(file_path, n_pages)
+    with open(file_path, "rb") as f:
+        assert pypdf.PdfReader(f).get_num_pages() == n_pages
+    assert get_pdf_page_count_fast(file_path) == n_pages
+
+def test_get_pdf_page_count_incremental_update(temp_dir):
+    file_path = os.path.join(temp_dir, "doc.pdf")
+    write_pypdf(file_path, 2)
+    with open(file_path, "rb") as f:
+        data = f.read()
+        reader = pypdf.PdfReader(f)
+        pages_num = reader.trailer["/Root"].get_object().raw_get("/Pages").idnum
+        kids = " ".join(f"{p.indirect_reference.idnum} 0 R" for p in reader.pages)
+        size = reader.trailer["/Size"]
+        root = reader.trailer.raw_get("/Root").idnum
+    prev = int(data[data.rindex(b"startxref") + 9:].split()[0])
+    # Append a new page and a new version of the page tree root, as an incremental update does
+    update = b""
+    page_offset = len(data) + len(update)
+    update += b"%d 0 obj\n<< /Type /Page /Parent %d 0 R /MediaBox [0 0 72 72] >>\nendobj\n" % (size, pages_num)
+    pages_offset = len(data) + len(update)
+    update += b"%d 0 obj\n<< /Type /Pages /Kids [%s %d 0 R] /Count 3 >>\nendobj\n" % (pages_num, kids.encode(), size)
+    xref_offset = len(data) + len(update)
+    update += b"xref\n%d 1\n%010d 00000 n \n%d 1\n%010d 00000 n \n" % (pages_num, pages_offset, size, page_offset)
+    update += b"trailer\n<< /Size %d /Root %d 0 R /Prev %d >>\nstartxref\n%d\n%%%%EOF\n" % (size + 1, root, prev, xref_offset)
+    with open(file_path, "ab") as f:
+        f.write(update)
+    with open(file_path, "rb") as f:
+        assert pypdf.PdfReader(f).get_num_pages() == 3
+    assert get_pdf_page_count_fast(file_path) == 3
+
+def test_get_pdf_page_count_fallback(temp_dir):
+    # A broken startxref offset makes the fast path fail; pypdf rebuilds the xref
+    file_path = os.path.join(temp_dir, "doc.pdf")
+    write_pypdf(file_path, 2)
+    with open(file_path, "rb") as f:
+        data = f.read()
+    pos = data.rindex(b"startxref")
+    with open(file_path, "wb") as f:
+        f.write(data[:pos] + b"startxref\n9\n%%EOF\n")
+    with pytest.raises(ValueError):
+        get_pdf_page_count_fast(file_path)
+    assert get_pdf_page_count(file_path) == 2
+
+def test_get_pdf_page_count_invalid(temp_dir):
+    file_path = os.path.join(temp_dir, "bad.pdf")
+    with open(file_path, "wb") as f:
+        f.write(b"not a pdf at all")
+    with pytest.raises(ValueError):
+        get_pdf_page_count_fast(file_path)
+    with pytest.raises(Exception):
+        get_pdf_page_count(file_path)
+
+def test_get_pdf_page_count_time_budget(temp_dir):
+    file_path = os.path.join(temp_dir, "doc.pdf")
+    write_pypdf(file_path, 2)
+    with pytest.raises(TimeoutError):
+        get_pdf_page_count_fast(file_path, time_budget=1e-9)
+    with pytest.raises(TimeoutError):
+        get_pdf_page_count(file_path, time_budget=1e-9)
+
+def test_list_files_dataframe_pdf_pages(temp_dir):
+    write_pypdf(os.path.join(temp_dir, "good.pdf"), 3)
+    with open(os.path.join(temp_dir, "bad.pdf"), "wb") as f:
+        f.write(b"%PDF-1.4\ngarbage")
+    df = LsrTree(temp_dir, outfmt="dataframe", with_counts=True).list_files_dataframe()
+    pages = dict(zip(df["file"], df["N_page"]))
+    assert pages["good.pdf"] == "3"
+    assert pages["bad.pdf"] == "None"
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import shutil
+import hashlib
+import pytest
+from mtbp3cd.util.lsr import LsrTree
+from mtbp3cd.util.lsrsnap import LsrSnapshots
+
+@pytest.fixture
+def temp_dir():
+    dirpath = tempfile.mkdtemp()
+    yield dirpath
+    shutil.rmtree(dirpath)
+
+def write(root, rel_path, data):
+    file_path = os.path.join(root, *rel_path.split("/"))
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "w") as f:
+        f.write(data)
+
+def test_snapshots(temp_dir):
+    root = os.path.join(temp_dir, "delivery")
+    write(root, "m5/adam/adsl.xpt", "adsl")
+    write(root, "m5/sdtm/dm.xpt", "dm")
+    write(root, "m1/cover.pdf", "cover")
+    db_path = os.path.join(temp_dir, "snapshots.sqlite")
+    store = LsrSnapshots(db_path)
+    scan1 = store.add_scan(LsrTree(root).list_files_dataframe(), label="seq 1", root=root)
+
+    write(root, "m5/sdtm/dm.xpt", "dm v2")
+    write(root, "m5/sdtm/ae.xpt", "adsl")
+    os.remove(os.path.join(root, "m1", "cover.pdf"))
+    scan2 = store.add_scan(LsrTree(root, digests=["sha256"]).iter_entries(with_meta=True), label="seq 2", chunk_size=2)
+    store.close()
+
+    store = LsrSnapshots(db_path)
+    scan3 = store.add_scan(LsrTree(root, digests=["sha256"]).list_files_dataframe(typed=True), label="seq 3")
+    scans = store.scans()
+    assert scans["label"].tolist() == ["seq 1", "seq 2", "seq 3"]
+    assert scans["n_files"].tolist() == [3, 3, 3]
+    # Adding sha256 changes every version in scan 2; scan 3 writes nothing
+    assert scans["n_changed"].tolist() == [3, 4, 0]
+
+    changed = store.changed_since(scan1)
+    assert list(zip(changed["status"], changed["rel_path"])) == [
+        ("removed", "m1/cover.pdf"), ("modified", "m5/adam/adsl.xpt"), ("added", "m5/sdtm/ae.xpt"), ("modified", "m5/sdtm/dm.xpt"),
+    ]
+    assert changed.loc[changed["rel_path"] == "m5/sdtm/dm.xpt", ["size_in_bytes_old", "size_in_bytes_new"]].values.tolist() == [[2, 5]]
+    assert store.changed_since(scan2).empty
+    assert store.changed_since(scan3, until=scan1).empty
+
+    first = store.get_scan(scan1)
+    assert first["rel_path"].tolist() == ["m1/cover.pdf", "m5/adam/adsl.xpt", "m5/sdtm/dm.xpt"]
+    assert "sha256" not in first.columns
+    last = store.get_scan()
+    assert last["sha256"].tolist()[0] == hashlib.sha256(b"adsl").hexdigest()
+    assert str(last["N_row"].dtype) == "Int64"
+
+    md5 = hashlib.md5(b"adsl").hexdigest()
+    found = store.find_md5(md5)
+    assert found["rel_path"].tolist() == ["m5/adam/adsl.xpt", "m5/adam/adsl.xpt", "m5/sdtm/ae.xpt"]
+    assert found["first_scan"].tolist() == [1, 2, 2]
+    assert found["last_scan"].fillna(0).tolist() == [1, 0, 0]
+    assert len(store.history("m5/sdtm/dm.xpt")) == 2
+    with pytest.raises(ValueError):
+        store.get_scan(99)
+    store.close()
+
+def test_snapshots_one_root(temp_dir):
+    root = os.path.join(temp_dir, "delivery")
+    other = os.path.join(temp_dir, "other")
+    write(root, "m5/sdtm/dm.xpt", "dm")
+    write(other, "m5/sdtm/dm.xpt", "dm v2")
+    store = LsrSnapshots(os.path.join(temp_dir, "snapshots.sqlite"))
+    store.add_scan(LsrTree(root).list_files_dataframe(), root=root)
+    with pytest.raises(ValueError):
+        store.add_scan(LsrTree(other).list_files_dataframe(), root=other)
+    scans = store.scans()
+    assert len(scans) == 1
+    store.add_scan(LsrTree(root).list_files_dataframe(), root=root + os.sep)
+    assert store.scans()["n_changed"].tolist() == [1, 0]
+    store.close()